@@ -133,7 +133,41 @@ STORAGES = {
     },
 }
 
+# Caches
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# The "search" cache holds rendered result fragments keyed by data version and
+# normalized query. Swap the backend for FileBasedCache/Redis to share it
+# between gunicorn workers; MAX_BYTES only applies to BoundedLocMemCache.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'search': {
+        'BACKEND': 'search.cache.BoundedLocMemCache',
+        'LOCATION': 'search-results',
+        'TIMEOUT': None,  # invalidated by data version, not age
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.getenv('SEARCH_CACHE_MAX_ENTRIES', '5000')),
+            'MAX_BYTES': int(os.getenv('SEARCH_CACHE_MAX_BYTES', str(32 * 1024 * 1024))),
+        },
+    },
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Search app
+# Counter file bumped by ingest commands; web workers watch it to rebuild the
+# in-memory search index. Keep it next to the database so containers that
+# persist db.sqlite3 on a volume persist this too.
+SEARCH_DATA_VERSION_FILE = BASE_DIR / 'data_version'
+# Hard cap on result cards per response; further pages load via keyset cursor
+SEARCH_PAGE_SIZE = 24
+SEARCH_CACHE_ALIAS = 'search'
+
+# Raw BGG responses recorded by the ingest commands (see search/bgg/httpcache.py);
+# rerun any ingest command with --offline to replay from here.
+BGG_CACHE_DIR = Path(os.getenv('BGG_CACHE_DIR', BASE_DIR / 'bgg_cache'))
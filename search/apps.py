@@ -1,6 +1,18 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+
+
+def _restore_fulltext(sender, using, **kwargs):
+    # A migration that rebuilt search_game (any added/removed column on SQLite) dropped the FTS triggers
+    from .textsearch import restore_fts_triggers
+    restore_fts_triggers(using)
 
 
 class SearchConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'search'
+
+    def ready(self):
+        # Keep in-memory search state in step with admin/ORM edits
+        from . import checks, signals  # noqa: F401
+        post_migrate.connect(_restore_fulltext, sender=self)
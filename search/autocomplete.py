@@ -0,0 +1,122 @@
+"""
+Typeahead suggestions for game and mechanic names.
+
+Each name is folded the way keyword search folds text (textsearch.tokenize)
+and indexed once per word, as the words from that one to the end: "Worker
+Placement" is found by "wor", "worker pl" and "pla". The keys live in one
+sorted list, so every name with a given prefix sits in a contiguous slice
+found with two bisects; the best few of that slice are picked with a heap.
+One- and two-character prefixes match a large share of the catalog, so their
+best MAX_LIMIT entries are worked out once at build time instead.
+
+Games are ranked by rating and mechanics by how many games use them. Both
+indexes are built lazily and rebuilt when the data version moves, like the
+search index itself.
+"""
+from bisect import bisect_left
+import heapq
+import threading
+
+from .catalog import get_mechanic_catalog
+from .engine import get_index, sort_key
+from .textsearch import normalize_query, tokenize
+
+KINDS = ('mechanics', 'games')
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+
+_PAST_PREFIX = '\U0010ffff'  # sorts after any character a folded key can continue with
+_SHORT_PREFIX = 2  # prefixes up to this length are answered from precomputed lists
+
+
+class PrefixIndex:
+    """Ranked prefix lookup over a fixed list of (name, rank, item) entries.
+
+    Lower ranks are better; `item` is what complete() returns for the entry.
+    """
+
+    __slots__ = ('keys', 'entries', 'ranks', 'items', 'by_rank', 'short')
+
+    def __init__(self, entries):
+        keyed = []
+        ranks = []
+        items = []
+        words_of = []
+        for entry, (name, rank, item) in enumerate(entries):
+            words = tokenize(name)
+            for start in range(len(words)):
+                keyed.append((' '.join(words[start:]), entry))
+            ranks.append(rank)
+            items.append(item)
+            words_of.append(words)
+        keyed.sort()
+        self.keys = [key for key, _ in keyed]
+        self.entries = [entry for _, entry in keyed]
+        self.ranks = ranks
+        self.items = items
+        self.by_rank = sorted(range(len(items)), key=ranks.__getitem__)
+
+        short = {}  # short prefix -> best MAX_LIMIT entries, best first
+        for entry in self.by_rank:
+            prefixes = {word[:length] for word in words_of[entry] for length in range(1, _SHORT_PREFIX + 1)}
+            for prefix in prefixes:
+                best = short.setdefault(prefix, [])
+                if len(best) < MAX_LIMIT:
+                    best.append(entry)
+        self.short = short
+
+    def __len__(self):
+        return len(self.items)
+
+    def complete(self, prefix, limit=DEFAULT_LIMIT):
+        """The `limit` best-ranked items with a word starting with `prefix`;
+        the best-ranked items overall if `prefix` has no searchable words."""
+        prefix = normalize_query(prefix)
+        if not prefix:
+            return [self.items[entry] for entry in self.by_rank[:limit]]
+        if len(prefix) <= _SHORT_PREFIX and limit <= MAX_LIMIT:
+            return [self.items[entry] for entry in self.short.get(prefix, ())[:limit]]
+        lo = bisect_left(self.keys, prefix)
+        hi = bisect_left(self.keys, prefix + _PAST_PREFIX, lo)
+        # A name can match at several of its words; count it once
+        matches = set(self.entries[lo:hi])
+        best = heapq.nsmallest(limit, matches, key=self.ranks.__getitem__)
+        return [self.items[entry] for entry in best]
+
+
+def _game_entries(index):
+    for record in index.records:
+        item = record.values(('id', 'name', 'year', 'rating'))
+        yield record.name, sort_key(record.rating, record.id), item
+
+
+def _mechanic_entries():
+    for mechanic in get_mechanic_catalog().selectable:
+        item = {'id': mechanic.pk, 'name': mechanic.name, 'usage_count': mechanic.usage_count}
+        yield mechanic.name, (-mechanic.usage_count, mechanic.name), item
+
+
+_indexes = {}  # kind -> PrefixIndex, for _indexes_version
+_indexes_version = None
+_lock = threading.Lock()
+
+
+def get_prefix_index(kind) -> PrefixIndex:
+    """The process-local PrefixIndex for `kind`, rebuilt if the data version moved."""
+    global _indexes, _indexes_version
+    index = get_index()
+    with _lock:
+        if _indexes_version != index.version:
+            _indexes = {}
+            _indexes_version = index.version
+        prefixes = _indexes.get(kind)
+        if prefixes is None:
+            entries = _game_entries(index) if kind == 'games' else _mechanic_entries()
+            prefixes = _indexes[kind] = PrefixIndex(entries)
+    return prefixes
+
+
+def complete(kind, prefix, limit=DEFAULT_LIMIT):
+    if kind not in KINDS:
+        raise ValueError(f'Unknown kind {kind!r}; choose from {", ".join(KINDS)}')
+    return get_prefix_index(kind).complete(prefix, limit)
@@ -0,0 +1 @@
+"""Helpers for talking to BoardGameGeek (XML API and HTML pages) from ingest commands."""
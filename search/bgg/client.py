@@ -0,0 +1,228 @@
+"""
+Rate-limited, pooled HTTP client for BoardGameGeek.
+
+All workers share one requests.Session (keep-alive connection pool) and one
+token bucket, so adding workers overlaps network latency without exceeding the
+configured request rate. The bucket backs off multiplicatively when BGG answers
+429 (honoring Retry-After) and creeps back up on success. 202 "queued"
+responses and transient failures are retried with exponential backoff.
+
+With a ResponseCache attached, fresh cached responses skip the network (and the
+rate limiter) entirely, stale ones are revalidated with conditional headers,
+and offline mode replays the cache only.
+"""
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .httpcache import canonical_url
+
+BGG_BASE_URL = 'https://boardgamegeek.com'
+
+USER_AGENT = 'boardgames-search-app (+https://github.com/AdrianJonesTech/boardgames-search-app)'
+
+# Statuses worth retrying: 202 = request queued by BGG, 429 = throttled, 5xx = server trouble
+RETRY_STATUSES = {202, 429, 500, 502, 503, 504}
+
+
+class FetchError(Exception):
+    """Raised when a request still fails after all retries, or fails in a way retrying can't fix.
+
+    `retryable` is False for the latter (a 4xx other than 429, an offline cache
+    miss), so fetch_things reports those batches at once instead of requeueing them.
+    """
+
+    def __init__(self, message, retryable=True):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+class TokenBucket:
+    """Thread-safe token bucket with additive-increase / multiplicative-decrease rate."""
+
+    def __init__(self, rate: float, burst: int = 1, min_rate: float = 0.1):
+        self.max_rate = rate
+        self.min_rate = min(min_rate, rate)
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a request may be sent."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if now >= self._paused_until:
+                    self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                    self._updated = now
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return
+                    wait_for = (1 - self._tokens) / self.rate
+                else:
+                    wait_for = self._paused_until - now
+            time.sleep(wait_for)
+
+    def throttled(self, retry_after: float = 0.0):
+        """BGG said slow down: halve the rate and pause everyone for `retry_after` seconds."""
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+            self._tokens = 0.0
+            if retry_after:
+                self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+                self._updated = self._paused_until
+
+    def succeeded(self):
+        """Recover towards the configured rate after a clean response."""
+        with self._lock:
+            if self.rate < self.max_rate:
+                self.rate = min(self.max_rate, self.rate + self.max_rate / 20)
+
+
+def retry_after(resp, default: float) -> float:
+    """Seconds to wait per the response's Retry-After header, else `default`."""
+    value = resp.headers.get('Retry-After')
+    try:
+        return max(0.0, float(value)) if value else default
+    except ValueError:
+        return default
+
+
+class BGGClient:
+    """Shared session + rate limiter + retry policy for every BGG request of a command."""
+
+    def __init__(self, base_url: str = BGG_BASE_URL, rate: float = 1.0, workers: int = 4,
+                 timeout: float = 30, retries: int = 5, backoff: float = 2.0, session=None,
+                 cache=None):
+        self.base_url = base_url.rstrip('/')
+        self.workers = max(1, workers)
+        self.timeout = timeout
+        self.retries = max(1, retries)
+        self.backoff = backoff
+        self.bucket = TokenBucket(rate)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.workers)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            session.headers.update({'User-Agent': USER_AGENT})
+        self.session = session
+        self.cache = cache
+
+    def url(self, path: str) -> str:
+        return path if path.startswith(('http://', 'https://')) else f'{self.base_url}{path}'
+
+    def get(self, path: str, params=None) -> requests.Response:
+        """GET with caching, rate limiting and retries; raises FetchError when retries run out."""
+        url = canonical_url(self.url(path), params)
+        entry = self.cache.lookup(url) if self.cache else None
+        if self.cache and self.cache.offline:
+            if entry is None:
+                raise FetchError(f'{url} is not in the response cache (offline mode)', retryable=False)
+            return entry.response()
+        if entry is not None and entry.is_fresh():
+            return entry.response()
+        conditional = entry.validators() if entry is not None else {}
+
+        last_error = None
+        for attempt in range(1, self.retries + 1):
+            self.bucket.acquire()
+            delay = self.backoff * 2 ** (attempt - 1)
+            try:
+                resp = self.session.get(url, headers=conditional, timeout=self.timeout)
+            except requests.RequestException as e:
+                last_error = e
+            else:
+                if resp.status_code == 304 and entry is not None:
+                    self.cache.refresh(entry)
+                    self.bucket.succeeded()
+                    return entry.response()
+                if resp.status_code == 429:
+                    last_error = FetchError(f'HTTP 429 for {url}')
+                    delay = retry_after(resp, delay)
+                    self.bucket.throttled(delay)
+                elif resp.status_code in RETRY_STATUSES:
+                    last_error = FetchError(f'HTTP {resp.status_code} for {url}')
+                    delay = retry_after(resp, delay)
+                else:
+                    try:
+                        resp.raise_for_status()
+                    except requests.HTTPError as e:
+                        raise FetchError(str(e), retryable=resp.status_code >= 500) from e
+                    self.bucket.succeeded()
+                    if self.cache:
+                        self.cache.store(url, resp)
+                    return resp
+            if attempt < self.retries:
+                time.sleep(delay)
+        raise FetchError(f'Giving up on {url} after {self.retries} attempts: {last_error}')
+
+    def fetch_things(self, id_batches, batch_retries: int = 2, stats: bool = True):
+        """Fetch /xmlapi2/thing for each batch of ids on a bounded worker pool.
+
+        Yields (batch, content, error) as batches complete, in completion order:
+        exactly one of content/error is set. A batch whose request fails with
+        a retryable error (throttling, 5xx, network trouble) is requeued up to
+        `batch_retries` more times before its error is yielded; other errors
+        (e.g. 400/404) are yielded straight away. Either way callers can report
+        the batch instead of silently losing those ids.
+        `id_batches` may be any iterable (including a generator still being
+        filled); at most 2 * workers batches are in flight at once.
+        """
+        params = {'stats': 1} if stats else {}
+
+        def fetch(batch):
+            return self.get('/xmlapi2/thing', params={'id': ','.join(map(str, batch)), **params}).content
+
+        source = iter(id_batches)
+        retry_queue = deque()
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='bgg') as pool:
+            in_flight = {}
+
+            def submit_next():
+                if retry_queue:
+                    batch, attempt = retry_queue.popleft()
+                else:
+                    batch = next(source, None)
+                    if batch is None:
+                        return False
+                    attempt = 0
+                in_flight[pool.submit(fetch, batch)] = (batch, attempt)
+                return True
+
+            while len(in_flight) < 2 * self.workers and submit_next():
+                pass
+            while in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    batch, attempt = in_flight.pop(future)
+                    try:
+                        content = future.result()
+                    except FetchError as e:
+                        if e.retryable and attempt < batch_retries:
+                            retry_queue.append((batch, attempt + 1))
+                        else:
+                            yield batch, None, e
+                    else:
+                        yield batch, content, None
+                while len(in_flight) < 2 * self.workers and submit_next():
+                    pass
+
+
+def batched(iterable, size: int):
+    """Group any iterable into lists of at most `size` items, lazily."""
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
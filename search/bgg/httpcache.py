@@ -0,0 +1,185 @@
+"""
+On-disk cache of raw BGG responses, shared by every ingest command.
+
+Layout under the cache directory:
+
+    meta/<sha256(url)[:2]>/<sha256(url)>.json   one small record per URL
+    objects/<sha256(body)[:2]>/<sha256(body)>.gz gzip'd body, content-addressed
+
+Records keep the status, content type, ETag/Last-Modified validators and the
+fetch time, so stale entries can be revalidated with a conditional request and
+a 304 costs no body transfer. Identical bodies (e.g. repeated error pages) are
+stored once. With offline=True nothing touches the network: commands replay
+whatever was recorded (a URL that never was raises the client's FetchError),
+which also lets parsers be exercised on fixtures.
+
+Recording is on by default and nothing is evicted automatically, so the
+directory grows with every new URL; prune() (the prune_bgg_cache command)
+drops records not refreshed within a given age and the bodies only they used.
+"""
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+import requests
+from django.conf import settings
+from requests.structures import CaseInsensitiveDict
+
+# Response headers worth keeping alongside the body
+_KEPT_HEADERS = ('Content-Type', 'ETag', 'Last-Modified')
+
+
+def canonical_url(url, params=None) -> str:
+    """The URL requests would send, so equivalent param dicts share one entry."""
+    return requests.Request('GET', url, params=params).prepare().url
+
+
+def _atomic_write(path: Path, data: bytes):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f'{path.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+class CacheEntry:
+    __slots__ = ('cache', 'meta')
+
+    def __init__(self, cache, meta):
+        self.cache = cache
+        self.meta = meta
+
+    def is_fresh(self) -> bool:
+        ttl = self.cache.ttl
+        return bool(ttl) and time.time() - self.meta['fetched_at'] < ttl
+
+    def validators(self) -> dict:
+        """Conditional request headers for revalidating this entry."""
+        headers = {}
+        if self.meta['headers'].get('ETag'):
+            headers['If-None-Match'] = self.meta['headers']['ETag']
+        if self.meta['headers'].get('Last-Modified'):
+            headers['If-Modified-Since'] = self.meta['headers']['Last-Modified']
+        return headers
+
+    def response(self) -> requests.Response:
+        """Rebuild a requests.Response from the stored record and body."""
+        resp = requests.Response()
+        resp.status_code = self.meta['status']
+        resp.url = self.meta['url']
+        resp.headers = CaseInsensitiveDict(self.meta['headers'])
+        resp.encoding = self.meta.get('encoding')
+        resp._content = self.cache.read_body(self.meta['body'])
+        resp.from_cache = True
+        return resp
+
+
+class ResponseCache:
+    def __init__(self, directory, ttl: float = 0, offline: bool = False):
+        self.directory = Path(directory)
+        self.ttl = ttl
+        self.offline = offline
+
+    def _meta_path(self, url) -> Path:
+        digest = hashlib.sha256(url.encode()).hexdigest()
+        return self.directory / 'meta' / digest[:2] / f'{digest}.json'
+
+    def _body_path(self, digest) -> Path:
+        return self.directory / 'objects' / digest[:2] / f'{digest}.gz'
+
+    def read_body(self, digest) -> bytes:
+        return gzip.decompress(self._body_path(digest).read_bytes())
+
+    def lookup(self, url):
+        try:
+            meta = json.loads(self._meta_path(url).read_text())
+        except (OSError, ValueError):
+            return None
+        if not self._body_path(meta['body']).exists():
+            return None
+        return CacheEntry(self, meta)
+
+    def store(self, url, resp: requests.Response):
+        body = resp.content
+        digest = hashlib.sha256(body).hexdigest()
+        body_path = self._body_path(digest)
+        if not body_path.exists():
+            _atomic_write(body_path, gzip.compress(body, compresslevel=6))
+        meta = {
+            'url': url,
+            'status': resp.status_code,
+            'headers': {h: resp.headers[h] for h in _KEPT_HEADERS if h in resp.headers},
+            'encoding': resp.encoding,
+            'fetched_at': time.time(),
+            'body': digest,
+        }
+        _atomic_write(self._meta_path(url), json.dumps(meta).encode())
+
+    def refresh(self, entry: CacheEntry):
+        """Record a successful revalidation (HTTP 304)."""
+        entry.meta['fetched_at'] = time.time()
+        _atomic_write(self._meta_path(entry.meta['url']), json.dumps(entry.meta).encode())
+
+    def prune(self, max_age: float, dry_run: bool = False):
+        """Delete records last fetched or revalidated more than `max_age` seconds ago,
+        then every body no remaining record points to.
+
+        Returns (records removed, bodies removed, bytes freed). Safe to run next
+        to an ingest: a body removed under a record written meanwhile only
+        makes lookup() miss, and the URL is fetched again.
+        """
+        cutoff = time.time() - max_age
+        keep = set()
+        records = 0
+        for path in self.directory.glob('meta/*/*.json'):
+            try:
+                meta = json.loads(path.read_text())
+            except (OSError, ValueError):
+                meta = None
+            if meta is not None and meta.get('fetched_at', 0) >= cutoff:
+                keep.add(meta['body'])
+                continue
+            records += 1
+            if not dry_run:
+                path.unlink(missing_ok=True)
+        bodies = freed = 0
+        for path in self.directory.glob('objects/*/*.gz'):
+            if path.name[:-len('.gz')] in keep:
+                continue
+            bodies += 1
+            freed += path.stat().st_size
+            if not dry_run:
+                path.unlink(missing_ok=True)
+        return records, bodies, freed
+
+
+def add_cache_arguments(parser):
+    """Cache/replay flags shared by the BGG ingest commands."""
+    parser.add_argument(
+        '--cache-dir', default=None,
+        help='Directory for raw BGG responses (default: settings.BGG_CACHE_DIR)'
+    )
+    parser.add_argument(
+        '--cache-ttl', type=float, default=0,
+        help='Serve cached responses younger than this many seconds without '
+             'revalidating (default: 0, always revalidate)'
+    )
+    parser.add_argument(
+        '--no-cache', action='store_true',
+        help='Neither read nor record raw responses'
+    )
+    parser.add_argument(
+        '--offline', action='store_true',
+        help='Replay from the response cache only; never touch the network'
+    )
+
+
+def cache_from_options(options):
+    """Build the ResponseCache selected by add_cache_arguments() flags (or None)."""
+    if options['no_cache'] and not options['offline']:
+        return None
+    directory = options['cache_dir'] or getattr(settings, 'BGG_CACHE_DIR', settings.BASE_DIR / 'bgg_cache')
+    return ResponseCache(directory, ttl=options['cache_ttl'], offline=options['offline'])
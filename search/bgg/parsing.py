@@ -0,0 +1,111 @@
+"""
+Parsers for BGG XML API responses.
+
+Each parser returns plain dicts so the ingest stage can write a whole batch at
+once instead of touching the ORM per element. Thing responses are parsed
+incrementally with iterparse rather than materialised with fromstring.
+"""
+import io
+import xml.etree.ElementTree as ET
+
+
+def _safe_int(val):
+    try:
+        return int(val) if val not in (None, '') else None
+    except Exception:
+        return None
+
+
+def _safe_float(val):
+    try:
+        return float(val) if val not in (None, '') else None
+    except Exception:
+        return None
+
+
+# Numeric fields, matched at any depth inside an <item> (first occurrence wins,
+# like ElementTree's find('.//tag')), with the record key and converter
+_VALUE_FIELDS = {
+    'yearpublished': ('year', _safe_int),
+    'minplayers': ('min_players', _safe_int),
+    'maxplayers': ('max_players', _safe_int),
+    'playingtime': ('playing_time', _safe_int),
+    'averageweight': ('weight', _safe_float),
+    'average': ('rating', _safe_float),  # User avg rating
+}
+
+
+def _new_record(item):
+    return {
+        'bgg_id': _safe_int(item.get('id')),
+        'name': '',
+        'year': None,
+        'min_players': None,
+        'max_players': None,
+        'playing_time': None,
+        'weight': None,
+        'rating': None,
+        'thumbnail': None,
+        'description': None,
+        'mechanics': [],
+    }
+
+
+def iter_things(source):
+    """Yield game records from a /xmlapi2/thing response, one <item> at a time.
+
+    `source` is a file-like object (or path). Elements are visited once, in a
+    single iterparse pass; each <item> is cleared as soon as its record is
+    emitted, so peak memory is one item rather than the whole document. Items
+    missing an id or name are skipped. Raises ET.ParseError for malformed XML.
+    """
+    root = None
+    record = None
+    seen = set()  # value fields already taken for the current item
+    depth = 0  # nesting level; after an 'end', 1 means </item>, 2 a direct child of it
+    for event, elem in ET.iterparse(source, events=('start', 'end')):
+        if event == 'start':
+            depth += 1
+            if depth == 1:
+                root = elem
+            elif depth == 2 and elem.tag == 'item':
+                record = _new_record(elem)
+                seen.clear()
+            continue
+
+        depth -= 1
+        if record is None:
+            continue
+        tag = elem.tag
+        if depth == 1:  # </item>
+            if record['bgg_id'] and record['name']:
+                yield record
+            record = None
+            root.clear()
+        elif tag in _VALUE_FIELDS:
+            if tag not in seen:
+                seen.add(tag)
+                key, convert = _VALUE_FIELDS[tag]
+                record[key] = convert(elem.get('value'))
+        elif depth == 2:  # direct child of <item>
+            if tag == 'name':
+                if not record['name']:
+                    record['name'] = elem.get('value', '')
+            elif tag == 'link':
+                if elem.get('type') == 'boardgamemechanic':
+                    mech_id = _safe_int(elem.get('id'))
+                    if mech_id:
+                        record['mechanics'].append((mech_id, elem.get('value', '') or f'Mechanic {mech_id}'))
+            elif tag == 'thumbnail':
+                if 'thumbnail' not in seen:
+                    seen.add('thumbnail')
+                    record['thumbnail'] = elem.text
+            elif tag == 'description':
+                if 'description' not in seen:
+                    seen.add('description')
+                    record['description'] = elem.text
+
+
+def parse_things(content):
+    """Parse a /xmlapi2/thing response body into a list of game records."""
+    return list(iter_things(io.BytesIO(content)))
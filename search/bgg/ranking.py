@@ -0,0 +1,87 @@
+"""
+Streaming crawler for the BGG "browse by rank" listing.
+
+Pages are fetched one at a time and their (rank, bgg_id) rows yielded as soon as
+each page is parsed, so a downstream detail fetcher can start on the first ids
+while later pages are still being crawled. Only the set of ids already yielded
+is kept, to skip games that shift across a page boundary mid-crawl.
+"""
+import re
+
+from bs4 import BeautifulSoup
+
+from .client import FetchError
+
+BROWSE_PATH = '/browse/boardgame'
+PAGE_SIZE = 100  # rows per ranking page on BGG
+
+_GAME_HREF = re.compile(r'/boardgame/(\d+)')
+
+
+def parse_ranking_page(content):
+    """Return ([(rank, bgg_id), ...], skipped_rows) for one ranking page."""
+    soup = BeautifulSoup(content, 'html.parser')
+
+    # Find the rankings table (first <table> is usually it)
+    table = soup.find('table')
+    if not table:
+        return None, 0
+    rows = []
+    skipped = 0
+    for row in table.find_all('tr')[1:]:  # Skip header row
+        tds = row.find_all('td')
+        if len(tds) < 3:
+            skipped += 1
+            continue
+
+        # Safe rank parsing: Skip non-game rows (e.g., footers with text like 'Expand Your Collection')
+        try:
+            rank = int(tds[0].text.strip())
+        except ValueError:
+            skipped += 1
+            continue
+
+        # Game ID link: In second <td> (index 1, thumbnail column)
+        name_cell = tds[1].find('a', href=True)
+        match = _GAME_HREF.search(name_cell['href']) if name_cell else None
+        if not match:
+            skipped += 1
+            continue
+        rows.append((rank, int(match.group(1))))
+    return rows, skipped
+
+
+def iter_ranked_ids(client, top_n, on_page=None):
+    """Yield (rank, bgg_id) for the top `top_n` ranked games, page by page.
+
+    `on_page(page, found, skipped, error)` is called after each page for
+    progress reporting. A page that fails after the client's retries is
+    reported and skipped; an empty page ends the crawl early.
+    """
+    seen = set()
+    last_page = (top_n + PAGE_SIZE - 1) // PAGE_SIZE
+    for page in range(1, last_page + 1):
+        path = BROWSE_PATH if page == 1 else f'{BROWSE_PATH}/page/{page}'
+        try:
+            resp = client.get(path, params={'sort': 'rank'})
+        except FetchError as e:
+            if on_page:
+                on_page(page, 0, 0, e)
+            continue
+        rows, skipped = parse_ranking_page(resp.content)
+        if rows is None:
+            if on_page:
+                on_page(page, 0, 0, 'no ranking table found')
+            continue
+
+        found = 0
+        for rank, bgg_id in rows:
+            if rank > top_n or bgg_id in seen:
+                continue
+            seen.add(bgg_id)
+            found += 1
+            yield rank, bgg_id
+        if on_page:
+            on_page(page, found, skipped, None)
+        if not rows:
+            return  # ran off the end of the listing
@@ -0,0 +1,133 @@
+"""
+Result cache for the htmx search endpoint.
+
+Rendered result fragments are stored in a Django cache (alias
+settings.SEARCH_CACHE_ALIAS) under a key built from the current data version
+plus a canonical form of SearchForm.cleaned_data, so equivalent parameter sets
+(blank fields, reordered mechanic ids) share one entry and any ingest bump makes
+old entries unreachable. The same canonical form, with the data version,
+makes the JSON API's ETags. Result cards are cached individually as well,
+per game and data version, so a page of results not seen before is mostly
+assembled from cards other searches already rendered. Any Django backend works; BoundedLocMemCache adds a
+byte budget on top of local-memory LRU eviction.
+"""
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.cache.backends.locmem import LocMemCache
+
+from .dataversion import get_data_version
+
+# Bytes in use per named cache, shared like LocMemCache's own module-level stores
+_used_bytes = {}
+
+
+class BoundedLocMemCache(LocMemCache):
+    """LocMemCache that also evicts least-recently-used entries past OPTIONS['MAX_BYTES'].
+
+    LocMemCache stores pickled bytes, so entry sizes are exact. Only set/add/
+    delete/cull paths are accounted; incr() is not used for search results.
+    """
+
+    def __init__(self, name, params):
+        super().__init__(name, params)
+        options = params.get('OPTIONS', {})
+        self._max_bytes = int(options.get('MAX_BYTES', 0)) or None
+        self._used = _used_bytes.setdefault(name, [0])
+
+    def _set(self, key, value, timeout=DEFAULT_TIMEOUT):
+        self._delete(key)
+        if self._max_bytes and len(value) > self._max_bytes:
+            return  # could never fit; don't flush the whole cache for it
+        super()._set(key, value, timeout)
+        self._used[0] += len(value)
+        if self._max_bytes:
+            while self._used[0] > self._max_bytes and len(self._cache) > 1:
+                old_key, old_value = self._cache.popitem()  # LRU end
+                del self._expire_info[old_key]
+                self._used[0] -= len(old_value)
+
+    def _cull(self):
+        if self._cull_frequency == 0:
+            self._cache.clear()
+            self._expire_info.clear()
+            self._used[0] = 0
+            return
+        for _ in range(len(self._cache) // self._cull_frequency):
+            key, value = self._cache.popitem()
+            del self._expire_info[key]
+            self._used[0] -= len(value)
+
+    def _delete(self, key):
+        value = self._cache.get(key)
+        deleted = super()._delete(key)
+        if deleted:
+            self._used[0] -= len(value)
+        return deleted
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+            self._expire_info.clear()
+            self._used[0] = 0
+
+
+def canonical_query(cleaned) -> str:
+    """Stable string for a validated SearchForm; equivalent searches map to the same value."""
+    parts = []
+    for name in sorted(cleaned):
+        value = cleaned[name]
+        if name == 'mechanics':
+            value = sorted(m.pk for m in value or ())
+        elif name == 'mechanics_match' and not cleaned.get('mechanics'):
+            continue  # the match mode is irrelevant without mechanics
+        if not value:
+            continue  # the engine treats 0/None/empty as "no filter"
+        parts.append([name, value])
+    return json.dumps(parts, separators=(',', ':'))
+
+
+def _cache():
+    return caches[getattr(settings, 'SEARCH_CACHE_ALIAS', 'default')]
+
+
+def _digest(cleaned, variant: str) -> str:
+    return hashlib.sha1(f'{variant}|{canonical_query(cleaned)}'.encode()).hexdigest()
+
+
+def results_cache_key(cleaned, variant: str) -> str:
+    return f'search:results:{get_data_version()}:{_digest(cleaned, variant)}'
+
+
+def search_etag(version, cleaned, variant: str) -> str:
+    """Strong ETag (quoted) for a search response rendered from data `version`."""
+    return f'"{version}-{_digest(cleaned, variant)}"'
+
+
+def cached_cards(games, render) -> str:
+    """Concatenated card HTML for `games`, calling render(game) only for cards not cached yet."""
+    version = get_data_version()
+    keys = [f'search:card:{version}:{game.id}' for game in games]
+    cache = _cache()
+    found = cache.get_many(keys)
+    rendered = {}
+    parts = []
+    for key, game in zip(keys, games):
+        html = found.get(key)
+        if html is None:
+            html = rendered[key] = render(game)
+        parts.append(html)
+    if rendered:
+        cache.set_many(rendered)
+    return ''.join(parts)
+
+
+def get_cached(key):
+    return _cache().get(key)
+
+
+def set_cached(key, value):
+    _cache().set(key, value)
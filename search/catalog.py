@@ -0,0 +1,64 @@
+"""
+Process-local mechanic catalog.
+
+Every search request needs the mechanic list: SearchForm validates submitted
+ids against it, autocomplete suggests from it and the index labels facets
+with it. It is read with one query per data version (see dataversion.py;
+ingest and admin edits bump it) and served from memory in between, so steady
+state searches issue no mechanic queries at all.
+"""
+import threading
+
+from .dataversion import get_data_version
+from .models import Mechanic
+
+
+class CatalogMechanic:
+    """A Mechanic row as the search app uses it (`pk` like a model instance)."""
+
+    __slots__ = ('pk', 'name', 'is_common', 'usage_count')
+
+    def __init__(self, pk, name, is_common, usage_count):
+        self.pk = pk
+        self.name = name
+        self.is_common = is_common
+        self.usage_count = usage_count
+
+    def __str__(self):
+        return self.name
+
+
+class MechanicCatalog:
+    """All mechanics for one data version.
+
+    `selectable` is what SearchForm accepts, by name: the common mechanics if
+    any are flagged, else all of them.
+    """
+
+    def __init__(self, rows, version):
+        self.version = version
+        self.by_id = {pk: CatalogMechanic(pk, *fields) for pk, *fields in rows}
+        common = [m for m in self.by_id.values() if m.is_common]
+        self.selectable = sorted(common or self.by_id.values(), key=lambda m: m.name)
+        self.selectable_ids = {m.pk: m for m in self.selectable}
+
+    @classmethod
+    def build(cls, version):
+        return cls(Mechanic.objects.order_by().values_list('id', 'name', 'is_common', 'usage_count'), version)
+
+
+_catalog = None
+_build_lock = threading.Lock()
+
+
+def get_mechanic_catalog() -> MechanicCatalog:
+    """Return the process-local catalog, rebuilding it if the data version moved."""
+    global _catalog
+    version = get_data_version()
+    catalog = _catalog
+    if catalog is None or catalog.version != version:
+        with _build_lock:
+            catalog = _catalog
+            if catalog is None or catalog.version != version:
+                catalog = _catalog = MechanicCatalog.build(version)
+    return catalog
@@ -0,0 +1,19 @@
+from django.core.checks import Tags, Warning, register
+
+from .textsearch import FTS_TABLE, fts_state
+
+
+@register(Tags.database)
+def check_fulltext_triggers(app_configs, databases=None, **kwargs):
+    """Warn if the FTS index exists but is no longer kept in sync with search_game."""
+    errors = []
+    for alias in databases or ():
+        has_table, missing = fts_state(alias)
+        if has_table and missing:
+            errors.append(Warning(
+                f'{FTS_TABLE} is missing its sync triggers ({", ".join(missing)}); '
+                'keyword search falls back to the slower in-process index.',
+                hint='Run "python manage.py migrate", which recreates them and rebuilds the index.',
+                id='search.W001',
+            ))
+    return errors
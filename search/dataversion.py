@@ -0,0 +1,57 @@
+"""
+Shared data version for the search app.
+
+Ingest commands run in their own process, so anything cached inside a web
+worker (the in-memory search index, cached results) needs a cross-process
+signal that the catalog changed. The version is a small counter file next to
+the database: readers only stat() it on each request and re-read it when it
+changes, writers replace it atomically.
+"""
+import os
+import threading
+from pathlib import Path
+
+from django.conf import settings
+
+_lock = threading.Lock()
+_last_signature = None
+_last_version = 0
+
+
+def _version_path() -> Path:
+    return Path(getattr(settings, 'SEARCH_DATA_VERSION_FILE', settings.BASE_DIR / 'data_version'))
+
+
+def get_data_version() -> int:
+    """Return the current catalog version (0 if nothing was ever bumped)."""
+    global _last_signature, _last_version
+    path = _version_path()
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return 0
+    signature = (st.st_ino, st.st_mtime_ns, st.st_size)
+    if signature == _last_signature:
+        return _last_version
+    try:
+        version = int(path.read_text().strip() or 0)
+    except (OSError, ValueError):
+        version = 0
+    with _lock:
+        _last_signature, _last_version = signature, version
+    return version
+
+
+def bump_data_version() -> int:
+    """Increment the catalog version; call after any write to Game/Mechanic data."""
+    path = _version_path()
+    with _lock:
+        try:
+            current = int(path.read_text().strip() or 0)
+        except (OSError, ValueError):
+            current = 0
+        new = current + 1
+        tmp = path.with_name(f'{path.name}.{os.getpid()}.tmp')
+        tmp.write_text(str(new))
+        os.replace(tmp, path)  # new inode, so readers always see the change
+    return new
@@ -0,0 +1,453 @@
+"""
+In-memory columnar search index over the Game table.
+
+The catalog is loaded once per data version into compact typed arrays, one per
+filterable column, each pre-sorted by value. A range filter is then two bisects
+plus a bitwise XOR of precomputed prefix bitsets, and combining filters is a
+bitwise AND over Python-int row bitsets. No ORM query or model hydration
+happens on the request path; the index rebuilds itself when ingest bumps the
+data version (see dataversion.py).
+
+Rows are stored in the model's default order (-rating, then bgg_id as a stable
+tiebreak), so bit position == result position and matches come out sorted.
+
+A keyword query (see textsearch.py) is the one filter that asks the database:
+its BM25 matches become one more row bitset to AND with the others, and the
+surviving rows are ordered by relevance instead of rating.
+
+Facet counts for a result set come from the same bitsets: one AND and
+popcount per mechanic and per histogram bucket, against bucket masks that are
+built once per index.
+"""
+from array import array
+from bisect import bisect_left, bisect_right
+import heapq
+from math import isfinite, isqrt
+import threading
+
+from .catalog import get_mechanic_catalog
+from .dataversion import get_data_version
+from .models import Game
+from .textsearch import text_backend
+
+# (form field, column, which end of the range the value bounds)
+RANGE_FILTERS = (
+    ('min_players', 'min_players', 'min'),
+    ('max_players', 'max_players', 'max'),
+    ('min_playing_time', 'playing_time', 'min'),
+    ('max_playing_time', 'playing_time', 'max'),
+    ('min_weight', 'weight', 'min'),
+    ('max_weight', 'weight', 'max'),
+    ('min_rating', 'rating', 'min'),
+    ('max_rating', 'rating', 'max'),
+)
+
+INT_COLUMNS = ('year', 'min_players', 'max_players', 'playing_time')
+FLOAT_COLUMNS = ('weight', 'rating')
+
+# Columns the index loads, in GameRecord order; the full description is never read
+GAME_FIELDS = (
+    'bgg_id', 'name', 'year', 'min_players', 'max_players',
+    'playing_time', 'weight', 'rating', 'thumbnail', 'description_snippet',
+)
+
+# Facet histograms: (facet, column, bucket edges); a bucket holds
+# edges[i] <= value < edges[i + 1], and the last one is open-ended. The first
+# edge is the column's lowest possible value so every non-NULL value is counted
+FACET_HISTOGRAMS = (
+    ('playing_time', 'playing_time', (0, 30, 60, 90, 120, 180)),
+    ('weight', 'weight', (0.0, 1.5, 2.0, 2.5, 3.0, 3.5, 4.0)),
+    ('rating', 'rating', (0.0, 6.0, 6.5, 7.0, 7.5, 8.0, 8.5)),
+)
+# The players facet counts games playable at each of these counts (the last: or more)
+FACET_PLAYER_COUNTS = tuple(range(1, 9))
+
+# Bit offsets set in each byte value, used to walk a bitset in row order
+_BYTE_BITS = tuple(tuple(i for i in range(8) if value >> i & 1) for value in range(256))
+
+
+def _bitset(rows) -> int:
+    """Build an int bitset from row positions without quadratic big-int ORs."""
+    rows = list(rows)
+    if not rows:
+        return 0
+    buf = bytearray(max(rows) // 8 + 1)
+    for row in rows:
+        buf[row >> 3] |= 1 << (row & 7)
+    return int.from_bytes(buf, 'little')
+
+
+def iter_rows(mask: int):
+    """Yield the set bit positions of `mask` in ascending order."""
+    if not mask:
+        return
+    data = mask.to_bytes((mask.bit_length() + 7) // 8, 'little')
+    for offset, byte in enumerate(data):
+        if byte:
+            base = offset * 8
+            for bit in _BYTE_BITS[byte]:
+                yield base + bit
+
+
+def sort_key(rating, bgg_id):
+    """Result order as a comparable key: highest rating first, NULLs last, then bgg_id."""
+    if rating is None:
+        return (1, 0.0, bgg_id)
+    return (0, -rating, bgg_id)
+
+
+def relevance_key(score, bgg_id):
+    """Keyword result order: best BM25 score first, then bgg_id."""
+    return (-score, bgg_id)
+
+
+def encode_cursor(record, score=None) -> str:
+    """Keyset cursor pointing just past `record` in result order.
+
+    Keyword results pass their relevance `score`; those cursors start with 's'.
+    """
+    if score is not None:
+        return f"s{score!r}:{record.id}"
+    rating = 'n' if record.rating is None else repr(record.rating)
+    return f"{rating}:{record.id}"
+
+
+def decode_cursor(cursor: str, relevance=False):
+    """Inverse of encode_cursor, as a sort_key() or relevance_key() tuple.
+
+    `relevance` says which kind the caller expects: keyword searches page by
+    relevance, everything else by rating. Raises ValueError on malformed
+    input, a non-finite value or a cursor of the other kind.
+    """
+    value, _, bgg_id = cursor.partition(':')
+    if value.startswith('s') != relevance:
+        raise ValueError(f'not a {"relevance" if relevance else "rating"} cursor: {cursor!r}')
+    if relevance:
+        value = value[1:]
+    number = None if value == 'n' and not relevance else float(value)
+    if number is not None and not isfinite(number):
+        raise ValueError(f'non-finite cursor value: {cursor!r}')
+    if relevance:
+        return relevance_key(number, int(bgg_id))
+    return sort_key(number, int(bgg_id))
+
+
+class GameRecord:
+    """One game as results, templates and the API see it.
+
+    Built once per index from a GAME_FIELDS row (bgg_id is exposed as `id`,
+    description_snippet as `description`) and shared by every result page.
+    """
+
+    __slots__ = (
+        'id', 'name', 'year', 'min_players', 'max_players',
+        'playing_time', 'weight', 'rating', 'thumbnail', 'description',
+    )
+
+    def __init__(self, id, name, year, min_players, max_players, playing_time, weight, rating,
+                 thumbnail, description):
+        self.id = id
+        self.name = name
+        self.year = year
+        self.min_players = min_players
+        self.max_players = max_players
+        self.playing_time = playing_time
+        self.weight = weight
+        self.rating = rating
+        self.thumbnail = thumbnail
+        self.description = description
+
+    def values(self, fields):
+        """{field: value} for the given attribute names."""
+        return {field: getattr(self, field) for field in fields}
+
+
+class Column:
+    """A filterable column: non-NULL values ascending with their row positions.
+
+    `prefix[k]` is the bitset of rows at sorted positions [0, k * block), so any
+    value range maps to one XOR of two prefixes plus fewer than 2 * block
+    single-bit fixups at the edges.
+    """
+
+    __slots__ = ('values', 'rows', 'block', 'prefix')
+
+    def __init__(self, raw, typecode):
+        pairs = sorted((value, row) for row, value in enumerate(raw) if value is not None)
+        self.values = array(typecode, (value for value, _ in pairs))
+        self.rows = array('q', (row for _, row in pairs))
+        self.block = max(64, isqrt(len(raw)))
+        prefix = [0]
+        for start in range(0, len(self.rows) - self.block + 1, self.block):
+            prefix.append(prefix[-1] | _bitset(self.rows[start:start + self.block]))
+        self.prefix = prefix
+
+    def range_mask(self, low=None, high=None) -> int:
+        """Bitset of rows with low <= value <= high (either bound optional)."""
+        lo = 0 if low is None else bisect_left(self.values, low)
+        hi = len(self.values) if high is None else bisect_right(self.values, high)
+        return self._slice_mask(lo, hi)
+
+    def bucket_mask(self, low=None, high=None) -> int:
+        """Bitset of rows with low <= value < high (either bound optional)."""
+        lo = 0 if low is None else bisect_left(self.values, low)
+        hi = len(self.values) if high is None else bisect_left(self.values, high)
+        return self._slice_mask(lo, hi)
+
+    def _slice_mask(self, lo, hi) -> int:
+        """Bitset of the rows at sorted positions [lo, hi)."""
+        if lo >= hi:
+            return 0
+        block = self.block
+        lo_block, hi_block = lo // block, hi // block
+        mask = self.prefix[hi_block] ^ self.prefix[lo_block]
+        mask |= _bitset(self.rows[hi_block * block:hi])
+        mask ^= _bitset(self.rows[lo_block * block:lo])
+        return mask
+
+
+MATCH_ANY = 'any'
+MATCH_ALL = 'all'
+MATCH_NONE = 'none'
+
+
+class MechanicBitmaps:
+    """Inverted index: Mechanic id -> bitset of the index rows that use it.
+
+    Bitsets are plain Python ints, which only allocate up to their highest set
+    bit, so rare mechanics stay small without a roaring-bitmap dependency.
+    """
+
+    __slots__ = ('bitmaps',)
+
+    def __init__(self, bitmaps):
+        self.bitmaps = bitmaps
+
+    @classmethod
+    def from_links(cls, links, position):
+        """Build from (game_id, mechanic_id) pairs of the Game.mechanics through table."""
+        rows_by_mechanic = {}
+        for game_id, mechanic_id in links:
+            row = position.get(game_id)
+            if row is not None:
+                rows_by_mechanic.setdefault(mechanic_id, []).append(row)
+        return cls({mid: _bitset(rows) for mid, rows in rows_by_mechanic.items()})
+
+    def match(self, mechanic_ids, mode, all_mask) -> int:
+        """Rows that use any / all / none of `mechanic_ids`."""
+        sets = [self.bitmaps.get(mid, 0) for mid in mechanic_ids]
+        if mode == MATCH_ALL:
+            mask = all_mask
+            for bits in sets:
+                mask &= bits
+            return mask
+        union = 0
+        for bits in sets:
+            union |= bits
+        if mode == MATCH_NONE:
+            return all_mask & ~union
+        return union
+
+
+class SearchPage:
+    """One page of results: the games, the total match count, the next cursor
+    and, if asked for, the facet counts of the whole result set."""
+
+    __slots__ = ('games', 'total', 'next_cursor', 'facets')
+
+    def __init__(self, games, total, next_cursor=None, facets=None):
+        self.games = games
+        self.total = total
+        self.next_cursor = next_cursor
+        self.facets = facets
+
+
+class GameIndex:
+    """Immutable snapshot of the catalog for one data version."""
+
+    def __init__(self, rows, links, version, mechanic_names=None):
+        self.version = version
+        self.size = len(rows)
+        self.all_mask = (1 << self.size) - 1
+
+        self.position = position = {}  # Game pk -> row
+        records = []
+        raw = {name: [] for name in INT_COLUMNS + FLOAT_COLUMNS}
+        for row, (pk, *values) in enumerate(rows):
+            record = GameRecord(*values)
+            position[pk] = row
+            for name in raw:
+                raw[name].append(getattr(record, name))
+            records.append(record)
+        self.records = records
+        self.sort_keys = [sort_key(r.rating, r.id) for r in records]
+        self.columns = {name: Column(raw[name], 'q') for name in INT_COLUMNS}
+        self.columns.update({name: Column(raw[name], 'd') for name in FLOAT_COLUMNS})
+
+        self.mechanics = MechanicBitmaps.from_links(links, position)
+        self.mechanic_names = dict(mechanic_names or ())  # Mechanic pk -> name
+        self._text = None
+        self._facet_buckets = None
+        self._lazy_lock = threading.Lock()
+
+    @classmethod
+    def build(cls, version):
+        # Sort in Python so NULL placement doesn't depend on the database backend
+        rating_at = 1 + GAME_FIELDS.index('rating')
+        bgg_id_at = 1 + GAME_FIELDS.index('bgg_id')
+        rows = list(Game.objects.order_by().values_list('id', *GAME_FIELDS))
+        rows.sort(key=lambda r: sort_key(r[rating_at], r[bgg_id_at]))
+        links = Game.mechanics.through.objects.values_list('game_id', 'mechanic_id')
+        names = ((pk, mechanic.name) for pk, mechanic in get_mechanic_catalog().by_id.items())
+        return cls(rows, links, version, names)
+
+    def filter_mask(self, cleaned) -> int:
+        """AND together the range filters present in SearchForm.cleaned_data."""
+        bounds = {}
+        for field, column, end in RANGE_FILTERS:
+            value = cleaned.get(field)
+            if value:  # same truthiness rule the ORM views used: 0/None means "no filter"
+                low, high = bounds.get(column, (None, None))
+                bounds[column] = (value, high) if end == 'min' else (low, value)
+        mask = self.all_mask
+        for column, (low, high) in bounds.items():
+            mask &= self.columns[column].range_mask(low, high)
+            if not mask:
+                break
+        return mask
+
+    def text_scores(self, query):
+        """{row: BM25 score} for the rows matching a keyword query."""
+        if self._text is None:
+            with self._lazy_lock:
+                if self._text is None:
+                    self._text = text_backend()
+        position = self.position
+        return {
+            position[pk]: score
+            for pk, score in self._text.scores(query).items()
+            if pk in position
+        }
+
+    def facet_buckets(self):
+        """{facet: [(low, high, bitset), ...]} for the histogram facets, built once."""
+        if self._facet_buckets is None:
+            with self._lazy_lock:
+                if self._facet_buckets is None:
+                    buckets = {}
+                    min_players = self.columns['min_players']
+                    max_players = self.columns['max_players']
+                    last = FACET_PLAYER_COUNTS[-1]
+                    buckets['players'] = [
+                        (n, n, min_players.range_mask(high=n) & max_players.range_mask(low=n))
+                        for n in FACET_PLAYER_COUNTS[:-1]
+                    ]
+                    buckets['players'].append((last, None, max_players.range_mask(low=last)))
+                    for facet, column, edges in FACET_HISTOGRAMS:
+                        bounds = zip(edges, edges[1:] + (None,))
+                        buckets[facet] = [
+                            (low, high, self.columns[column].bucket_mask(low, high))
+                            for low, high in bounds
+                        ]
+                    self._facet_buckets = buckets
+        return self._facet_buckets
+
+    def facets(self, mask):
+        """Facet counts over the rows in `mask`.
+
+        'mechanics' lists {id, name, count} for every mechanic used by a
+        matching game, most used first; each histogram facet lists
+        {low, high, count} per bucket (high is None for the open-ended last one).
+        """
+        names = self.mechanic_names
+        mechanics = []
+        for mechanic_id, bits in self.mechanics.bitmaps.items():
+            count = (bits & mask).bit_count()
+            if count:
+                mechanics.append({'id': mechanic_id, 'name': names.get(mechanic_id, ''), 'count': count})
+        mechanics.sort(key=lambda m: (-m['count'], m['name']))
+        facets = {'mechanics': mechanics}
+        for facet, buckets in self.facet_buckets().items():
+            facets[facet] = [
+                {'low': low, 'high': high, 'count': (bits & mask).bit_count()}
+                for low, high, bits in buckets
+            ]
+        return facets
+
+    def search(self, cleaned, limit=None, facets=False):
+        """Return one SearchPage for a validated SearchForm.
+
+        Results are best rated first, or most relevant first for a keyword
+        query (`cleaned['q']`). `cleaned['cursor']` (a decoded keyset cursor)
+        skips every row up to and including that key; `limit` caps the number
+        of games returned. With `facets`, the page also carries facets() of
+        the full result set.
+        """
+        mask = self.filter_mask(cleaned)
+        mechanic_ids = [m.pk for m in cleaned.get('mechanics') or ()]
+        if mechanic_ids and mask:
+            mode = cleaned.get('mechanics_match') or MATCH_ANY
+            mask &= self.mechanics.match(mechanic_ids, mode, self.all_mask)
+        query = cleaned.get('q')
+        if query and mask:
+            scores = self.text_scores(query)
+            mask &= _bitset(scores)
+        total = mask.bit_count()
+        counts = self.facets(mask) if facets else None
+
+        after = cleaned.get('cursor')
+        if query:
+            page = self._ranked_page(mask, scores if mask else {}, total, after, limit)
+            page.facets = counts
+            return page
+
+        if after is not None and mask:
+            start = bisect_right(self.sort_keys, after)
+            mask = mask >> start << start
+
+        games = []
+        next_cursor = None
+        for row in iter_rows(mask):
+            if limit is not None and len(games) == limit:
+                next_cursor = encode_cursor(games[-1])
+                break
+            games.append(self.records[row])
+        return SearchPage(games, total, next_cursor, counts)
+
+    def _ranked_page(self, mask, scores, total, after, limit):
+        records = self.records
+        keyed = ((relevance_key(scores[row], records[row].id), row) for row in iter_rows(mask))
+        if after is not None:
+            keyed = (item for item in keyed if item[0] > after)
+        if limit is None:
+            ranked = sorted(keyed)
+        else:
+            ranked = heapq.nsmallest(limit + 1, keyed)
+        games = [records[row] for _, row in ranked[:limit]]
+        next_cursor = None
+        if limit is not None and len(ranked) > limit:
+            last = ranked[limit - 1][1]
+            next_cursor = encode_cursor(records[last], score=scores[last])
+        return SearchPage(games, total, next_cursor)
+
+
+_index = None
+_build_lock = threading.Lock()
+
+
+def get_index() -> GameIndex:
+    """Return the process-local index, rebuilding it if the data version moved."""
+    global _index
+    version = get_data_version()
+    index = _index
+    if index is None or index.version != version:
+        with _build_lock:
+            index = _index
+            if index is None or index.version != version:
+                index = _index = GameIndex.build(version)
+    return index
+
+
+def search_games(cleaned, limit=None, facets=False):
+    """Run a validated SearchForm's search; the one entry point for every view and the API."""
+    return get_index().search(cleaned, limit=limit, facets=facets)
@@ -1,7 +1,45 @@
 from django import forms
-from .models import Mechanic
+from .catalog import get_mechanic_catalog
+from .engine import MATCH_ALL, MATCH_ANY, MATCH_NONE, decode_cursor
+from .textsearch import normalize_query
+
+
+class MechanicsField(forms.Field):
+    """Multiple Mechanic ids, checked against the in-memory catalog.
+
+    Cleans to a list of catalog.CatalogMechanic (each with .pk and .name, like
+    the model instances ModelMultipleChoiceField returned) without a query.
+    """
+
+    widget = forms.SelectMultiple
+    hidden_widget = forms.MultipleHiddenInput
+    default_error_messages = {
+        'invalid_list': 'Enter a list of values.',
+        'invalid_choice': 'Select a valid choice. %(value)s is not one of the available choices.',
+    }
+
+    def to_python(self, value):
+        if not value:
+            return []
+        if not isinstance(value, (list, tuple)):
+            raise forms.ValidationError(self.error_messages['invalid_list'], code='invalid_list')
+        selectable = get_mechanic_catalog().selectable_ids
+        mechanics = {}
+        for raw in value:
+            try:
+                mechanic = selectable.get(int(raw))
+            except (TypeError, ValueError):
+                mechanic = None
+            if mechanic is None:
+                raise forms.ValidationError(
+                    self.error_messages['invalid_choice'], code='invalid_choice', params={'value': raw},
+                )
+            mechanics[mechanic.pk] = mechanic
+        return list(mechanics.values())
+
 
 class SearchForm(forms.Form):
+    q = forms.CharField(max_length=200, required=False, label='Keywords')
     min_players = forms.IntegerField(min_value=1, required=False, label='Min Players')
     max_players = forms.IntegerField(min_value=1, required=False, label='Max Players')
     min_playing_time = forms.IntegerField(min_value=0, required=False, label='Min Playing Time (min)')
@@ -11,20 +49,37 @@ class SearchForm(forms.Form):
     min_rating = forms.FloatField(min_value=0, max_value=10, required=False, label='Min Rating')
     max_rating = forms.FloatField(min_value=0, max_value=10, required=False, label='Max Rating')
 
-    def _mechanics_queryset(self):
-        qs = Mechanic.objects.filter(is_common=True).order_by('name')
-        if qs.exists():
-            return qs
-        return Mechanic.objects.all().order_by('name')
-
-    mechanics = forms.ModelMultipleChoiceField(
-        queryset=Mechanic.objects.none(),  # replaced in __init__ to allow runtime check
+    mechanics = MechanicsField(
         required=False,
         label='Mechanisms',
         widget=forms.SelectMultiple(attrs={'size': 10}),
         help_text='Hold Ctrl/Cmd to select multiple.'
     )
+    mechanics_match = forms.ChoiceField(
+        choices=[
+            (MATCH_ANY, 'Any of these'),
+            (MATCH_ALL, 'All of these'),
+            (MATCH_NONE, 'None of these'),
+        ],
+        required=False,
+        initial=MATCH_ANY,
+        label='Match',
+    )
+    cursor = forms.CharField(required=False, widget=forms.HiddenInput)
+
+    def clean_cursor(self):
+        cursor = self.cleaned_data.get('cursor')
+        if not cursor:
+            return None
+        try:
+            # clean_q has run already (fields clean in order); a keyword query pages by relevance
+            return decode_cursor(cursor, relevance=bool(self.cleaned_data.get('q')))
+        except ValueError:
+            raise forms.ValidationError('Invalid page cursor.')
+
+    def clean_q(self):
+        # Folded to the words the index sees, so equivalent queries share a cache entry
+        return normalize_query(self.cleaned_data.get('q'))
 
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self.fields['mechanics'].queryset = self._mechanics_queryset()
+    def clean_mechanics_match(self):
+        return self.cleaned_data.get('mechanics_match') or MATCH_ANY
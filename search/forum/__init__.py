@@ -0,0 +1 @@
+"""Building blocks for the scrape_forum_mechanics command."""
@@ -0,0 +1,69 @@
+"""
+Running mention totals for a forum crawl, checkpointed to disk.
+
+Pages are counted as soon as they are fetched and then dropped, so the only
+state a crawl keeps is the per-mechanic totals and the set of page URLs
+already counted. Both are written to a small JSON file every few pages (and on
+interruption); a later run with the same checkpoint path picks up the totals
+and skips the pages it has already seen.
+"""
+import json
+import os
+from pathlib import Path
+
+
+class MentionTally:
+    def __init__(self, keys):
+        """Start all of `keys` (e.g. Mechanic ids) at zero mentions."""
+        self.counts = {key: 0 for key in keys}
+        self.pages = set()  # URLs already counted
+        self._unsaved = 0
+
+    def add_page(self, url, text, matcher):
+        """Count `text` into the totals; returns False if `url` was counted before."""
+        if url in self.pages:
+            return False
+        matcher.count(text, self.counts)
+        self.pages.add(url)
+        self._unsaved += 1
+        return True
+
+    @property
+    def dirty(self) -> int:
+        """Pages counted since the last save()."""
+        return self._unsaved
+
+    @property
+    def total(self) -> int:
+        return sum(self.counts.values())
+
+    def load(self, path) -> bool:
+        """Merge a checkpoint written by save(); returns False if there is none.
+
+        A file that can't be read back (e.g. truncated or edited by hand) is
+        treated like a missing one and leaves the tally untouched. Totals for
+        keys that no longer exist (e.g. deleted mechanics) are dropped.
+        """
+        try:
+            data = json.loads(Path(path).read_text())
+            counts = {int(key): int(count) for key, count in data['counts'].items()}
+            pages = [str(url) for url in data['pages']]
+        except (FileNotFoundError, ValueError, KeyError, TypeError, AttributeError):
+            return False
+        for key, count in counts.items():
+            if key in self.counts:
+                self.counts[key] = count
+        self.pages.update(pages)
+        return True
+
+    def save(self, path):
+        """Atomically write the totals and counted URLs to `path`."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f'{path.name}.{os.getpid()}.tmp')
+        tmp.write_text(json.dumps({
+            'counts': {str(key): count for key, count in self.counts.items() if count},
+            'pages': sorted(self.pages),
+        }))
+        os.replace(tmp, path)
+        self._unsaved = 0
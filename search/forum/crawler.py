@@ -0,0 +1,252 @@
+"""
+Concurrent crawler for BGG forum listings and thread pages.
+
+One asyncio scheduler owns all crawl state: a deque frontier, a set of every
+URL ever enqueued (shared across all start URLs, and seeded with pages a
+resumed run already counted) and the page budget. It keeps up to
+`concurrency` fetches in flight; the blocking parts (requests, HTML parsing)
+run in worker threads via asyncio.to_thread.
+
+Politeness is per host: requests to one host are spaced at least `delay`
+seconds apart however many are in flight, and a 429/5xx or network error
+pushes that host's next slot back (honoring Retry-After), so every pending
+request to the host backs off together rather than each retrying on its own.
+"""
+import asyncio
+from collections import deque
+import re
+import threading
+import time
+from urllib.parse import parse_qs, quote, urljoin, urlparse, urlsplit
+
+import requests
+
+from search.bgg.client import retry_after
+from search.bgg.httpcache import canonical_url
+
+from .extract import get_extractor
+
+# Browser-like defaults; the forum blocks obvious bots
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/118.0 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.9',
+    'Connection': 'keep-alive',
+}
+
+_THREAD_MARKERS = ('/thread/', '/article/', '/post/')
+_PAGINATION_MARKERS = ('/page/', 'page=', 'pageid=')
+# Thread links in raw HTML, for JS-rendered or obfuscated listings
+_LINK_PATTERNS = [
+    re.compile(r"https?://[^\s\"']*(?:boardgamegeek|geekdo)\.com/(?:thread|article|post)/[^\s\"']+"),
+    re.compile(r"/(?:thread|article|post)/[\w\-\./]+"),
+]
+
+
+def is_thread_url(url) -> bool:
+    return any(marker in url for marker in _THREAD_MARKERS)
+
+
+def seed_urls(url):
+    """The start URL, plus legacy server-rendered search pages for the JS-rendered
+    /forums/search app (which has no links in its HTML)."""
+    seeds = [url]
+    us = urlsplit(url)
+    if 'boardgamegeek.com' in us.netloc and us.path.startswith('/forums/search'):
+        term = parse_qs(us.query).get('searchTerm', [''])[0]
+        if term:
+            for objecttype in ('thread', 'article'):
+                seeds.append(
+                    f'https://boardgamegeek.com/geeksearch.php?action=search&objecttype={objecttype}&q={quote(term)}'
+                )
+    return seeds
+
+
+def parse_page(url, resp, depth, max_depth, extractor):
+    """Return (text, links, scanned) for a fetched page, using `extractor`
+    (see search.forum.extract).
+
+    Thread pages yield their text and no links. Listing pages yield the thread
+    links on them as (url, depth + 1), plus same-host pagination links while
+    depth < max_depth; a listing with no thread links at all yields its own
+    text instead, so it is counted once. `scanned` is the number of anchors seen.
+    """
+    if is_thread_url(url):
+        text, _ = extractor.extract(resp.content, links=False)
+        return text, [], 0
+
+    text, hrefs = extractor.extract(resp.content)
+    threads = []
+    pages = []
+    host = urlparse(url).netloc
+    for href in hrefs:
+        abs_url = urljoin(url, href)
+        if is_thread_url(href):
+            threads.append(abs_url)
+        elif depth < max_depth and any(m in href for m in _PAGINATION_MARKERS) and urlparse(abs_url).netloc == host:
+            pages.append(abs_url)
+
+    if not threads:
+        html = resp.text
+        for pattern in _LINK_PATTERNS:
+            for match in pattern.findall(html):
+                abs_url = urljoin(url, match)
+                if is_thread_url(abs_url):
+                    threads.append(abs_url)
+
+    links = [(link, depth + 1) for link in threads + pages]
+    return (None if threads else text), links, len(hrefs)
+
+
+class HostPacer:
+    """Per-host request spacing, for use from a single event loop."""
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self._next = {}  # host -> earliest monotonic time for its next request
+
+    async def wait(self, host):
+        """Reserve the host's next slot and sleep until it comes up."""
+        now = time.monotonic()
+        slot = max(now, self._next.get(host, now))
+        self._next[host] = slot + self.delay
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+    def penalize(self, host, seconds: float):
+        """Hold off every request to `host` for at least `seconds`."""
+        self._next[host] = max(self._next.get(host, 0.0), time.monotonic() + seconds)
+
+
+class ForumCrawler:
+    def __init__(self, concurrency: int = 4, delay: float = 0.5, max_depth: int = 1,
+                 max_pages: int = 200, timeout: float = 20, retries: int = 3,
+                 backoff: float = 1.5, cache=None, extractor=None, info=print, error=print):
+        self.concurrency = max(1, concurrency)
+        self.pacer = HostPacer(delay)
+        self.max_depth = max_depth
+        self.max_pages = max_pages
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.cache = cache
+        self.extractor = extractor or get_extractor()
+        self.info = info
+        self.error = error
+        self._local = threading.local()
+
+    def crawl(self, start_urls, counted: set, on_page):
+        """Crawl from `start_urls`, calling on_page(url, text) as each page arrives.
+
+        `counted` holds the URLs already analyzed; they are never fetched, and
+        the crawl stops once on_page has brought it to max_pages. on_page is
+        expected to add the URL to `counted`.
+        """
+        asyncio.run(self._run(start_urls, counted, on_page))
+
+    async def _run(self, start_urls, counted, on_page):
+        frontier = deque()
+        seen = set(counted)
+        for url in start_urls:
+            seeds = seed_urls(url)
+            if len(seeds) > 1:
+                self.info(f'Enqueued legacy search pages for {url}')
+            for seed in seeds:
+                if seed not in seen:
+                    seen.add(seed)
+                    frontier.append((seed, 0))
+
+        pending = {}  # task -> (url, is thread page)
+        reserved = 0  # thread pages in flight, held against the budget
+        while pending or (frontier and len(counted) + reserved < self.max_pages):
+            while frontier and len(pending) < self.concurrency and len(counted) + reserved < self.max_pages:
+                url, depth = frontier.popleft()
+                thread = is_thread_url(url)
+                reserved += thread
+                pending[asyncio.ensure_future(self._visit(url, depth))] = (url, thread)
+
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                url, thread = pending.pop(task)
+                reserved -= thread
+                try:
+                    text, links = task.result()
+                except Exception as e:
+                    self.error(f'Error processing {url}: {e}')
+                    continue
+                for link in links:
+                    if link[0] not in seen:
+                        seen.add(link[0])
+                        frontier.append(link)
+                if text and len(counted) + reserved < self.max_pages:
+                    on_page(url, text)
+
+    async def _visit(self, url, depth):
+        resp = await self._fetch(url)
+        if resp is None:
+            return None, []
+        text, links, scanned = await asyncio.to_thread(parse_page, url, resp, depth, self.max_depth, self.extractor)
+        if not is_thread_url(url):
+            threads = sum(1 for link, _ in links if is_thread_url(link))
+            self.info(f'Parsed links on {url}: scanned {scanned}, found {threads} thread/article/post links.')
+        elif not text:
+            self.info(f'Empty content at {url}, skipping.')
+        return text, links
+
+    def _session(self):
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = requests.Session()
+            session.headers.update(DEFAULT_HEADERS)
+        return session
+
+    def _get(self, url, key, headers):
+        """Blocking GET (run in a worker thread); records 2xx responses in the cache."""
+        resp = self._session().get(url, timeout=self.timeout, headers=headers)
+        if self.cache and 200 <= resp.status_code < 300:
+            self.cache.store(key, resp)
+        return resp
+
+    async def _fetch(self, url):
+        # Raw-response cache: replay in --offline mode, revalidate otherwise
+        key = canonical_url(url)
+        entry = self.cache.lookup(key) if self.cache else None
+        if self.cache and self.cache.offline:
+            if entry is None:
+                self.error(f'Not in response cache (offline): {url}')
+                return None
+            return entry.response()
+        if entry is not None and entry.is_fresh():
+            return entry.response()
+        conditional = entry.validators() if entry is not None else {}
+
+        host = urlsplit(url).netloc
+        last_err = None
+        for attempt in range(1, self.retries + 1):
+            await self.pacer.wait(host)
+            try:
+                resp = await asyncio.to_thread(self._get, url, key, conditional)
+            except requests.RequestException as e:
+                last_err = e
+                self.pacer.penalize(host, self.backoff * attempt)
+                continue
+            status = resp.status_code
+            if status == 304 and entry is not None:
+                self.cache.refresh(entry)
+                return entry.response()
+            clen = resp.headers.get('Content-Length') or len(resp.content)
+            self.info(f'GET {url} -> {status} ({clen} bytes) [attempt {attempt}]')
+            if status == 429 or 500 <= status < 600:
+                last_err = f'HTTP {status}'
+                self.pacer.penalize(host, retry_after(resp, self.backoff * attempt))
+            elif status == 403:
+                # Likely blocked; don't hammer further
+                self.error(f'HTTP 403 for {url}. Consider increasing --sleep or retrying later.')
+                return None
+            elif status >= 400:
+                self.error(f'HTTP {status} for {url}')
+                return None
+            else:
+                return resp
+        self.error(f'Failed to fetch {url}: {last_err}')
+        return None
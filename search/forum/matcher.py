@@ -0,0 +1,86 @@
+"""
+Single-pass, multi-pattern mention counter for mechanic names.
+
+An Aho-Corasick automaton is built once over the tokenized mechanic names, and
+each page is scanned a single time with counts for every mechanic collected
+along the way. The cost is linear in the text length, not in
+(mechanics x text) as with one regex per name.
+
+Matching works on tokens: runs of word characters, single punctuation
+characters, and runs of whitespace (which all match one another). Names can
+only match on token edges, which gives the same word-boundary behaviour as
+r'\\bname\\b'. Text and names are case-folded with str.lower(), as
+re.IGNORECASE does. As with re.findall, occurrences of the same name never
+overlap, while different names may overlap (e.g. "Worker Placement" inside
+"Worker Placement with Dice Workers").
+"""
+from collections import deque
+import re
+
+_TOKEN = re.compile(r'\w+|\s+|[^\w\s]')
+_SPACE = ' '
+
+
+def _tokens(text):
+    for token in _TOKEN.findall(text.lower()):
+        yield _SPACE if token.isspace() else token
+
+
+class MechanicMatcher:
+    def __init__(self, names):
+        """`names` maps a key (e.g. Mechanic.id) to the name to count."""
+        self._symbols = {}  # token string -> int symbol
+        goto = [{}]  # node -> {symbol: node}
+        outputs = [[]]  # node -> [(key, length in tokens)]
+        for key, name in names.items():
+            symbols = [self._symbols.setdefault(t, len(self._symbols)) for t in _tokens(name.strip())]
+            if not symbols:
+                continue
+            node = 0
+            for symbol in symbols:
+                nxt = goto[node].get(symbol)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[node][symbol] = nxt
+                    goto.append({})
+                    outputs.append([])
+                node = nxt
+            outputs[node].append((key, len(symbols)))
+
+        # Breadth-first failure links; each node inherits its fallback's outputs
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for symbol, child in goto[node].items():
+                queue.append(child)
+                f = fail[node]
+                while f and symbol not in goto[f]:
+                    f = fail[f]
+                target = goto[f].get(symbol, 0)
+                fail[child] = target if target != child else 0
+                outputs[child] = outputs[child] + outputs[fail[child]]
+        self._goto = goto
+        self._fail = fail
+        self._outputs = outputs
+
+    def count(self, text, totals=None):
+        """Add the mention counts found in `text` to `totals` (a dict) and return it."""
+        if totals is None:
+            totals = {}
+        goto, fail, outputs, symbols = self._goto, self._fail, self._outputs, self._symbols
+        last_end = {}  # key -> token index just past its previous occurrence
+        node = 0
+        for position, token in enumerate(_tokens(text), 1):
+            symbol = symbols.get(token)
+            if symbol is None:
+                node = 0  # token appears in no name: nothing can span it
+                continue
+            while node and symbol not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(symbol, 0)
+            for key, length in outputs[node]:
+                if position - length >= last_end.get(key, 0):
+                    last_end[key] = position
+                    totals[key] = totals.get(key, 0) + 1
+        return totals
@@ -0,0 +1,249 @@
+"""
+Bulk write path for game/mechanic ingestion.
+
+A parsed batch of game records is written with a handful of set-based
+statements inside one transaction: an upsert for games, an upsert for the
+mechanics they link to, and a diff of the Game.mechanics through table.
+Games whose parsed content hash is unchanged are not rewritten; only their
+fetch bookkeeping (fetched_at, rank) is touched. Bulk operations bypass model
+signals, so callers bump the data version once the run is done.
+
+Mechanic.usage_count (games per mechanic) is kept current from the same link
+diff, with one relative UPDATE per distinct delta, so popularity never needs a
+full scan of the through table; verify_usage_counts() reconciles it against a
+full count if it ever drifts (e.g. after edits that bypass this module).
+The is_common flags are re-ranked the same way, one read and one bulk UPDATE
+in a single transaction: from usage_count (refresh_common_mechanics), or from
+forum mention counts, which are stored in mentions_count (store_mechanic_counts).
+"""
+from collections import Counter, defaultdict
+import hashlib
+import json
+
+from django.db import transaction
+from django.db.models import Count, F, Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import Game, Mechanic, description_snippet
+
+CONTENT_FIELDS = [
+    'name', 'year', 'min_players', 'max_players', 'playing_time',
+    'weight', 'rating', 'thumbnail', 'description',
+]
+GAME_UPDATE_FIELDS = CONTENT_FIELDS + ['description_snippet', 'rank', 'fetched_at', 'content_hash']
+
+
+def content_hash(record) -> str:
+    """Hash of everything a record would write, apart from rank and fetch time."""
+    payload = [record.get(name) for name in CONTENT_FIELDS]
+    payload.append(sorted(record['mechanics']))
+    return hashlib.sha1(json.dumps(payload, separators=(',', ':')).encode()).hexdigest()
+
+
+class BatchResult:
+    __slots__ = ('created', 'updated', 'unchanged', 'links_added', 'links_removed')
+
+    def __init__(self, created=0, updated=0, unchanged=0, links_added=0, links_removed=0):
+        self.created = created
+        self.updated = updated
+        self.unchanged = unchanged
+        self.links_added = links_added
+        self.links_removed = links_removed
+
+
+def upsert_games(records) -> BatchResult:
+    """Insert or refresh the games in `records` and replace their mechanic links.
+
+    Each record is a dict as produced by search.bgg.parsing.iter_things:
+    the Game fields plus 'mechanics', a list of (mechanic bgg_id, name), and
+    optionally 'rank'. Records whose content hash matches the stored one only
+    get their fetched_at/rank refreshed.
+    """
+    now = timezone.now()
+    incoming = {r['bgg_id']: r for r in records}  # last one wins on duplicates
+    if not incoming:
+        return BatchResult()
+
+    Through = Game.mechanics.through
+    with transaction.atomic():
+        existing = {
+            bgg_id: (pk, stored_hash, rank)
+            for pk, bgg_id, stored_hash, rank in Game.objects.order_by()
+            .filter(bgg_id__in=incoming)
+            .values_list('id', 'bgg_id', 'content_hash', 'rank')
+        }
+        by_id = {}
+        rank_moved = []
+        untouched = []
+        for bgg_id, record in incoming.items():
+            digest = content_hash(record)
+            pk, stored_hash, stored_rank = existing.get(bgg_id, (None, None, None))
+            rank = record.get('rank', stored_rank)
+            if digest != stored_hash:
+                by_id[bgg_id] = dict(
+                    record, rank=rank, content_hash=digest, fetched_at=now,
+                    description_snippet=description_snippet(record.get('description')),
+                )
+            elif rank != stored_rank:
+                rank_moved.append(Game(id=pk, rank=rank, fetched_at=now))
+            else:
+                untouched.append(bgg_id)
+        unchanged = len(incoming) - len(by_id)
+
+        if untouched:
+            Game.objects.filter(bgg_id__in=untouched).update(fetched_at=now)
+        if rank_moved:
+            Game.objects.bulk_update(rank_moved, ['rank', 'fetched_at'])
+        if not by_id:
+            return BatchResult(unchanged=unchanged)
+
+        mechanic_names = {}
+        for record in by_id.values():
+            for mech_id, mech_name in record['mechanics']:
+                mechanic_names[mech_id] = mech_name
+
+        Game.objects.bulk_create(
+            [Game(**{k: v for k, v in r.items() if k != 'mechanics'}) for r in by_id.values()],
+            update_conflicts=True,
+            unique_fields=['bgg_id'],
+            update_fields=GAME_UPDATE_FIELDS,
+        )
+        if mechanic_names:
+            Mechanic.objects.bulk_create(
+                [Mechanic(bgg_id=mid, name=name) for mid, name in mechanic_names.items()],
+                update_conflicts=True,
+                unique_fields=['bgg_id'],
+                update_fields=['name'],
+            )
+
+        # Map BGG ids to primary keys (bulk upserts don't reliably return pks)
+        game_pks = dict(Game.objects.order_by().filter(bgg_id__in=by_id).values_list('bgg_id', 'id'))
+        mechanic_pks = dict(
+            Mechanic.objects.filter(bgg_id__in=mechanic_names).values_list('bgg_id', 'id')
+        )
+        wanted = {
+            (game_pks[gid], mechanic_pks[mid])
+            for gid, record in by_id.items()
+            for mid, _ in record['mechanics']
+        }
+        current = {
+            (game_id, mechanic_id): pk
+            for pk, game_id, mechanic_id in Through.objects
+            .filter(game_id__in=game_pks.values())
+            .values_list('id', 'game_id', 'mechanic_id')
+        }
+        stale = {link: pk for link, pk in current.items() if link not in wanted}
+        if stale:
+            Through.objects.filter(id__in=stale.values()).delete()
+        added = [
+            Through(game_id=game_id, mechanic_id=mechanic_id)
+            for game_id, mechanic_id in wanted
+            if (game_id, mechanic_id) not in current
+        ]
+        Through.objects.bulk_create(added, ignore_conflicts=True)
+
+        deltas = Counter(link.mechanic_id for link in added)
+        deltas.subtract(mechanic_id for _, mechanic_id in stale)
+        _apply_usage_deltas(deltas)
+
+    new = sum(1 for bgg_id in by_id if bgg_id not in existing)
+    return BatchResult(
+        created=new,
+        updated=len(by_id) - new,
+        unchanged=unchanged,
+        links_added=len(added),
+        links_removed=len(stale),
+    )
+
+
+def _apply_usage_deltas(deltas):
+    """Shift Mechanic.usage_count by {mechanic pk: delta}, one UPDATE per distinct delta."""
+    by_delta = defaultdict(list)
+    for mechanic_id, delta in deltas.items():
+        if delta:
+            by_delta[delta].append(mechanic_id)
+    for delta, ids in by_delta.items():
+        shifted = F('usage_count') + delta
+        if delta < 0:
+            shifted = Greatest(shifted, Value(0))  # never underflow a drifted counter
+        Mechanic.objects.filter(id__in=ids).update(usage_count=shifted)
+
+
+def verify_usage_counts(repair=True):
+    """Compare Mechanic.usage_count with a full count of the through table.
+
+    Returns [(mechanic, stored, actual)] for every mismatch; with repair=True
+    the stored counters are corrected in one bulk UPDATE.
+    """
+    with transaction.atomic():
+        actual = dict(
+            Game.mechanics.through.objects
+            .values('mechanic_id')
+            .annotate(n=Count('game_id'))
+            .values_list('mechanic_id', 'n')
+        )
+        drift = []
+        for mechanic in Mechanic.objects.select_for_update().only('id', 'name', 'usage_count'):
+            count = actual.get(mechanic.id, 0)
+            if mechanic.usage_count != count:
+                drift.append((mechanic, mechanic.usage_count, count))
+                mechanic.usage_count = count
+        if repair and drift:
+            Mechanic.objects.bulk_update([m for m, _, _ in drift], ['usage_count'], batch_size=500)
+    return drift
+
+
+def refresh_common_mechanics(top_k, min_count=1):
+    """Re-flag the top-K mechanics by their maintained usage_count (no aggregation).
+
+    mentions_count, which holds forum mention counts, is left alone. Same
+    result shape as store_mechanic_counts().
+    """
+    with transaction.atomic():
+        mechanics = list(Mechanic.objects.select_for_update().only('id', 'name', 'usage_count', 'is_common'))
+        usage = {m.id: m.usage_count for m in mechanics}
+        ranked = _top_mechanics(mechanics, usage, top_k, min_count)
+        common = {m.id for m in ranked}
+        changed = []
+        for m in mechanics:
+            flag = m.id in common
+            if m.is_common != flag:
+                m.is_common = flag
+                changed.append(m)
+        Mechanic.objects.bulk_update(changed, ['is_common'], batch_size=500)
+    return len(changed), [(m.name, usage[m.id]) for m in ranked]
+
+
+def store_mechanic_counts(counts, top_k, min_count=1):
+    """Set Mechanic.mentions_count from `counts` and flag the top-K as common.
+
+    `counts` maps Mechanic pk to its count; mechanics missing from it get 0.
+    The top `top_k` mechanics with at least `min_count` (ties broken by name)
+    become is_common, all others are cleared. Only rows whose values change
+    are written, in one bulk UPDATE inside one transaction, so readers never
+    see a half-reset is_common state. Returns (rows updated, [(name, count)]
+    for the flagged mechanics, highest first).
+    """
+    with transaction.atomic():
+        mechanics = list(Mechanic.objects.select_for_update().only('id', 'name', 'mentions_count', 'is_common'))
+        ranked = _top_mechanics(mechanics, counts, top_k, min_count)
+        common = {m.id for m in ranked}
+        changed = []
+        for m in mechanics:
+            count = counts.get(m.id, 0)
+            flag = m.id in common
+            if m.mentions_count != count or m.is_common != flag:
+                m.mentions_count = count
+                m.is_common = flag
+                changed.append(m)
+        Mechanic.objects.bulk_update(changed, ['mentions_count', 'is_common'], batch_size=500)
+    return len(changed), [(m.name, counts.get(m.id, 0)) for m in ranked]
+
+
+def _top_mechanics(mechanics, counts, top_k, min_count):
+    """The `top_k` mechanics with at least `min_count` in `counts`, highest first, ties by name."""
+    return sorted(
+        (m for m in mechanics if counts.get(m.id, 0) >= min_count),
+        key=lambda m: (-counts.get(m.id, 0), m.name),
+    )[:max(0, top_k)]
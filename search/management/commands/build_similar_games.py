@@ -0,0 +1,117 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from search.similarity import (
+    DEFAULT_BANDS, DEFAULT_MAX_CANDIDATES, DEFAULT_ROWS, GameVectors, exact_neighbors,
+    lsh_neighbors, store_neighbors,
+)
+
+EXACT_LIMIT = 2000  # --mode auto compares all pairs up to this many games
+
+
+class Command(BaseCommand):
+    help = (
+        "Precompute each game's most similar games (shared mechanics plus weight,\n"
+        "playing time and player range) into the SimilarGame table, served by\n"
+        "/game/<bgg_id>/similar. Small catalogs compare every pair; larger ones use\n"
+        "MinHash LSH over mechanic sets to pick candidates. --benchmark checks the\n"
+        "LSH result against exact neighbours for a sample of games."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--top-k', type=int, default=10,
+            help='Neighbours stored per game (default: 10)'
+        )
+        parser.add_argument(
+            '--mode', choices=['auto', 'exact', 'lsh'], default='auto',
+            help=f'exact compares all pairs; lsh scores MinHash candidates only; '
+                 f'auto uses exact up to {EXACT_LIMIT} games (default: auto)'
+        )
+        parser.add_argument(
+            '--bands', type=int, default=DEFAULT_BANDS,
+            help=f'LSH bands; more bands find less similar pairs (default: {DEFAULT_BANDS})'
+        )
+        parser.add_argument(
+            '--rows', type=int, default=DEFAULT_ROWS,
+            help=f'MinHash values per band; more rows make buckets stricter (default: {DEFAULT_ROWS})'
+        )
+        parser.add_argument(
+            '--max-candidates', type=int, default=DEFAULT_MAX_CANDIDATES,
+            help=f'Candidates scored per game in LSH mode (default: {DEFAULT_MAX_CANDIDATES})'
+        )
+        parser.add_argument(
+            '--benchmark', type=int, default=0, metavar='N',
+            help='Also compute exact neighbours for N random games and report LSH recall'
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Compute (and benchmark) without writing the table'
+        )
+
+    def handle(self, *args, **options):
+        top_k = options['top_k']
+        if top_k < 1:
+            raise CommandError('--top-k must be at least 1')
+        for option in ('bands', 'rows', 'max_candidates'):
+            if options[option] < 1:
+                raise CommandError(f"--{option.replace('_', '-')} must be at least 1")
+
+        started = time.perf_counter()
+        vectors = GameVectors.load()
+        if not len(vectors):
+            raise CommandError('No games found. Run "python manage.py fetch_top_games" first.')
+        self.stdout.write(f'Loaded {len(vectors)} games in {time.perf_counter() - started:.2f}s')
+
+        mode = options['mode']
+        if mode == 'auto':
+            mode = 'exact' if len(vectors) <= EXACT_LIMIT else 'lsh'
+        started = time.perf_counter()
+        if mode == 'exact':
+            neighbors = exact_neighbors(vectors, top_k)
+        else:
+            neighbors = lsh_neighbors(
+                vectors, top_k, bands=options['bands'], rows=options['rows'],
+                max_candidates=options['max_candidates'],
+            )
+        elapsed = time.perf_counter() - started
+        found = sum(len(ranked) for ranked in neighbors.values())
+        self.stdout.write(
+            f'{mode}: {found} neighbours for {len(neighbors)} games in {elapsed:.2f}s '
+            f'({elapsed / len(neighbors) * 1000:.2f} ms/game)'
+        )
+
+        if options['benchmark']:
+            self._benchmark(vectors, neighbors, top_k, options['benchmark'], elapsed)
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING('Dry run: SimilarGame table not written.'))
+            return
+        written = store_neighbors(vectors, neighbors)
+        self.stdout.write(self.style.SUCCESS(f'Stored {written} similar-game links.'))
+
+    def _benchmark(self, vectors, neighbors, top_k, sample_size, elapsed):
+        """Recall of `neighbors` against exact top-k for a random sample, and the extrapolated exact cost."""
+        sample = random.Random(0).sample(range(len(vectors)), min(sample_size, len(vectors)))
+        started = time.perf_counter()
+        exact = exact_neighbors(vectors, top_k, games=sample)
+        per_game = (time.perf_counter() - started) / len(sample)
+
+        hits = total = 0
+        score_ratio = []
+        for i in sample:
+            truth = {j for _, j in exact[i]}
+            got = {j for _, j in neighbors[i]}
+            hits += len(truth & got)
+            total += len(truth)
+            best = sum(score for score, _ in exact[i])
+            if best:
+                score_ratio.append(sum(score for score, _ in neighbors[i]) / best)
+        recall = hits / total if total else 1.0
+        quality = sum(score_ratio) / len(score_ratio) if score_ratio else 1.0
+        self.stdout.write(
+            f'Benchmark over {len(sample)} games: recall@{top_k} {recall:.3f}, '
+            f'score sum vs exact {quality:.3f}; exact costs {per_game * 1000:.1f} ms/game, '
+            f'~{per_game * len(vectors):.0f}s for the catalog (this run: {elapsed:.1f}s)'
+        )
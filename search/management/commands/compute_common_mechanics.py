@@ -1,13 +1,16 @@
 from django.core.management.base import BaseCommand
-from django.db.models import Count
-from search.models import Mechanic, Game
+from search.dataversion import bump_data_version
+from search.ingest import refresh_common_mechanics, verify_usage_counts
+from search.models import Game
 
 
 class Command(BaseCommand):
     help = (
         "Compute common mechanics using existing game data from the BGG XML API.\n"
-        "Counts how many Games reference each Mechanic (usage count), stores it in\n"
-        "Mechanic.mentions_count, and flags the top-K as Mechanic.is_common.\n"
+        "Ranks Mechanics by how many Games reference them (Mechanic.usage_count, kept\n"
+        "current by ingest) and flags the top-K as Mechanic.is_common; forum mention\n"
+        "counts in Mechanic.mentions_count are left alone. --verify first reconciles\n"
+        "the counters against a full count of the game/mechanic links.\n"
         "This avoids brittle forum scraping and uses authoritative API data already\n"
         "ingested by the fetch_top_games command."
     )
@@ -21,6 +24,10 @@ class Command(BaseCommand):
             '--min-count', type=int, default=1,
             help='Minimum usage count required to be eligible for common (default: 1)'
         )
+        parser.add_argument(
+            '--verify', action='store_true',
+            help='Recount every mechanic\'s games and repair any drifted usage counters first'
+        )
 
     def handle(self, *args, **options):
         top_k = options['top_k']
@@ -37,42 +44,25 @@ class Command(BaseCommand):
             f'Computing mechanic popularity from {total_games} games...'
         ))
 
-        # Reset is_common first
-        Mechanic.objects.update(is_common=False)
-
-        # Annotate usage counts via reverse m2m relation (related_query_name defaults to model name: "game")
-        qs = (
-            Mechanic.objects
-            .annotate(usage_count=Count('game', distinct=True))
-            .order_by('-usage_count', 'name')
-        )
-
-        # Update mentions_count for all mechanics in small batches
-        updated = 0
-        batch = []
-        for mech in qs:
-            batch.append((mech.id, mech.usage_count))
-        for mid, cnt in batch:
-            updated += Mechanic.objects.filter(id=mid).update(mentions_count=cnt)
-        self.stdout.write(self.style.SUCCESS(f'Updated mentions_count for {updated} mechanics.'))
+        if options['verify']:
+            drift = verify_usage_counts(repair=True)
+            if drift:
+                self.stdout.write(self.style.WARNING(f'Repaired usage_count for {len(drift)} mechanics:'))
+                for mechanic, stored, actual in drift[:10]:
+                    self.stdout.write(self.style.WARNING(f'  {mechanic.name}: {stored} -> {actual}'))
+            else:
+                self.stdout.write(self.style.SUCCESS('All usage counters match a full recount.'))
 
-        # Flag top-K mechanics with usage_count >= min_count
-        eligible = list(
-            qs.filter(usage_count__gte=min_count)
-              .values_list('id', flat=True)[:top_k]
-        )
-        if eligible:
-            Mechanic.objects.filter(id__in=eligible).update(is_common=True)
-            top_names = list(
-                Mechanic.objects.filter(id__in=eligible)
-                .order_by('-mentions_count', 'name')
-                .values_list('name', 'mentions_count')
-            )
-            self.stdout.write(self.style.SUCCESS(f'Flagged {len(eligible)} mechanics as common.'))
-            for name, c in top_names[:10]:
-                # Use NOTICE if available (Django 5 may not have it in all themes)
-                self.stdout.write(getattr(self.style, 'NOTICE', self.style.SUCCESS)(f'Top: {name} ({c})'))
+        # Rank from the maintained counters and re-flag the top-K in one transaction
+        updated, top = refresh_common_mechanics(top_k, min_count=min_count)
+        self.stdout.write(self.style.SUCCESS(f'Updated is_common for {updated} mechanics.'))
+        if top:
+            self.stdout.write(self.style.SUCCESS(f'Flagged {len(top)} mechanics as common.'))
+            for name, c in top[:10]:
+                self.stdout.write(self.style.NOTICE(f'Top: {name} ({c})'))
         else:
             self.stdout.write(self.style.WARNING('No mechanics met the min-count threshold; none flagged as common.'))
 
+        # Bulk updates bypass model signals, so invalidate search state explicitly
+        bump_data_version()
         self.stdout.write(self.style.SUCCESS('Computation complete.'))
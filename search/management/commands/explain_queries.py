@@ -0,0 +1,86 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from search.engine import GAME_FIELDS
+from search.models import Game, Mechanic, SimilarGame
+
+SAMPLE_IDS = [1, 2, 3]  # plan shapes don't depend on the values
+
+
+def _representative_queries():
+    """(label, queryset, should use an index) for the queries the app runs repeatedly."""
+    Through = Game.mechanics.through
+    return [
+        ('mechanic catalog build', Mechanic.objects.order_by().values_list('id', 'name', 'is_common', 'usage_count'), False),
+        ('search index build: games', Game.objects.order_by().values_list('id', *GAME_FIELDS), False),
+        ('search index build: links', Through.objects.values_list('game_id', 'mechanic_id'), False),
+        ('similar games build: vectors', Game.objects.order_by('-rating', '-id').values_list('id', 'weight', 'playing_time', 'min_players', 'max_players'), False),
+        ('similar games view: name', Game.objects.filter(bgg_id=SAMPLE_IDS[0]).values_list('name', flat=True)[:1], True),
+        ('similar games view: neighbours', SimilarGame.objects.filter(game__bgg_id=SAMPLE_IDS[0]).order_by('rank').values_list('similar_id', 'score'), True),
+        ('refresh: stored rank and fetch time', Game.objects.order_by().filter(bgg_id__in=SAMPLE_IDS).values_list('bgg_id', 'rank', 'fetched_at'), True),
+        ('ingest: stored state by bgg_id', Game.objects.order_by().filter(bgg_id__in=SAMPLE_IDS).values_list('id', 'bgg_id', 'content_hash', 'rank'), True),
+        ('ingest: current links of a batch', Through.objects.filter(game_id__in=SAMPLE_IDS).values_list('id', 'game_id', 'mechanic_id'), True),
+        ('ingest: mechanics by bgg_id', Mechanic.objects.filter(bgg_id__in=SAMPLE_IDS).values_list('bgg_id', 'id'), True),
+        # The changelist appends -pk to Meta.ordering as a tie-break
+        ('admin: game list', Game.objects.order_by('-rating', '-pk')[:100], True),
+    ]
+
+
+def _plan_problems(plan):
+    """Full table scans and sorts in an SQLite EXPLAIN QUERY PLAN."""
+    problems = []
+    for line in plan.splitlines():
+        words = line.split()
+        if 'SCAN' in words and 'INDEX' not in words:
+            problems.append(f'full scan of {words[words.index("SCAN") + 1]}')
+        elif 'TEMP' in words and 'B-TREE' in words:
+            problems.append('sort (temp B-tree)')
+    return problems
+
+
+class Command(BaseCommand):
+    help = (
+        "Print the database query plan for a representative set of the app's queries "
+        "(mechanic catalog, index build, similar games, refresh, ingest, admin), flagging full scans and sorts."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sql', action='store_true',
+            help='Also print the SQL of each query'
+        )
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Fail if a query that should use an index scans a table or sorts (for CI)'
+        )
+
+    def handle(self, *args, **options):
+        sqlite = connection.vendor == 'sqlite'
+        if not sqlite:
+            self.stdout.write(self.style.WARNING(
+                f'Plans are printed as-is for {connection.vendor}; scan/sort detection only understands SQLite.'
+            ))
+
+        regressions = []
+        for label, qs, indexed in _representative_queries():
+            plan = qs.explain()
+            problems = _plan_problems(plan) if sqlite else []
+            if not problems:
+                style = self.style.SUCCESS
+            elif indexed:
+                style = self.style.ERROR
+                regressions.append(f'{label}: {", ".join(problems)}')
+            else:
+                style = self.style.WARNING  # expected: this query reads the whole table
+            self.stdout.write(style(f'== {label}'))
+            if options['sql']:
+                self.stdout.write(str(qs.query))
+            for line in plan.splitlines():
+                self.stdout.write(f'   {line}')
+
+        if regressions:
+            message = 'Queries expected to use an index do not:\n  ' + '\n  '.join(regressions)
+            if options['check']:
+                raise CommandError(message)
+            self.stderr.write(self.style.ERROR(message))
+        else:
+            self.stdout.write(self.style.SUCCESS('All indexed queries use an index without sorting.'))
@@ -1,19 +1,27 @@
 from django.core.management.base import BaseCommand
-import requests
 import xml.etree.ElementTree as ET
+from search.bgg.client import BGG_BASE_URL, BGGClient
+from search.bgg.httpcache import add_cache_arguments, cache_from_options
 from search.models import Mechanic
 
 class Command(BaseCommand):
     help = 'Fetch all mechanics from BGG API and populate the database'
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--base-url', default=BGG_BASE_URL,
+            help='BGG base URL; point at a local stub server for testing'
+        )
+        add_cache_arguments(parser)
+
     def handle(self, *args, **options):
+        # Light rate limiting: at most 5 requests/second
+        client = BGGClient(base_url=options['base_url'], rate=5.0, workers=1, cache=cache_from_options(options))
         letters = list('abcdefghijklmnopqrstuvwxyz')
         for letter in letters:
             self.stdout.write(self.style.SUCCESS(f'Fetching mechanics starting with {letter}'))
-            url = f"https://boardgamegeek.com/xmlapi2/search?query={letter}&type=boardgamemechanic"
             try:
-                response = requests.get(url)
-                response.raise_for_status()
+                response = client.get('/xmlapi2/search', params={'query': letter, 'type': 'boardgamemechanic'})
                 root = ET.fromstring(response.content)
                 count = 0
                 skipped = 0
@@ -35,8 +43,6 @@ class Command(BaseCommand):
                         skipped += 1
                         self.stdout.write(self.style.WARNING(f'Skipped mechanic ID {bgg_id}: no name element'))
                 self.stdout.write(self.style.SUCCESS(f'Added/updated {count} mechanics for letter {letter} (skipped {skipped})'))
-                import time
-                time.sleep(0.2)  # Light rate limiting
             except Exception as e:
                 self.stderr.write(f'Error fetching {letter}: {e}')
         self.stdout.write(self.style.SUCCESS('Mechanics fetch complete!'))
@@ -1,180 +1,177 @@
+from datetime import timedelta
 from django.core.management.base import BaseCommand
-import requests
-from bs4 import BeautifulSoup
+from django.db import DatabaseError
+from django.utils import timezone
 import xml.etree.ElementTree as ET
-import re
-import time
-from search.models import Game, Mechanic
+from search.bgg.client import BGG_BASE_URL, BGGClient, batched
+from search.bgg.httpcache import add_cache_arguments, cache_from_options
+from search.bgg.parsing import parse_things
+from search.bgg.ranking import PAGE_SIZE, iter_ranked_ids
+from search.dataversion import bump_data_version
+from search.ingest import refresh_common_mechanics, upsert_games
+from search.models import Game
 
 class Command(BaseCommand):
-    help = 'Fetch top 1000 ranked board games from BGG, ingest details and mechanics into DB'
+    help = 'Fetch the top N (default 1000) ranked board games from BGG, ingest details and mechanics into DB'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--top-n', type=int, default=1000,
+            help='How many ranked games to ingest (default: 1000); ranking pages hold 100 games each'
+        )
+        parser.add_argument(
+            '--workers', type=int, default=4,
+            help='Concurrent detail requests in flight (default: 4)'
+        )
+        parser.add_argument(
+            '--rate', type=float, default=1.0,
+            help='Maximum requests per second across all workers; halves on HTTP 429 (default: 1.0)'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=20,
+            help='Game ids per /xmlapi2/thing request (default: 20, the API maximum)'
+        )
+        parser.add_argument(
+            '--retries', type=int, default=5,
+            help='Attempts per request before a batch is requeued (default: 5)'
+        )
+        parser.add_argument(
+            '--timeout', type=float, default=30,
+            help='Per-request timeout in seconds (default: 30)'
+        )
+        parser.add_argument(
+            '--base-url', default=BGG_BASE_URL,
+            help='BGG base URL; point at a local stub server for testing'
+        )
+        parser.add_argument(
+            '--incremental', action='store_true',
+            help='Only request games that are new, changed rank, or were fetched longer than --ttl-hours ago'
+        )
+        parser.add_argument(
+            '--ttl-hours', type=float, default=24 * 7,
+            help='With --incremental, refetch games whose data is older than this (default: 168)'
+        )
+        parser.add_argument(
+            '--common-top-k', type=int, default=0,
+            help='After ingest, re-flag the top-K mechanics by usage as common, replacing '
+                 'any flags set from forum mentions (default: 0, leave is_common untouched)'
+        )
+        add_cache_arguments(parser)
 
     def handle(self, *args, **options):
-        self.stdout.write(self.style.SUCCESS('Starting top 1000 games ingest...'))
-
-        # Step 1: Scrape top 1000 IDs from ranked pages (100/page, 10 pages)
-        all_ids = set()  # Use set to dedupe any issues
-        base_url = 'https://boardgamegeek.com/browse/boardgame'
-        params = {'sort': 'rank'}  # Explicit, though default
-        for page in range(1, 11):  # Pages 1-10
-            if page == 1:
-                url = base_url
-            else:
-                url = f'{base_url}/page/{page}'
-            self.stdout.write(self.style.WARNING(f'Scraping page {page}...'))
-            resp = requests.get(url, params=params)
-            resp.raise_for_status()
-            soup = BeautifulSoup(resp.content, 'html.parser')
-
-            # Find the rankings table (first <table> is usually it)
-            table = soup.find('table')
-            if not table:
-                self.stderr.write(self.style.ERROR(f'No table found on page {page}'))
-                continue
-            rows = table.find_all('tr')[1:]  # Skip header row
-
-            page_ids = []
-            skipped = 0
-            for row in rows:
-                tds = row.find_all('td')
-                if len(tds) < 3:
-                    skipped += 1
-                    continue
-
-                # Safe rank parsing: Skip non-game rows (e.g., footers with text like 'Expand Your Collection')
-                rank_cell = tds[0]
-                try:
-                    rank = int(rank_cell.text.strip())
-                except ValueError:
-                    skipped += 1
-                    continue
-
-                # Game ID link: In second <td> (index 1, thumbnail column)
-                name_cell = tds[1].find('a', href=True)
-                if not name_cell:
-                    skipped += 1
-                    continue
-                href = name_cell['href']
-                match = re.search(r'/boardgame/(\d+)', href)
-                if not match:
-                    skipped += 1
-                    continue
-                bgg_id = int(match.group(1))
-                page_ids.append(bgg_id)
-                all_ids.add(bgg_id)  # Dedupe
-                self.stdout.write(self.style.SUCCESS(f'Page {page}: Rank {rank} -> ID {bgg_id}'))
-
-            self.stdout.write(self.style.SUCCESS(f'Page {page}: Found {len(page_ids)} new IDs (skipped {skipped})'))
-
-            time.sleep(0.5)  # Light rate limit between pages
-
-        all_ids_list = list(all_ids)
-        self.stdout.write(self.style.SUCCESS(f'Total unique IDs: {len(all_ids_list)}. Now fetching details...'))
-
-        # Step 2: Batch-fetch details via XML API (20 at a time) with resilience
-        def _safe_int(val):
-            try:
-                return int(val) if val not in (None, '') else None
-            except Exception:
-                return None
-
-        def _safe_float(val):
-            try:
-                return float(val) if val not in (None, '') else None
-            except Exception:
-                return None
-
+        top_n = options['top_n']
+        self.stdout.write(self.style.SUCCESS(f'Starting top {top_n} games ingest...'))
+        client = BGGClient(
+            base_url=options['base_url'],
+            rate=options['rate'],
+            workers=options['workers'],
+            timeout=options['timeout'],
+            retries=options['retries'],
+            cache=cache_from_options(options),
+        )
+
+        # Steps 1 and 2 overlap: ranking pages are parsed lazily and their ids
+        # streamed straight into the detail fetcher, so memory is bounded by the
+        # batches in flight rather than by --top-n.
+        progress = {'ranked': 0, 'requested': 0}
+        ranked = iter_ranked_ids(client, top_n, on_page=self._report_page)
+        if options['incremental']:
+            ranked = self._due_for_refresh(ranked, options['ttl_hours'], progress)
+        pending_ranks = {}  # bgg_id -> rank for batches not stored yet
+
+        def id_batches():
+            for chunk in batched(ranked, options['batch_size']):
+                progress['requested'] += len(chunk)
+                pending_ranks.update((bgg_id, rank) for rank, bgg_id in chunk)
+                yield [bgg_id for _, bgg_id in chunk]
+
+        # Step 2: Batch-fetch details via XML API with resilience, then write
+        # each batch with bulk upserts in a single transaction
         created_count = 0
-        for i in range(0, len(all_ids_list), 20):
-            batch = all_ids_list[i:i+20]
+        updated_count = 0
+        unchanged_count = 0
+        failed_ids = []
+        # Batches are fetched concurrently under a shared rate limit; parsing and
+        # DB writes stay on this thread as each batch completes.
+        for batch, content, error in client.fetch_things(id_batches()):
             batch_str = ','.join(map(str, batch))
-            api_url = f'https://boardgamegeek.com/xmlapi2/thing?id={batch_str}&stats=1'
-
-            root = None
+            batch_ranks = {bgg_id: pending_ranks.pop(bgg_id, None) for bgg_id in batch}
+            if error is not None:
+                self.stderr.write(self.style.ERROR(f'Failed to fetch details for batch {batch_str}: {error}'))
+                failed_ids.extend(batch)
+                continue
             try:
-                api_resp = requests.get(api_url)
-                api_resp.raise_for_status()
-                root = ET.fromstring(api_resp.content)
-                self.stdout.write(self.style.SUCCESS(f'Fetched details for batch starting at index {i} ({len(batch)} ids)'))
-            except Exception as e:
-                self.stderr.write(self.style.ERROR(f'Failed to fetch/parse details for batch {batch_str}: {e}. Skipping this batch.'))
-                # Continue to next batch without raising
-                time.sleep(1)
+                records = parse_things(content)
+            except ET.ParseError as e:
+                self.stderr.write(self.style.ERROR(f'Failed to parse details for batch {batch_str}: {e}'))
+                failed_ids.extend(batch)
                 continue
 
-            for item in root.findall('item'):
-                try:
-                    bgg_id = _safe_int(item.get('id'))
-                    if not bgg_id:
-                        continue
-
-                    name_elem = item.find('name')
-                    name = name_elem.get('value', '') if name_elem is not None else ''
-                    if not name:
-                        continue
-
-                    # Basic fields (safe parsing)
-                    year_elem = item.find('yearpublished')
-                    year = _safe_int(year_elem.get('value')) if year_elem is not None else None
-
-                    min_p_elem = item.find('.//minplayers')
-                    min_players = _safe_int(min_p_elem.get('value')) if min_p_elem is not None else None
-
-                    max_p_elem = item.find('.//maxplayers')
-                    max_players = _safe_int(max_p_elem.get('value')) if max_p_elem is not None else None
-
-                    pt_elem = item.find('.//playingtime')
-                    playing_time = _safe_int(pt_elem.get('value')) if pt_elem is not None else None
-
-                    weight_elem = item.find('.//averageweight')
-                    weight = _safe_float(weight_elem.get('value')) if weight_elem is not None else None
-
-                    rating_elem = item.find('.//average')  # User avg rating
-                    rating = _safe_float(rating_elem.get('value')) if rating_elem is not None else None
-
-                    thumbnail = item.find('thumbnail').text if item.find('thumbnail') is not None else None
-
-                    desc_elem = item.find('description')
-                    description = desc_elem.text if desc_elem is not None else None
-
-                    # Create/update game
-                    game, created = Game.objects.get_or_create(
-                        bgg_id=bgg_id,
-                        defaults={
-                            'name': name,
-                            'year': year,
-                            'min_players': min_players,
-                            'max_players': max_players,
-                            'playing_time': playing_time,
-                            'weight': weight,
-                            'rating': rating,
-                            'thumbnail': thumbnail,
-                            'description': description,
-                        }
-                    )
-                    if created:
-                        created_count += 1
-
-                    # Link mechanics
-                    for link in item.findall("link[@type='boardgamemechanic']"):
-                        try:
-                            mech_id = _safe_int(link.get('id'))
-                            if not mech_id:
-                                continue
-                            mech_name = link.get('value', '')
-                            mechanic, _ = Mechanic.objects.get_or_create(
-                                bgg_id=mech_id,
-                                defaults={'name': mech_name or f'Mechanic {mech_id}'}
-                            )
-                            game.mechanics.add(mechanic)
-                        except Exception as e:
-                            self.stderr.write(self.style.WARNING(f'Failed to link mechanic for game {bgg_id}: {e}'))
-                            continue
-                except Exception as e:
-                    # Skip problematic item but keep batch processing
-                    self.stderr.write(self.style.WARNING(f'Skipped an item in batch {batch_str} due to error: {e}'))
-                    continue
-            # Rate limit: 1s between batches (even on success)
-            time.sleep(1)
-
-        self.stdout.write(self.style.SUCCESS(f'Ingest complete! Created/updated {created_count} games.'))
\ No newline at end of file
+            for record in records:
+                # The API can return ids we didn't ask for; their stored rank is left alone
+                rank = batch_ranks.get(record['bgg_id'])
+                if rank is not None:
+                    record['rank'] = rank
+            try:
+                result = upsert_games(records)
+            except DatabaseError as e:
+                self.stderr.write(self.style.ERROR(f'Failed to store batch {batch_str}: {e}'))
+                failed_ids.extend(batch)
+                continue
+            created_count += result.created
+            updated_count += result.updated
+            unchanged_count += result.unchanged
+            self.stdout.write(self.style.SUCCESS(
+                f'Stored {len(records)}/{len(batch)} games '
+                f'({result.created} new, {result.updated} refreshed, {result.unchanged} unchanged, '
+                f'+{result.links_added}/-{result.links_removed} mechanic links)'
+            ))
+
+        if failed_ids:
+            self.stderr.write(self.style.ERROR(
+                f'{len(failed_ids)} ids could not be ingested: {",".join(map(str, failed_ids))}'
+            ))
+
+        if options['incremental']:
+            self.stdout.write(self.style.SUCCESS(
+                f'Incremental mode: {progress["requested"]} of {progress["ranked"]} ranked games were new, moved or stale.'
+            ))
+
+        if (created_count or updated_count) and options['common_top_k'] > 0:
+            # Usage counters were kept current during ingest; re-ranking them needs no aggregation
+            _, top = refresh_common_mechanics(options['common_top_k'])
+            self.stdout.write(self.style.SUCCESS(f'Flagged {len(top)} mechanics as common by usage.'))
+
+        # Invalidate the search index and cached results in every web worker
+        if created_count or updated_count:
+            bump_data_version()
+        self.stdout.write(self.style.SUCCESS(
+            f'Ingest complete! Created {created_count}, updated {updated_count}, '
+            f'unchanged {unchanged_count} games.'
+        ))
+
+    def _report_page(self, page, found, skipped, error):
+        if error is not None:
+            self.stderr.write(self.style.ERROR(f'Ranking page {page} failed: {error}'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Page {page}: Found {found} new IDs (skipped {skipped})'))
+
+    def _due_for_refresh(self, ranked, ttl_hours, progress):
+        """Filter streamed (rank, bgg_id) pairs down to games that are new, moved rank, or stale.
+
+        Looks stored state up one ranking page at a time, so the whole catalog
+        never has to be held in memory.
+        """
+        cutoff = timezone.now() - timedelta(hours=ttl_hours)
+        for chunk in batched(ranked, PAGE_SIZE):
+            progress['ranked'] += len(chunk)
+            known = {
+                bgg_id: (rank, fetched_at)
+                for bgg_id, rank, fetched_at in Game.objects.order_by()
+                .filter(bgg_id__in=[bgg_id for _, bgg_id in chunk])
+                .values_list('bgg_id', 'rank', 'fetched_at')
+            }
+            for rank, bgg_id in chunk:
+                stored = known.get(bgg_id)
+                if stored is None or stored[0] != rank or stored[1] is None or stored[1] < cutoff:
+                    yield rank, bgg_id
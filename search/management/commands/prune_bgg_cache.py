@@ -0,0 +1,40 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from search.bgg.httpcache import ResponseCache
+
+
+class Command(BaseCommand):
+    help = (
+        "Prune the raw BGG response cache (settings.BGG_CACHE_DIR).\n"
+        "Every ingest command records responses there and nothing is evicted\n"
+        "automatically; this deletes records not fetched or revalidated within\n"
+        "--older-than days, and any stored body no remaining record uses."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than', type=float, default=30,
+            help='Remove records older than this many days (default: 30)'
+        )
+        parser.add_argument(
+            '--cache-dir', default=None,
+            help='Directory for raw BGG responses (default: settings.BGG_CACHE_DIR)'
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Report what would be removed without deleting anything'
+        )
+
+    def handle(self, *args, **options):
+        if options['older_than'] < 0:
+            raise CommandError('--older-than must not be negative')
+        directory = options['cache_dir'] or getattr(settings, 'BGG_CACHE_DIR', settings.BASE_DIR / 'bgg_cache')
+        cache = ResponseCache(directory)
+        if not cache.directory.is_dir():
+            self.stdout.write(self.style.WARNING(f'No response cache at {cache.directory}; nothing to prune.'))
+            return
+        records, bodies, freed = cache.prune(options['older_than'] * 86400, dry_run=options['dry_run'])
+        verb = 'Would remove' if options['dry_run'] else 'Removed'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {records} records and {bodies} bodies ({freed / 1024 / 1024:.1f} MiB) from {cache.directory}.'
+        ))
@@ -1,11 +1,13 @@
 from django.core.management.base import BaseCommand
-from django.db.models import F
+from search.bgg.httpcache import add_cache_arguments, cache_from_options
+from search.dataversion import bump_data_version
+from search.forum.checkpoint import MentionTally
+from search.forum.crawler import ForumCrawler
+from search.forum.extract import DEFAULT_EXTRACTOR, EXTRACTORS, get_extractor
+from search.forum.matcher import MechanicMatcher
+from search.ingest import store_mechanic_counts
 from search.models import Mechanic
-import requests
-from bs4 import BeautifulSoup
-import re
-import time
-from urllib.parse import urljoin, urlparse, urlsplit, parse_qs, urlencode, urlunsplit
+import os
 
 
 class Command(BaseCommand):
@@ -32,8 +34,26 @@ class Command(BaseCommand):
         )
         parser.add_argument(
             '--sleep', type=float, default=0.5,
-            help='Seconds to sleep between HTTP requests (default: 0.5)'
+            help='Minimum seconds between requests to the same host (default: 0.5)'
         )
+        parser.add_argument(
+            '--concurrency', type=int, default=4,
+            help='Maximum number of requests in flight (default: 4)'
+        )
+        parser.add_argument(
+            '--extractor', choices=sorted(EXTRACTORS), default=DEFAULT_EXTRACTOR,
+            help=f'Page text/link extractor (default: {DEFAULT_EXTRACTOR})'
+        )
+        parser.add_argument(
+            '--checkpoint', default=None,
+            help='JSON file for running totals; an interrupted crawl resumes from it '
+                 'and it is removed once the counts are saved'
+        )
+        parser.add_argument(
+            '--checkpoint-every', type=int, default=20,
+            help='Write the checkpoint after this many newly counted pages (default: 20)'
+        )
+        add_cache_arguments(parser)
 
     def handle(self, *args, **options):
         urls = options['urls']
@@ -41,220 +61,74 @@ class Command(BaseCommand):
         max_depth = options['max_depth']
         top_k = options['top_k']
         delay = options['sleep']
+        checkpoint = options['checkpoint']
+        checkpoint_every = max(1, options['checkpoint_every'])
 
-        # HTTP session with sane defaults to avoid being blocked
-        session = requests.Session()
-        session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/118.0 Safari/537.36',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8',
-            'Accept-Language': 'en-US,en;q=0.9',
-            'Connection': 'keep-alive',
-        })
-        timeout = 20
-        retries = 3
-        backoff = 1.5
-
-        # Preload mechanics and compile regexes for word-boundary, case-insensitive search
+        # Preload mechanics and build one multi-pattern matcher for word-boundary, case-insensitive search
         mechanics = list(Mechanic.objects.all().only('id', 'name'))
         if not mechanics:
             self.stderr.write(self.style.ERROR('No mechanics in DB. Run fetch_mechanics first.'))
             return
 
-        mech_patterns = []
-        for m in mechanics:
-            # Escape regex specials and use word boundaries where possible
-            name = m.name.strip()
-            if not name:
-                continue
-            pattern = re.compile(rf"\b{re.escape(name)}\b", re.IGNORECASE)
-            mech_patterns.append((m.id, pattern))
-
-        visited_threads = set()
-        aggregated_texts = []  # list of page texts from thread pages
-
-        for start_url in urls:
-            try:
-                self.stdout.write(self.style.WARNING(f'Fetching start URL: {start_url}'))
-                text_pages, new_threads = self._collect_from_url(session, start_url, max_depth, max_threads - len(visited_threads), delay, timeout, retries, backoff)
-                for turl, page_text in text_pages:
-                    if turl in visited_threads:
-                        continue
-                    visited_threads.add(turl)
-                    aggregated_texts.append(page_text)
-                if len(visited_threads) >= max_threads:
-                    break
-            except Exception as e:
-                self.stderr.write(self.style.ERROR(f'Error processing {start_url}: {e}'))
-
-        self.stdout.write(self.style.SUCCESS(f'Collected {len(aggregated_texts)} thread pages to analyze.'))
-
-        # Count mentions
-        counts = {m.id: 0 for m in mechanics}
-        for page_text in aggregated_texts:
-            for mid, patt in mech_patterns:
-                try:
-                    matches = patt.findall(page_text)
-                    if matches:
-                        counts[mid] += len(matches)
-                except Exception:
-                    # Skip problematic regex/page combo
-                    continue
-
-        total_mentions = sum(counts.values())
+        matcher = MechanicMatcher({m.id: m.name for m in mechanics if m.name.strip()})
+
+        # Each page is counted as soon as it is fetched and then dropped; only the
+        # running totals and the set of counted URLs are kept (and checkpointed)
+        tally = MentionTally(m.id for m in mechanics)
+        if checkpoint and tally.load(checkpoint):
+            self.stdout.write(self.style.WARNING(
+                f'Resuming from {checkpoint}: {len(tally.pages)} pages already counted, '
+                f'{tally.total} mentions so far.'
+            ))
+
+        def on_page(url, text):
+            tally.add_page(url, text, matcher)
+            if checkpoint and tally.dirty >= checkpoint_every:
+                tally.save(checkpoint)
+
+        crawler = ForumCrawler(
+            concurrency=options['concurrency'],
+            delay=delay,
+            max_depth=max_depth,
+            max_pages=max_threads,
+            cache=cache_from_options(options),
+            extractor=get_extractor(options['extractor']),
+            info=lambda msg: self.stdout.write(self.style.WARNING(msg)),
+            error=lambda msg: self.stderr.write(self.style.ERROR(msg)),
+        )
+        self.stdout.write(self.style.WARNING(f'Crawling {len(urls)} start URL(s)'))
+        try:
+            crawler.crawl(urls, tally.pages, on_page)
+        except KeyboardInterrupt:
+            if checkpoint:
+                tally.save(checkpoint)
+                self.stderr.write(self.style.WARNING(f'Interrupted; progress saved to {checkpoint}.'))
+            raise
+        if checkpoint and tally.dirty:
+            tally.save(checkpoint)
+
+        self.stdout.write(self.style.SUCCESS(f'Analyzed {len(tally.pages)} thread pages.'))
+
+        counts = tally.counts
+        total_mentions = tally.total
         self.stdout.write(self.style.SUCCESS(f'Total mechanic mentions found: {total_mentions}'))
 
-        # Persist: update mentions_count and flag top-K
-        # First, reset is_common
-        Mechanic.objects.update(is_common=False)
-
-        # Bulk update mentions_count in small batches
-        batch = []
-        for mid, c in counts.items():
-            batch.append((mid, c))
-        # Use simple loop updates to avoid complexity; DB size is small
-        updated = 0
-        for mid, c in batch:
-            updated += Mechanic.objects.filter(id=mid).update(mentions_count=c)
-        self.stdout.write(self.style.SUCCESS(f'Updated mentions_count for {updated} mechanics.'))
-
-        # Determine top-K by mentions_count (excluding zeros)
-        top_ids = list(
-            Mechanic.objects.filter(mentions_count__gt=0)
-            .order_by('-mentions_count', 'name')
-            .values_list('id', flat=True)[:top_k]
-        )
-        if top_ids:
-            Mechanic.objects.filter(id__in=top_ids).update(is_common=True)
-            top_names = list(Mechanic.objects.filter(id__in=top_ids).order_by('-mentions_count').values_list('name', 'mentions_count'))
-            self.stdout.write(self.style.SUCCESS(f'Flagged {len(top_ids)} mechanics as common.'))
-            for name, c in top_names[:10]:
-                self.stdout.write(self.style.NOTICE if hasattr(self.style, 'NOTICE') else self.style.SUCCESS(f'Top: {name} ({c})'))
+        # Persist: store mentions_count and re-flag the top-K in one transaction
+        updated, top = store_mechanic_counts(counts, top_k)
+        self.stdout.write(self.style.SUCCESS(f'Updated mentions_count/is_common for {updated} mechanics.'))
+        if top:
+            self.stdout.write(self.style.SUCCESS(f'Flagged {len(top)} mechanics as common.'))
+            for name, c in top[:10]:
+                self.stdout.write(self.style.NOTICE(f'Top: {name} ({c})'))
         else:
             self.stdout.write(self.style.WARNING('No mechanics had mentions > 0; nothing flagged as common.'))
 
-        self.stdout.write(self.style.SUCCESS('Scraping complete.'))
-
-    def _fetch(self, session: requests.Session, url: str, timeout: int, retries: int, backoff: float, delay: float):
-        last_err = None
-        for attempt in range(1, retries + 1):
+        # Bulk updates bypass model signals, so invalidate search state explicitly
+        bump_data_version()
+        if checkpoint:
+            # Counts are persisted; the next run starts a fresh crawl
             try:
-                resp = session.get(url, timeout=timeout)
-                status = resp.status_code
-                clen = resp.headers.get('Content-Length') or len(resp.content)
-                self.stdout.write(self.style.WARNING(f'GET {url} -> {status} ({clen} bytes) [attempt {attempt}]'))
-                # Retry on 429 or 5xx
-                if status == 429 or 500 <= status < 600:
-                    last_err = Exception(f'HTTP {status}')
-                elif status == 403:
-                    # Likely blocked; don't hammer further
-                    self.stderr.write(self.style.ERROR(f'HTTP 403 for {url}. Consider increasing --sleep or retrying later.'))
-                    return None
-                else:
-                    resp.raise_for_status()
-                    time.sleep(delay)
-                    return resp
-            except Exception as e:
-                last_err = e
-            # Backoff before next attempt if not last
-            if attempt < retries:
-                time.sleep(backoff * attempt)
-        self.stderr.write(self.style.ERROR(f'Failed to fetch {url}: {last_err}'))
-        return None
-
-    def _collect_from_url(self, session: requests.Session, url: str, max_depth: int, remaining_threads: int, delay: float, timeout: int, retries: int, backoff: float):
-        """
-        Given a forum listing or thread URL, collect thread page texts up to limits.
-        Returns: ([(thread_url, page_text), ...], count)
-        """
-        collected = []
-        visited = set()
-        queue = [(url, 0)]
-
-        # If starting from the modern forums search app (JS-rendered), also enqueue legacy server-rendered search pages
-        try:
-            us = urlsplit(url)
-            if 'boardgamegeek.com' in us.netloc and us.path.startswith('/forums/search'):
-                qs = parse_qs(us.query)
-                term = qs.get('searchTerm', [''])[0]
-                if term:
-                    legacy_thread = f"https://boardgamegeek.com/geeksearch.php?action=search&objecttype=thread&q={requests.utils.quote(term)}"
-                    legacy_article = f"https://boardgamegeek.com/geeksearch.php?action=search&objecttype=article&q={requests.utils.quote(term)}"
-                    queue.append((legacy_thread, 0))
-                    queue.append((legacy_article, 0))
-                    self.stdout.write(self.style.WARNING(f'Enqueued legacy search pages for term "{term}"'))
-        except Exception:
-            pass
-
-        while queue and remaining_threads > 0:
-            current, depth = queue.pop(0)
-            resp = self._fetch(session, current, timeout, retries, backoff, delay)
-            if resp is None:
-                continue
-
-            soup = BeautifulSoup(resp.content, 'lxml')
-
-            # If already a thread/article/post URL, capture its text content
-            if ('/thread/' in current) or ('/article/' in current) or ('/post/' in current):
-                text = soup.get_text(separator=' ', strip=True)
-                if text:
-                    collected.append((current, text))
-                    remaining_threads -= 1
-                else:
-                    self.stdout.write(self.style.WARNING(f'Empty content at {current}, skipping.'))
-                continue
-
-            # Otherwise treat as listing page: enqueue thread links and simple pagination
-            found_links = 0
-            enqueued = 0
-            for a in soup.find_all('a', href=True):
-                href = a['href']
-                abs_url = urljoin(current, href)
-                found_links += 1
-                if (('/thread/' in href) or ('/article/' in href) or ('/post/' in href)) and abs_url not in visited and remaining_threads > 0:
-                    visited.add(abs_url)
-                    queue.append((abs_url, depth + 1))
-                    enqueued += 1
-                # Basic pagination heuristics: links containing '/page/' or 'page=' on same host
-                elif depth < max_depth:
-                    if ('/page/' in href or 'page=' in href or 'pageid=' in href) and urlparse(abs_url).netloc == urlparse(current).netloc:
-                        next_url = abs_url
-                        if next_url not in visited:
-                            visited.add(next_url)
-                            queue.append((next_url, depth + 1))
-
-            # If no anchors discovered, try regex extraction on raw HTML (JS-rendered or obfuscated links)
-            if enqueued == 0 and remaining_threads > 0:
-                html = resp.text
-                regex_patterns = [
-                    r"https?://[^\s\"']*(?:boardgamegeek|geekdo)\.com/(?:thread|article|post)/[^\s\"']+",
-                    r"/(?:thread|article|post)/[\w\-\./]+",
-                ]
-                matches = set()
-                for rp in regex_patterns:
-                    try:
-                        for m in re.findall(rp, html):
-                            try:
-                                absu = urljoin(current, m)
-                                if absu not in visited and remaining_threads > 0:
-                                    if ('/thread/' in absu) or ('/article/' in absu) or ('/post/' in absu):
-                                        visited.add(absu)
-                                        queue.append((absu, depth + 1))
-                                        enqueued += 1
-                                        matches.add(absu)
-                            except Exception:
-                                continue
-                    except re.error:
-                        pass
-                if matches:
-                    self.stdout.write(self.style.WARNING(f'Regex extracted {len(matches)} candidate links from HTML.'))
-
-            self.stdout.write(self.style.WARNING(f'Parsed links on {current}: scanned {found_links}, enqueued {enqueued} thread/article/post links.'))
-
-            # Fallback: if we still couldn't find any detailed links at this level, count the listing page text itself once
-            if enqueued == 0 and remaining_threads > 0:
-                page_text = soup.get_text(separator=' ', strip=True)
-                if page_text:
-                    collected.append((current, page_text))
-                    remaining_threads -= 1
-
-        return collected, len(collected)
+                os.remove(checkpoint)
+            except FileNotFoundError:
+                pass
+        self.stdout.write(self.style.SUCCESS('Scraping complete.'))
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.7 on 2026-10-17 00:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('search', '0003_mechanic_common_fields'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='game',
+            name='content_hash',
+            field=models.CharField(blank=True, default='', max_length=40),
+        ),
+        migrations.AddField(
+            model_name='game',
+            name='fetched_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='game',
+            name='rank',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
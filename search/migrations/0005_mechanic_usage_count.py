@@ -0,0 +1,34 @@
+# Generated by Django 5.2.7 on 2026-10-17 09:12
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_usage_counts(apps, schema_editor):
+    Mechanic = apps.get_model('search', 'Mechanic')
+    Through = apps.get_model('search', 'Game').mechanics.through
+    usage = dict(
+        Through.objects.values('mechanic_id')
+        .annotate(n=Count('game_id'))
+        .values_list('mechanic_id', 'n')
+    )
+    mechanics = list(Mechanic.objects.filter(id__in=usage).only('id'))
+    for mechanic in mechanics:
+        mechanic.usage_count = usage[mechanic.id]
+    Mechanic.objects.bulk_update(mechanics, ['usage_count'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('search', '0004_game_fetch_tracking'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mechanic',
+            name='usage_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_usage_counts, migrations.RunPython.noop),
+    ]
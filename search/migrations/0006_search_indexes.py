@@ -0,0 +1,17 @@
+# Generated by Django 5.2.7 on 2026-10-17 01:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('search', '0005_mechanic_usage_count'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='game',
+            index=models.Index(fields=['-rating', '-id'], name='game_rating_id_idx'),
+        ),
+    ]
@@ -0,0 +1,75 @@
+# Generated by Django 5.2.7 on 2026-10-17 11:40
+
+from django.db import OperationalError, migrations, transaction
+
+# External-content FTS5 index over search_game, kept in step by triggers so that
+# every write path (ingest bulk upserts, admin, shell) updates it. See
+# search/textsearch.py, which falls back to an in-process index without it.
+CREATE_TABLE = """
+CREATE VIRTUAL TABLE search_game_fts USING fts5(
+    name, description,
+    content='search_game', content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2'
+)
+"""
+
+CREATE_TRIGGERS = [
+    """
+    CREATE TRIGGER search_game_fts_insert AFTER INSERT ON search_game BEGIN
+        INSERT INTO search_game_fts(rowid, name, description)
+        VALUES (new.id, new.name, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER search_game_fts_delete AFTER DELETE ON search_game BEGIN
+        INSERT INTO search_game_fts(search_game_fts, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER search_game_fts_update AFTER UPDATE OF name, description ON search_game BEGIN
+        INSERT INTO search_game_fts(search_game_fts, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+        INSERT INTO search_game_fts(rowid, name, description)
+        VALUES (new.id, new.name, new.description);
+    END
+    """,
+]
+
+DROP = [
+    'DROP TRIGGER IF EXISTS search_game_fts_insert',
+    'DROP TRIGGER IF EXISTS search_game_fts_delete',
+    'DROP TRIGGER IF EXISTS search_game_fts_update',
+    'DROP TABLE IF EXISTS search_game_fts',
+]
+
+
+def create_fulltext_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    try:
+        with transaction.atomic(using=schema_editor.connection.alias):
+            schema_editor.execute(CREATE_TABLE)
+    except OperationalError:
+        return  # SQLite built without FTS5
+    for sql in CREATE_TRIGGERS:
+        schema_editor.execute(sql)
+    schema_editor.execute("INSERT INTO search_game_fts(search_game_fts) VALUES ('rebuild')")
+
+
+def drop_fulltext_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for sql in DROP:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('search', '0006_search_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fulltext_index, drop_fulltext_index),
+    ]
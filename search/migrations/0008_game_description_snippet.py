@@ -0,0 +1,58 @@
+# Generated by Django 5.2.7 on 2026-10-17 01:22
+
+from importlib import import_module
+
+from django.db import migrations, models
+from django.db.models import Case, TextField, Value, When
+from django.db.models.functions import Coalesce, Concat, Length, Substr
+from django.db.models.lookups import GreaterThan
+
+SNIPPET = 200
+
+fulltext = import_module('search.migrations.0007_game_fulltext')
+
+
+def restore_fulltext_triggers(apps, schema_editor):
+    # Adding or removing a column rebuilds search_game on SQLite (new table,
+    # copy, drop, rename), which drops the FTS triggers from 0007 with it
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'search_game_fts'")
+        if cursor.fetchone() is None:
+            return  # SQLite built without FTS5; 0007 created nothing
+    for sql in fulltext.DROP[:-1]:  # the triggers, not the table
+        schema_editor.execute(sql)
+    for sql in fulltext.CREATE_TRIGGERS:
+        schema_editor.execute(sql)
+    schema_editor.execute("INSERT INTO search_game_fts(search_game_fts) VALUES ('rebuild')")
+
+
+def backfill_snippets(apps, schema_editor):
+    # One UPDATE; the truncation happens in the database (same rule as models.description_snippet)
+    Game = apps.get_model('search', 'Game')
+    Game.objects.update(description_snippet=Case(
+        When(description__isnull=True, then=Value('')),
+        When(GreaterThan(Length('description'), SNIPPET), then=Concat(Substr('description', 1, SNIPPET), Value('...'))),
+        default=Coalesce('description', Value('')),
+        output_field=TextField(),
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('search', '0007_game_fulltext'),
+    ]
+
+    operations = [
+        # Unapplying removes the column, another rebuild: restore the triggers after it
+        migrations.RunPython(migrations.RunPython.noop, restore_fulltext_triggers),
+        migrations.AddField(
+            model_name='game',
+            name='description_snippet',
+            field=models.CharField(blank=True, default='', editable=False, max_length=203),
+        ),
+        migrations.RunPython(restore_fulltext_triggers, migrations.RunPython.noop),
+        migrations.RunPython(backfill_snippets, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.7 on 2026-10-17 01:26
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('search', '0008_game_description_snippet'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SimilarGame',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('score', models.FloatField()),
+                ('game', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similar_links', to='search.game')),
+                ('similar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='search.game')),
+            ],
+            options={
+                'ordering': ['game', 'rank'],
+                'constraints': [models.UniqueConstraint(fields=('game', 'rank'), name='similar_game_rank_uniq')],
+            },
+        ),
+    ]
@@ -1,10 +1,21 @@
 from django.db import models
 
+DESCRIPTION_SNIPPET = 200  # characters of description shown on a result card
+
+
+def description_snippet(description) -> str:
+    """The card text for a description: its first DESCRIPTION_SNIPPET characters."""
+    if description and len(description) > DESCRIPTION_SNIPPET:
+        return description[:DESCRIPTION_SNIPPET] + '...'
+    return description or ''
+
 class Mechanic(models.Model):
     bgg_id = models.PositiveIntegerField(unique=True)
     name = models.CharField(max_length=100)
     mentions_count = models.PositiveIntegerField(default=0)
     is_common = models.BooleanField(default=False)
+    # Number of games linked to this mechanic; maintained by search.ingest
+    usage_count = models.PositiveIntegerField(default=0)
 
     def __str__(self):
         return self.name
@@ -20,10 +31,44 @@ class Game(models.Model):
     rating = models.FloatField(null=True, blank=True)  # Average user rating
     thumbnail = models.URLField(null=True, blank=True)
     description = models.TextField(null=True, blank=True)
+    # Derived from description on every write (save() here, bulk writes in search.ingest)
+    description_snippet = models.CharField(max_length=DESCRIPTION_SNIPPET + 3, blank=True, default='', editable=False)
     mechanics = models.ManyToManyField(Mechanic, blank=True)
+    # Ingest bookkeeping for incremental refreshes
+    rank = models.PositiveIntegerField(null=True, blank=True)  # Last seen BGG rank
+    fetched_at = models.DateTimeField(null=True, blank=True)
+    content_hash = models.CharField(max_length=40, blank=True, default='')
 
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        self.description_snippet = description_snippet(self.description)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'description' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'description_snippet'}
+        super().save(*args, **kwargs)
+
     class Meta:
         ordering = ['-rating']  # Default to highest rated
+        indexes = [
+            # Matches the admin changelist's order (Meta.ordering plus its -pk tie-break), so pages need no sort
+            models.Index(fields=['-rating', '-id'], name='game_rating_id_idx'),
+        ]
+
+class SimilarGame(models.Model):
+    """Precomputed "games like this" neighbours, rank 1 = most similar (see search.similarity)."""
+    game = models.ForeignKey(Game, on_delete=models.CASCADE, related_name='similar_links')
+    similar = models.ForeignKey(Game, on_delete=models.CASCADE, related_name='+')
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+
+    def __str__(self):
+        return f'{self.game_id} -> {self.similar_id} (#{self.rank})'
+
+    class Meta:
+        ordering = ['game', 'rank']
+        constraints = [
+            # Also the index behind /game/<bgg_id>/similar: one game's neighbours in rank order
+            models.UniqueConstraint(fields=['game', 'rank'], name='similar_game_rank_uniq'),
+        ]
@@ -0,0 +1,24 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from .dataversion import bump_data_version
+from .models import Game, Mechanic
+
+# Bumps wait for the surrounding transaction (admin saves run in one): a worker
+# that saw the new version before the commit would rebuild its index and caches
+# from the old rows and keep serving them under the new version.
+
+
+@receiver(post_save, sender=Game)
+@receiver(post_delete, sender=Game)
+@receiver(post_save, sender=Mechanic)
+@receiver(post_delete, sender=Mechanic)
+def _catalog_row_changed(sender, **kwargs):
+    transaction.on_commit(bump_data_version)
+
+
+@receiver(m2m_changed, sender=Game.mechanics.through)
+def _game_mechanics_changed(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        transaction.on_commit(bump_data_version)
@@ -0,0 +1,194 @@
+"""
+"Games like this": nearest neighbours over mechanics and play stats.
+
+Two games score
+
+    MECHANIC_SHARE * jaccard(mechanic sets) + (1 - MECHANIC_SHARE) * stats
+
+where stats averages, over the values both games have, how close their
+weights are (on the 1-5 scale), how close their playing times are (on a log
+scale, so 30 vs 60 minutes counts like 60 vs 120) and how much their player
+ranges overlap. Scores are in [0, 1].
+
+exact_neighbors() compares every pair, which is quadratic. lsh_neighbors()
+only scores candidate pairs: each game's mechanic set gets a MinHash
+signature, the signature is cut into `bands` bands of `rows` values, and
+games that agree on a whole band share a bucket. Pairs with Jaccard similarity
+s become candidates with probability 1 - (1 - s**rows)**bands (about 0.37 is
+the 50% point for the defaults). One more bucket per game groups games by
+coarse weight / playing time / player range, so games with few or no
+mechanics still get candidates. Each game takes at most `max_candidates`
+candidates, and those are ranked with the full score. Work is O(n * bands *
+max_candidates) instead of O(n**2).
+
+build_similar_games stores the top-K of either into the SimilarGame table.
+"""
+import heapq
+import math
+import random
+
+from django.db import transaction
+
+from .models import Game, SimilarGame
+
+MECHANIC_SHARE = 0.6
+_WEIGHT_RANGE = 4.0  # BGG weights run 1-5
+_TIME_SPREAD = math.log(20)  # playing times 20x apart are as dissimilar as it gets
+
+DEFAULT_BANDS = 20
+DEFAULT_ROWS = 3
+DEFAULT_MAX_CANDIDATES = 200
+_PRIME = (1 << 61) - 1  # MinHash hashes are (a * x + b) mod _PRIME
+
+
+class GameVectors:
+    """Per-game features for similarity, in the index's result order (best rated first)."""
+
+    __slots__ = ('pks', 'mechanics', 'weights', 'log_times', 'players')
+
+    def __init__(self, pks, mechanics, weights, log_times, players):
+        self.pks = pks
+        self.mechanics = mechanics  # frozenset of Mechanic pks
+        self.weights = weights  # weight / _WEIGHT_RANGE, or None
+        self.log_times = log_times  # log(playing_time), or None
+        self.players = players  # (min, max), or None
+
+    def __len__(self):
+        return len(self.pks)
+
+    @classmethod
+    def load(cls):
+        rows = list(
+            Game.objects.order_by('-rating', '-id')
+            .values_list('id', 'weight', 'playing_time', 'min_players', 'max_players')
+        )
+        position = {row[0]: i for i, row in enumerate(rows)}
+        mechanics = [set() for _ in rows]
+        for game_id, mechanic_id in Game.mechanics.through.objects.values_list('game_id', 'mechanic_id'):
+            mechanics[position[game_id]].add(mechanic_id)
+        players = []
+        for _, _, _, low, high in rows:
+            low = low or high
+            high = high or low
+            players.append((min(low, high), max(low, high)) if low else None)
+        return cls(
+            [row[0] for row in rows],
+            [frozenset(m) for m in mechanics],
+            [row[1] / _WEIGHT_RANGE if row[1] else None for row in rows],
+            [math.log(row[2]) if row[2] else None for row in rows],
+            players,
+        )
+
+    def score(self, i, j) -> float:
+        """Similarity of games i and j (positions, not pks)."""
+        a, b = self.mechanics[i], self.mechanics[j]
+        shared = len(a & b)
+        jaccard = shared / (len(a) + len(b) - shared) if shared else 0.0
+
+        parts = []
+        wi, wj = self.weights[i], self.weights[j]
+        if wi is not None and wj is not None:
+            parts.append(1.0 - abs(wi - wj))
+        ti, tj = self.log_times[i], self.log_times[j]
+        if ti is not None and tj is not None:
+            parts.append(max(0.0, 1.0 - abs(ti - tj) / _TIME_SPREAD))
+        pi, pj = self.players[i], self.players[j]
+        if pi is not None and pj is not None:
+            overlap = min(pi[1], pj[1]) - max(pi[0], pj[0]) + 1
+            if overlap > 0:
+                parts.append(overlap / (max(pi[1], pj[1]) - min(pi[0], pj[0]) + 1))
+            else:
+                parts.append(0.0)
+        stats = sum(parts) / len(parts) if parts else 0.0
+        return MECHANIC_SHARE * jaccard + (1 - MECHANIC_SHARE) * stats
+
+    def stats_cell(self, i):
+        """Coarse grid cell of game i's stats: half weight points, doublings of playing time, players."""
+        weight, log_time = self.weights[i], self.log_times[i]
+        return (
+            None if weight is None else round(weight * _WEIGHT_RANGE * 2),
+            None if log_time is None else round(log_time / math.log(2)),
+            self.players[i],
+        )
+
+    def top_k(self, i, candidates, k):
+        """[(score, j), ...] for the k best of `candidates` (positions), best first."""
+        score = self.score
+        return heapq.nlargest(k, ((score(i, j), j) for j in candidates if j != i), key=_by_score)
+
+
+def _by_score(item):
+    # Ties go to the better-rated game (lower position)
+    return item[0], -item[1]
+
+
+def exact_neighbors(vectors: GameVectors, k, games=None):
+    """{i: [(score, j), ...]} by comparing each game in `games` (default: all) with every game."""
+    everyone = range(len(vectors))
+    return {i: vectors.top_k(i, everyone, k) for i in (everyone if games is None else games)}
+
+
+def minhash_signatures(mechanics, permutations, seed=0):
+    """One MinHash signature (tuple of `permutations` ints) per mechanic set; None for empty sets."""
+    rng = random.Random(seed)
+    params = [(rng.randrange(1, _PRIME), rng.randrange(_PRIME)) for _ in range(permutations)]
+    hashes = {}  # mechanic pk -> its hash under every permutation
+    signatures = []
+    for ids in mechanics:
+        if not ids:
+            signatures.append(None)
+            continue
+        vectors = []
+        for mechanic_id in ids:
+            vector = hashes.get(mechanic_id)
+            if vector is None:
+                vector = hashes[mechanic_id] = tuple((a * mechanic_id + b) % _PRIME for a, b in params)
+            vectors.append(vector)
+        signatures.append(vectors[0] if len(vectors) == 1 else tuple(map(min, *vectors)))
+    return signatures
+
+
+def lsh_neighbors(vectors: GameVectors, k, bands=DEFAULT_BANDS, rows=DEFAULT_ROWS,
+                  max_candidates=DEFAULT_MAX_CANDIDATES, seed=0):
+    """{i: [(score, j), ...]} for every game, scoring only MinHash-LSH candidates."""
+    signatures = minhash_signatures(vectors.mechanics, bands * rows, seed)
+    buckets = {}
+    keys = []
+    for i, signature in enumerate(signatures):
+        own = [] if signature is None else [
+            (band, signature[band * rows:(band + 1) * rows]) for band in range(bands)
+        ]
+        own.append(('stats', vectors.stats_cell(i)))
+        for key in own:
+            buckets.setdefault(key, []).append(i)  # positions ascend, so best rated first
+        keys.append(own)
+
+    neighbors = {}
+    for i, own in enumerate(keys):
+        # Every bucket gets an equal share, so one crowded band can't crowd out the rest
+        quota = -(-max_candidates // len(own))
+        candidates = set()
+        for key in own:
+            taken = 0
+            for j in buckets[key]:
+                if j != i and j not in candidates:
+                    candidates.add(j)
+                    taken += 1
+                    if taken == quota:
+                        break
+        neighbors[i] = vectors.top_k(i, candidates, k)
+    return neighbors
+
+
+def store_neighbors(vectors: GameVectors, neighbors) -> int:
+    """Replace the SimilarGame table with `neighbors`; returns the number of rows written."""
+    pks = vectors.pks
+    links = [
+        SimilarGame(game_id=pks[i], similar_id=pks[j], rank=rank, score=round(score, 6))
+        for i, ranked in neighbors.items()
+        for rank, (score, j) in enumerate(ranked, start=1)
+    ]
+    with transaction.atomic():
+        SimilarGame.objects.all().delete()
+        SimilarGame.objects.bulk_create(links, batch_size=2000)
+    return len(links)
@@ -0,0 +1,90 @@
+import random
+
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+
+from search.autocomplete import MAX_LIMIT, PrefixIndex, complete
+from search.dataversion import bump_data_version
+from search.models import Game, Mechanic
+from search.textsearch import tokenize
+
+from .utils import SearchStateMixin
+
+
+class PrefixIndexTests(SimpleTestCase):
+    def setUp(self):
+        names = ['Worker Placement', 'Dice Rolling', 'Deck Building', 'Café International', 'Place Place', 'Area Control']
+        self.index = PrefixIndex((name, rank, name) for rank, name in enumerate(names))
+
+    def test_matches_any_word_and_following_words(self):
+        self.assertEqual(self.index.complete('pla'), ['Worker Placement', 'Place Place'])
+        self.assertEqual(self.index.complete('worker pl'), ['Worker Placement'])
+        self.assertEqual(self.index.complete('placement'), ['Worker Placement'])
+        self.assertEqual(self.index.complete('placement worker'), [])
+        self.assertEqual(self.index.complete('zz'), [])
+
+    def test_folds_case_and_accents(self):
+        for prefix in ('CAFE', 'café', 'Cafe Int', '  cafe,  INTER'):
+            self.assertEqual(self.index.complete(prefix), ['Café International'], prefix)
+
+    def test_limit_keeps_the_best_ranked(self):
+        self.assertEqual(self.index.complete('d', limit=1), ['Dice Rolling'])
+        self.assertEqual(self.index.complete('de', limit=5), ['Deck Building'])
+        self.assertEqual(self.index.complete('', limit=2), ['Worker Placement', 'Dice Rolling'])
+
+    def test_short_prefixes_agree_with_a_scan(self):
+        rng = random.Random(3)
+        words = ['alpha', 'alpine', 'beta', 'bravo', 'empire', 'emperor', 'quest', 'queen']
+        names = [' '.join(rng.sample(words, rng.randint(1, 3))) for _ in range(200)]
+        index = PrefixIndex((name, (rng.random(), i), i) for i, name in enumerate(names))
+        ranks = index.ranks
+        for prefix in {word[:n] for word in words for n in (1, 2)}:
+            for limit in (1, 7, MAX_LIMIT):
+                expected = sorted(
+                    (i for i, name in enumerate(names) if any(w.startswith(prefix) for w in tokenize(name))),
+                    key=ranks.__getitem__,
+                )[:limit]
+                self.assertEqual(index.complete(prefix, limit), expected, (prefix, limit))
+
+
+class CompleteTests(SearchStateMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Game.objects.create(bgg_id=1, name='Terraforming Mars', rating=8.4)
+        Game.objects.create(bgg_id=2, name='Mars Open', rating=6.1)
+        Game.objects.create(bgg_id=3, name='Tera', rating=None)
+        Mechanic.objects.create(bgg_id=10, name='Tile Placement', is_common=True, usage_count=40)
+        Mechanic.objects.create(bgg_id=11, name='Take That', is_common=True, usage_count=90)
+        Mechanic.objects.create(bgg_id=12, name='Tag Team', usage_count=500)
+
+    def names(self, kind, prefix, limit=10):
+        return [item['name'] for item in complete(kind, prefix, limit)]
+
+    def test_games_rank_by_rating(self):
+        self.assertEqual(self.names('games', 'mar'), ['Terraforming Mars', 'Mars Open'])
+        self.assertEqual(self.names('games', 'ter'), ['Terraforming Mars', 'Tera'])
+        self.assertEqual(complete('games', 'mars open')[0], {'id': 2, 'name': 'Mars Open', 'year': None, 'rating': 6.1})
+
+    def test_only_selectable_mechanics_by_usage(self):
+        self.assertEqual(self.names('mechanics', 't'), ['Take That', 'Tile Placement'])
+        self.assertEqual(self.names('mechanics', 'tag'), [])
+        self.assertEqual(self.names('mechanics', 't', limit=1), ['Take That'])
+
+    def test_rebuilt_after_a_data_version_bump(self):
+        self.assertEqual(self.names('games', 'ark'), [])
+        self.assertEqual(self.names('mechanics', 'tag'), [])
+        Game.objects.create(bgg_id=4, name='Ark Nova', rating=8.5)
+        Mechanic.objects.filter(bgg_id=12).update(is_common=True)
+        self.assertEqual(self.names('games', 'ark'), [])  # same version: still the old index
+        bump_data_version()
+        self.assertEqual(self.names('games', 'ark'), ['Ark Nova'])
+        self.assertEqual(self.names('mechanics', 't'), ['Tag Team', 'Take That', 'Tile Placement'])
+
+    def test_unknown_kind(self):
+        with self.assertRaises(ValueError):
+            complete('publishers', 'a')
+        self.assertEqual(self.client.get(reverse('autocomplete'), {'kind': 'publishers'}).status_code, 400)
+
+    def test_view_limits_and_serves_json(self):
+        response = self.client.get(reverse('autocomplete'), {'kind': 'games', 'q': 'MAR', 'limit': 1})
+        self.assertEqual(response.json(), {'results': [{'id': 1, 'name': 'Terraforming Mars', 'year': None, 'rating': 8.4}]})
@@ -0,0 +1,117 @@
+from collections import Counter, defaultdict
+import threading
+import time
+
+from django.test import SimpleTestCase
+
+from search.bgg.client import BGGClient, FetchError, batched
+
+from .utils import StubServer
+
+
+def _client(server, **kwargs):
+    options = {'rate': 200, 'workers': 2, 'retries': 3, 'backoff': 0.01}
+    options.update(kwargs)
+    return BGGClient(base_url=server.url, **options)
+
+
+class Script:
+    """Serves the given responses for a path in order, then repeats the last one."""
+
+    def __init__(self, **by_path):
+        self.by_path = {path.replace('_', '/'): list(responses) for path, responses in by_path.items()}
+        self._lock = threading.Lock()
+
+    def __call__(self, path, query, headers):
+        with self._lock:
+            responses = self.by_path.get(path)
+            if not responses:
+                return 404, {}, ''
+            return responses.pop(0) if len(responses) > 1 else responses[0]
+
+
+OK = (200, {'Content-Type': 'text/xml'}, '<items/>')
+
+
+class BGGClientTests(SimpleTestCase):
+    def test_throttled_request_waits_for_retry_after(self):
+        script = Script(_ping=[(429, {'Retry-After': '0.3'}, ''), OK])
+        with StubServer(script) as server:
+            client = _client(server)
+            started = time.monotonic()
+            resp = client.get('/ping')
+            elapsed = time.monotonic() - started
+        self.assertEqual(resp.content, b'<items/>')
+        self.assertEqual(server.paths(), ['/ping', '/ping'])
+        self.assertGreaterEqual(elapsed, 0.3)
+        self.assertLess(client.bucket.rate, client.bucket.max_rate)  # halved, then crept back up
+
+    def test_queued_responses_are_retried(self):
+        script = Script(_ping=[(202, {}, ''), (202, {}, ''), OK])
+        with StubServer(script) as server:
+            resp = _client(server).get('/ping', params={'id': '1,2'})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(len(server.requests), 3)
+        self.assertEqual(server.requests[0][1], {'id': ['1,2']})
+
+    def test_gives_up_after_retries(self):
+        with StubServer(Script(_ping=[(503, {}, '')])) as server:
+            with self.assertRaisesMessage(FetchError, 'after 3 attempts'):
+                _client(server).get('/ping')
+        self.assertEqual(len(server.requests), 3)
+
+    def test_client_errors_are_not_retried(self):
+        with StubServer(Script()) as server:
+            with self.assertRaises(FetchError):
+                _client(server).get('/missing')
+        self.assertEqual(len(server.requests), 1)
+
+    def test_fetch_things_requeues_and_reports_failures(self):
+        attempts = Counter()
+        lock = threading.Lock()
+
+        def respond(path, query, headers):
+            ids = query['id'][0]
+            with lock:
+                attempts[ids] += 1
+                seen = attempts[ids]
+            if ids == '3,4' and seen < 3:
+                return 202, {}, ''  # fails twice, then succeeds on its last requeue
+            if ids == '5,6':
+                return 500, {}, ''  # never succeeds
+            if ids == '9,10':
+                return 501, {}, ''  # a 5xx outside RETRY_STATUSES is still requeued
+            if ids == '11,12':
+                return 400, {}, ''  # a client error: reported without requeueing
+            return 200, {'Content-Type': 'text/xml'}, f'<items ids="{ids}"/>'
+
+        with StubServer(respond) as server:
+            client = _client(server, retries=1)
+            results = list(client.fetch_things(batched(range(1, 13), 2), batch_retries=2))
+
+        by_batch = defaultdict(list)
+        for batch, content, error in results:
+            self.assertTrue((content is None) != (error is None))
+            by_batch[tuple(batch)].append((content, error))
+        self.assertEqual(sorted(by_batch), [(1, 2), (3, 4), (5, 6), (7, 8), (9, 10), (11, 12)])
+        self.assertTrue(all(len(outcomes) == 1 for outcomes in by_batch.values()))  # yielded once each
+        self.assertEqual(by_batch[(3, 4)][0][0], b'<items ids="3,4"/>')
+        self.assertIsInstance(by_batch[(5, 6)][0][1], FetchError)
+        self.assertFalse(by_batch[(11, 12)][0][1].retryable)
+        self.assertEqual(attempts, {'1,2': 1, '3,4': 3, '5,6': 3, '7,8': 1, '9,10': 3, '11,12': 1})
+        self.assertEqual(server.requests[0][1]['stats'], ['1'])
+
+    def test_batches_are_streamed_lazily(self):
+        produced = []
+
+        def ids():
+            for i in range(100):
+                produced.append(i)
+                yield i
+
+        with StubServer(Script(_xmlapi2_thing=[OK])) as server:
+            client = _client(server, workers=1)
+            things = client.fetch_things(batched(ids(), 5))
+            next(things)
+            self.assertLess(len(produced), 100)  # at most 2 * workers batches ahead
+            self.assertEqual(sum(1 for _ in things), 19)
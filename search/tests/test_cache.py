@@ -0,0 +1,139 @@
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+
+from search import views
+from search.cache import BoundedLocMemCache, _used_bytes, canonical_query
+from search.dataversion import bump_data_version
+from search.forms import SearchForm
+from search.models import Game, Mechanic
+
+from .utils import SearchStateMixin
+
+
+class CanonicalQueryTests(SearchStateMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.a = Mechanic.objects.create(bgg_id=1, name='Area Control').pk
+        cls.b = Mechanic.objects.create(bgg_id=2, name='Dice Rolling').pk
+
+    def canonical(self, params):
+        form = SearchForm(params)
+        self.assertTrue(form.is_valid(), form.errors)
+        return canonical_query(form.cleaned_data)
+
+    def assertEquivalent(self, *variants):
+        expected = self.canonical(variants[0])
+        for params in variants[1:]:
+            self.assertEqual(self.canonical(params), expected, params)
+
+    def test_equivalent_searches_share_a_key(self):
+        self.assertEquivalent({}, {'q': '', 'min_players': ''}, {'min_rating': '0', 'mechanics_match': 'all'})
+        self.assertEquivalent({'q': 'Café  Quest!'}, {'q': 'cafe quest'}, {'q': '  CAFE, quest '})
+        self.assertEquivalent(
+            {'mechanics': [self.a, self.b], 'min_weight': '2'},
+            {'mechanics': [str(self.b), str(self.a)], 'min_weight': '2.0', 'max_players': ''},
+            {'mechanics': [self.a, self.b, self.a], 'mechanics_match': '', 'min_weight': '2'},
+            {'mechanics': [self.a, self.b], 'mechanics_match': 'any', 'min_weight': '2'},
+        )
+
+    def test_different_searches_differ(self):
+        variants = [
+            {},
+            {'q': 'quest'},
+            {'min_players': '2'},
+            {'max_players': '2'},
+            {'mechanics': [self.a]},
+            {'mechanics': [self.a, self.b]},
+            {'mechanics': [self.a], 'mechanics_match': 'all'},
+            {'mechanics': [self.a], 'mechanics_match': 'none'},
+        ]
+        keys = [self.canonical(params) for params in variants]
+        self.assertEqual(len(set(keys)), len(keys))
+
+
+class BoundedLocMemCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.cache = BoundedLocMemCache('test-bounded', {'TIMEOUT': None, 'OPTIONS': {'MAX_BYTES': 1000}})
+        self.cache.clear()
+        self.addCleanup(self.cache.clear)
+
+    def assertAccounted(self):
+        stored = sum(len(value) for value in self.cache._cache.values())
+        self.assertEqual(_used_bytes['test-bounded'][0], stored)
+        self.assertLessEqual(stored, 1000)
+
+    def test_evicts_least_recently_used_past_the_byte_budget(self):
+        for i in range(5):
+            self.cache.set(f'k{i}', b'x' * 150)
+        self.assertAccounted()
+        self.cache.get('k0')  # now the most recently used
+        for i in range(5, 10):
+            self.cache.set(f'k{i}', b'x' * 150)
+        self.assertAccounted()
+        present = [key for key in (f'k{i}' for i in range(10)) if self.cache.get(key) is not None]
+        self.assertEqual(present[0], 'k0')
+        self.assertEqual(present[1:], [f'k{i}' for i in range(10 - len(present) + 1, 10)])
+        self.assertNotIn('k1', present)
+
+    def test_accounting_follows_overwrites_deletes_and_clear(self):
+        self.cache.set('a', b'x' * 100)
+        self.cache.set('a', b'x' * 300)  # replaces, not adds
+        self.cache.set('b', b'x' * 200)
+        self.assertAccounted()
+        self.cache.delete('a')
+        self.assertAccounted()
+        self.cache.set('huge', b'x' * 2000)  # larger than the budget: skipped, nothing flushed
+        self.assertIsNone(self.cache.get('huge'))
+        self.assertIsNotNone(self.cache.get('b'))
+        self.assertAccounted()
+        self.cache.clear()
+        self.assertEqual(_used_bytes['test-bounded'][0], 0)
+
+
+class FragmentCacheTests(SearchStateMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Game.objects.bulk_create([Game(bgg_id=i, name=f'Game {i}', rating=9 - i * 0.5) for i in range(1, 4)])
+
+    def test_equivalent_search_is_served_from_cache(self):
+        url = reverse('search_partial')
+        with mock.patch('search.views._run_search', wraps=views._run_search) as run:
+            first = self.client.get(url, {'min_rating': '7', 'q': ''})
+            again = self.client.get(url, {'min_rating': '7.0', 'max_players': ''})
+            self.assertEqual(run.call_count, 1)
+            self.assertEqual(again.content, first.content)
+            self.assertContains(again, 'Game 1')
+
+            bump_data_version()
+            self.client.get(url, {'min_rating': '7'})
+            self.assertEqual(run.call_count, 2)
+
+
+class CardCacheTests(SearchStateMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Game.objects.bulk_create([Game(bgg_id=i, name=f'Game {i}', rating=9 - i * 0.5) for i in range(1, 5)])
+
+    def rendered(self, render, **params):
+        """Rendered game ids for one search_partial request (a new query, so the fragment cache misses)."""
+        render.reset_mock()
+        response = self.client.get(reverse('search_partial'), params)
+        self.assertEqual(response.status_code, 200)
+        return sorted(call.args[0].id for call in render.call_args_list), response
+
+    def test_cards_are_reused_until_the_data_version_moves(self):
+        with mock.patch('search.views._render_card', wraps=views._render_card) as render:
+            ids, first = self.rendered(render, min_rating=7.5)
+            self.assertEqual(ids, [1, 2, 3])
+            ids, second = self.rendered(render, min_rating=6.5)
+            self.assertEqual(ids, [4])  # games 1-3 come from the card cache
+            self.assertContains(second, 'Game 1')
+            self.assertEqual(second.content.count(b'card-title'), 4)
+            ids, _ = self.rendered(render, max_rating=8.5)
+            self.assertEqual(ids, [])
+
+            bump_data_version()
+            ids, _ = self.rendered(render, min_rating=7.5)
+            self.assertEqual(ids, [1, 2, 3])
@@ -0,0 +1,213 @@
+import random
+
+from django.db.models import F
+from django.test import TestCase
+
+from search.engine import (
+    FACET_HISTOGRAMS, FACET_PLAYER_COUNTS, MATCH_ALL, MATCH_ANY, MATCH_NONE, decode_cursor, encode_cursor,
+    get_index,
+)
+from search.forms import SearchForm
+from search.models import Game, Mechanic
+
+from .utils import SearchStateMixin
+
+
+class CatalogTestCase(SearchStateMixin, TestCase):
+    """A few hundred games with random stats (including NULLs and rating ties) and mechanics."""
+
+    @classmethod
+    def setUpTestData(cls):
+        rng = random.Random(7)
+        cls.mechanics = [Mechanic.objects.create(bgg_id=2000 + i, name=f'Mechanic {i}') for i in range(6)]
+        words = ['alpha', 'beta', 'gamma', 'delta', 'quest', 'empire']
+
+        def maybe(value):
+            return None if rng.random() < 0.1 else value
+
+        games = []
+        for i in range(300):
+            low = rng.randint(1, 4)
+            games.append(Game(
+                bgg_id=1 + i,
+                name=' '.join(rng.sample(words, 2)) + f' {i}',
+                description=' '.join(rng.choice(words) for _ in range(rng.randint(0, 12))),
+                min_players=maybe(low),
+                max_players=maybe(low + rng.randint(0, 4)),
+                playing_time=maybe(rng.choice([15, 30, 45, 60, 90, 120, 180, 240])),
+                weight=maybe(round(rng.uniform(1, 5), 2)),
+                rating=maybe(round(rng.uniform(5, 9), 1)),  # one decimal: plenty of ties
+            ))
+        Game.objects.bulk_create(games)
+        through = Game.mechanics.through
+        through.objects.bulk_create([
+            through(game_id=game.pk, mechanic_id=mechanic.pk)
+            for game in Game.objects.all()
+            for mechanic in cls.mechanics
+            if rng.random() < 0.3
+        ])
+
+    def cleaned(self, **params):
+        form = SearchForm(params)
+        self.assertTrue(form.is_valid(), form.errors)
+        return form.cleaned_data
+
+
+def _reference(cleaned):
+    """bgg_ids matching `cleaned`, best rated first, filtered with the ORM like the original views."""
+    games = Game.objects.all()
+    for field, lookup in (
+        ('min_players', 'min_players__gte'), ('max_players', 'max_players__lte'),
+        ('min_playing_time', 'playing_time__gte'), ('max_playing_time', 'playing_time__lte'),
+        ('min_weight', 'weight__gte'), ('max_weight', 'weight__lte'),
+        ('min_rating', 'rating__gte'), ('max_rating', 'rating__lte'),
+    ):
+        if cleaned.get(field):
+            games = games.filter(**{lookup: cleaned[field]})
+    mechanics = [m.pk for m in cleaned.get('mechanics') or ()]
+    if mechanics:
+        mode = cleaned['mechanics_match']
+        if mode == MATCH_ALL:
+            for mechanic in mechanics:
+                games = games.filter(mechanics=mechanic)
+        elif mode == MATCH_NONE:
+            games = games.exclude(mechanics__in=mechanics)
+        else:
+            games = games.filter(mechanics__in=mechanics).distinct()
+    ordered = games.order_by(F('rating').desc(nulls_last=True), 'bgg_id')
+    return list(ordered.values_list('bgg_id', flat=True))
+
+
+class SearchTests(CatalogTestCase):
+    def assertMatchesReference(self, **params):
+        cleaned = self.cleaned(**params)
+        page = get_index().search(cleaned)
+        expected = _reference(cleaned)
+        self.assertEqual([game.id for game in page.games], expected, params)
+        self.assertEqual(page.total, len(expected), params)
+
+    def test_no_filters(self):
+        self.assertMatchesReference()
+
+    def test_range_filters(self):
+        cases = [
+            {'min_players': 2},
+            {'max_players': 3},
+            {'min_players': 2, 'max_players': 4},
+            {'min_playing_time': 45, 'max_playing_time': 120},
+            {'max_playing_time': 30},
+            {'min_weight': 2.5},
+            {'min_weight': 1.8, 'max_weight': 3.2},
+            {'min_rating': 7.0},
+            {'min_rating': 6.5, 'max_rating': 7.5},
+            {'max_rating': 5.0},  # edge value present in the data
+            {'min_players': 3, 'min_weight': 2, 'max_playing_time': 90, 'min_rating': 6},
+            {'min_rating': 0, 'min_playing_time': 0},  # 0 means "no filter"
+        ]
+        for params in cases:
+            self.assertMatchesReference(**params)
+
+    def test_mechanic_modes(self):
+        ids = [m.pk for m in self.mechanics]
+        for mode in (MATCH_ANY, MATCH_ALL, MATCH_NONE):
+            for selected in (ids[:1], ids[1:3], ids[2:5]):
+                self.assertMatchesReference(mechanics=selected, mechanics_match=mode)
+                self.assertMatchesReference(mechanics=selected, mechanics_match=mode, min_rating=6.5, max_players=4)
+
+    def test_unused_mechanic(self):
+        unused = Mechanic.objects.create(bgg_id=9999, name='Unused')
+        self.assertMatchesReference(mechanics=[unused.pk], mechanics_match=MATCH_ANY)
+        self.assertMatchesReference(mechanics=[unused.pk], mechanics_match=MATCH_NONE)
+
+
+class CursorTests(CatalogTestCase):
+    def walk(self, limit, **params):
+        """All games reached by following next cursors, page by page."""
+        index = get_index()
+        seen = []
+        cursor = None
+        for _ in range(1000):
+            cleaned = self.cleaned(**params)
+            cleaned['cursor'] = None if cursor is None else decode_cursor(cursor, relevance=bool(cleaned['q']))
+            page = index.search(cleaned, limit=limit)
+            self.assertLessEqual(len(page.games), limit)
+            seen.extend(game.id for game in page.games)
+            cursor = page.next_cursor
+            if cursor is None:
+                return seen, page.total
+        self.fail('cursor walk did not terminate')
+
+    def test_rating_order(self):
+        for params in ({}, {'min_players': 2}, {'mechanics': [self.mechanics[0].pk]}):
+            full = get_index().search(self.cleaned(**params))
+            for limit in (1, 7, 24, len(full.games), len(full.games) + 5):
+                seen, total = self.walk(limit, **params)
+                self.assertEqual(seen, [game.id for game in full.games], (params, limit))
+                self.assertEqual(total, full.total)
+
+    def test_keyword_order(self):
+        for params in ({'q': 'alpha'}, {'q': 'quest empire', 'min_rating': 6}):
+            full = get_index().search(self.cleaned(**params))
+            self.assertTrue(full.games, params)
+            for limit in (1, 5, 24):
+                seen, _ = self.walk(limit, **params)
+                self.assertEqual(seen, [game.id for game in full.games], (params, limit))
+
+    def test_round_trip(self):
+        index = get_index()
+        for record in index.records[:20]:
+            for score in (None, 1.5, 0.1 + 0.2):
+                cursor = encode_cursor(record, score=score)
+                self.assertEqual(encode_cursor(record, score=score), cursor)
+                key = decode_cursor(cursor, relevance=score is not None)
+                self.assertEqual(key[-1], record.id)
+
+    def test_malformed_cursor_is_a_form_error(self):
+        for cursor in ('garbage', 's:1', '7.5:x', 'n', 'nan:1', 'inf:1', '-inf:1', 'sn:1', 's1.5:2'):
+            form = SearchForm({'cursor': cursor})
+            self.assertFalse(form.is_valid(), cursor)
+            self.assertIn('cursor', form.errors)
+
+    def test_cursor_kind_must_match_the_query(self):
+        self.assertTrue(SearchForm({'cursor': '7.5:3'}).is_valid())
+        self.assertTrue(SearchForm({'q': 'alpha', 'cursor': 's1.5:3'}).is_valid())
+        for cursor in ('7.5:3', 'n:3', 'snan:3', 'sinf:3'):
+            form = SearchForm({'q': 'alpha', 'cursor': cursor})
+            self.assertFalse(form.is_valid(), cursor)
+            self.assertIn('cursor', form.errors)
+
+
+class FacetTests(CatalogTestCase):
+    def brute_force(self, bgg_ids):
+        """Facet counts for `bgg_ids`, one ORM count per bucket."""
+        games = Game.objects.filter(bgg_id__in=bgg_ids)
+        mechanics = [{'id': m.pk, 'name': m.name, 'count': games.filter(mechanics=m).count()} for m in self.mechanics]
+        facets = {'mechanics': sorted((m for m in mechanics if m['count']), key=lambda m: (-m['count'], m['name']))}
+        last = FACET_PLAYER_COUNTS[-1]
+        facets['players'] = [
+            {'low': n, 'high': n, 'count': games.filter(min_players__lte=n, max_players__gte=n).count()}
+            for n in FACET_PLAYER_COUNTS[:-1]
+        ] + [{'low': last, 'high': None, 'count': games.filter(max_players__gte=last).count()}]
+        for facet, column, edges in FACET_HISTOGRAMS:
+            facets[facet] = []
+            for low, high in zip(edges, edges[1:] + (None,)):
+                bucket = games.filter(**{f'{column}__gte': low})
+                if high is not None:
+                    bucket = bucket.filter(**{f'{column}__lt': high})
+                facets[facet].append({'low': low, 'high': high, 'count': bucket.count()})
+        return facets
+
+    def test_counts_match_the_orm(self):
+        Game.objects.create(bgg_id=5000, name='Featherweight', weight=0.8, rating=6.0)
+        for params in ({}, {'min_rating': 7}, {'mechanics': [self.mechanics[1].pk], 'max_players': 3}):
+            cleaned = self.cleaned(**params)
+            page = get_index().search(cleaned, limit=5, facets=True)
+            self.assertEqual(page.facets, self.brute_force(_reference(cleaned)), params)
+
+    def test_every_weight_lands_in_a_bucket(self):
+        Game.objects.create(bgg_id=5000, name='Featherweight', weight=0.8, rating=6.0)
+        facets = get_index().search(self.cleaned(), facets=True).facets
+        self.assertEqual(
+            sum(bucket['count'] for bucket in facets['weight']),
+            Game.objects.filter(weight__isnull=False).count(),
+        )
@@ -0,0 +1,30 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import TestCase
+
+from search.management.commands.explain_queries import _plan_problems
+
+
+class ExplainQueriesTests(TestCase):
+    def test_indexed_queries_pass_the_check(self):
+        out = StringIO()
+        call_command('explain_queries', '--check', stdout=out)
+        self.assertIn('admin: game list', out.getvalue())
+        self.assertIn('All indexed queries use an index without sorting.', out.getvalue())
+
+    def test_check_fails_when_an_index_is_missing(self):
+        with connection.cursor() as cursor:
+            cursor.execute('DROP INDEX game_rating_id_idx')  # rolled back with the test
+        with self.assertRaisesMessage(CommandError, 'admin: game list: full scan of search_game, sort (temp B-tree)'):
+            call_command('explain_queries', '--check', stdout=StringIO())
+
+    def test_plan_problems(self):
+        self.assertEqual(_plan_problems('2 0 0 SEARCH search_game USING INDEX sqlite_autoindex_search_game_1 (bgg_id=?)'), [])
+        self.assertEqual(_plan_problems('4 0 0 SCAN search_game USING INDEX game_rating_id_idx'), [])
+        self.assertEqual(
+            _plan_problems('2 0 0 SCAN search_game\n9 0 0 USE TEMP B-TREE FOR RIGHT PART OF ORDER BY'),
+            ['full scan of search_game', 'sort (temp B-tree)'],
+        )
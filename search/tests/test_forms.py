@@ -0,0 +1,61 @@
+from django.test import TestCase
+
+from search.dataversion import bump_data_version
+from search.engine import search_games
+from search.forms import SearchForm
+from search.models import Game, Mechanic
+
+from .utils import SearchStateMixin
+
+
+class MechanicsFieldTests(SearchStateMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.dice = Mechanic.objects.create(bgg_id=1, name='Dice Rolling', is_common=True)
+        cls.area = Mechanic.objects.create(bgg_id=2, name='Area Control', is_common=True)
+        cls.rare = Mechanic.objects.create(bgg_id=3, name='Roll and Write')
+        game = Game.objects.create(bgg_id=10, name='Castles', rating=7.5)
+        game.mechanics.set([cls.dice, cls.rare])
+
+    def clean(self, mechanics, **params):
+        form = SearchForm({'mechanics': mechanics, **params})
+        valid = form.is_valid()
+        return form, valid
+
+    def test_selectable_ids_clean_to_catalog_mechanics(self):
+        form, valid = self.clean([str(self.area.pk), self.dice.pk, str(self.area.pk)])
+        self.assertTrue(valid, form.errors)
+        self.assertEqual([(m.pk, m.name) for m in form.cleaned_data['mechanics']],
+                         [(self.area.pk, 'Area Control'), (self.dice.pk, 'Dice Rolling')])
+
+    def test_unknown_and_non_selectable_ids_fail(self):
+        for raw in (self.rare.pk, 9999, 'abc', ''):
+            with self.subTest(raw=raw):
+                form, valid = self.clean([self.dice.pk, raw])
+                self.assertFalse(valid)
+                self.assertIn('is not one of the available choices', form.errors['mechanics'][0])
+
+    def test_every_mechanic_is_selectable_when_none_is_common(self):
+        Mechanic.objects.update(is_common=False)
+        bump_data_version()
+        form, valid = self.clean([self.rare.pk])
+        self.assertTrue(valid, form.errors)
+
+    def test_catalog_follows_the_data_version(self):
+        self.assertTrue(self.clean([self.dice.pk])[1])
+        Mechanic.objects.filter(pk=self.dice.pk).update(is_common=False)
+        self.assertTrue(self.clean([self.dice.pk])[1])  # same version: the cached catalog still applies
+        bump_data_version()
+        self.assertFalse(self.clean([self.dice.pk])[1])
+
+    def test_steady_state_validation_and_search_run_no_queries(self):
+        params = {'mechanics': [self.dice.pk], 'mechanics_match': 'all', 'min_players': ''}
+        form, valid = self.clean(**params)
+        self.assertTrue(valid, form.errors)
+        search_games(form.cleaned_data, limit=24)  # warms the catalog and the index
+
+        with self.assertNumQueries(0):
+            form, valid = self.clean(**params)
+            self.assertTrue(valid, form.errors)
+            page = search_games(form.cleaned_data, limit=24)
+        self.assertEqual([game.id for game in page.games], [10])
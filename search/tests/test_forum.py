@@ -0,0 +1,234 @@
+import json
+from pathlib import Path
+import tempfile
+import threading
+import time
+
+from django.test import SimpleTestCase
+
+from search.forum.checkpoint import MentionTally
+from search.forum.crawler import ForumCrawler
+from search.forum.extract import LxmlExtractor, SoupExtractor, get_extractor
+from search.forum.matcher import MechanicMatcher
+
+from .utils import StubServer
+
+THREADS_PER_PAGE = 3
+PAGES = 3
+
+
+class MockForum:
+    """Listing pages /forum/list?page=N with thread links and a "next" link,
+    and thread pages /thread/<i>/t that mention mechanics.
+
+    Every listing also links thread 0, so it must be fetched only once.
+    `failures` maps a path to the statuses it returns before succeeding.
+    """
+
+    def __init__(self, failures=None):
+        self.failures = {path: list(statuses) for path, statuses in (failures or {}).items()}
+        self.hits = []  # (monotonic time, path) per request
+        self._lock = threading.Lock()
+
+    def __call__(self, path, query, headers):
+        with self._lock:
+            self.hits.append((time.monotonic(), path))
+            pending = self.failures.get(path)
+            if pending:
+                status = pending.pop(0)
+                return status, {'Retry-After': '0.2'} if status == 429 else {}, 'unavailable'
+        if path == '/forum/list':
+            page = int(query.get('page', ['1'])[0])
+            first = (page - 1) * THREADS_PER_PAGE + 1
+            links = ['<a href="/thread/0/t">Pinned</a>']
+            links += [f'<a href="/thread/{i}/t">Thread {i}</a>' for i in range(first, first + THREADS_PER_PAGE)]
+            if page < PAGES:
+                links.append(f'<nav><a href="/forum/list?page={page + 1}">Next</a></nav>')
+            return 200, {'Content-Type': 'text/html'}, f'<html><body>{"".join(links)}</body></html>'
+        if path.startswith('/thread/'):
+            number = int(path.split('/')[2])
+            body = (
+                '<html><head><script>var ad = "Worker Placement";</script></head><body>'
+                '<nav>Worker Placement forum</nav>'
+                f'<p>Thread {number}: more Dice Rolling please. Dice rolling!</p></body></html>'
+            )
+            return 200, {'Content-Type': 'text/html'}, body
+        return 404, {}, 'not found'
+
+
+class ForumCrawlerTests(SimpleTestCase):
+    def crawl(self, forum, start_paths=('/forum/list?page=1',), counted=(), **options):
+        settings = {'concurrency': 3, 'delay': 0, 'max_depth': PAGES, 'max_pages': 100,
+                    'retries': 3, 'backoff': 0.05}
+        settings.update(options)
+        errors = []
+        crawler = ForumCrawler(info=lambda message: None, error=errors.append, **settings)
+        pages = {}
+
+        with StubServer(forum) as server:
+            seen = {server.url + path for path in counted}
+
+            def on_page(url, text):
+                pages[url] = text
+                seen.add(url)
+
+            crawler.crawl([server.url + path for path in start_paths], seen, on_page)
+        self.server = server
+        return {url[len(server.url):]: text for url, text in pages.items()}, errors
+
+    def test_crawls_every_thread_once(self):
+        forum = MockForum()
+        pages, errors = self.crawl(forum)
+        self.assertEqual(errors, [])
+        threads = [f'/thread/{i}/t' for i in range(THREADS_PER_PAGE * PAGES + 1)]
+        self.assertEqual(sorted(pages), sorted(threads))
+        fetched = [path for _, path in forum.hits]
+        self.assertEqual(fetched.count('/thread/0/t'), 1)  # linked from every listing
+        self.assertEqual(fetched.count('/forum/list'), PAGES)
+        self.assertLessEqual(self.server.max_in_flight, 3)
+
+    def test_text_leaves_out_boilerplate(self):
+        pages, _ = self.crawl(MockForum(), max_pages=1, start_paths=('/thread/7/t',))
+        text = pages['/thread/7/t']
+        self.assertEqual(text, 'Thread 7: more Dice Rolling please. Dice rolling!')
+        counts = {1: 0, 2: 0}
+        MechanicMatcher({1: 'Dice Rolling', 2: 'Worker Placement'}).count(text, counts)
+        self.assertEqual(counts, {1: 2, 2: 0})
+
+    def test_page_budget_and_resume(self):
+        pages, _ = self.crawl(MockForum(), max_pages=4)
+        self.assertEqual(len(pages), 4)
+
+        # A resumed crawl skips what was counted and stops at the same overall budget
+        forum = MockForum()
+        more, _ = self.crawl(forum, counted=pages, max_pages=7)
+        self.assertEqual(len(more), 3)
+        self.assertFalse(set(more) & set(pages))
+        self.assertFalse({path for _, path in forum.hits} & set(pages))
+
+    def test_globally_deduplicated_start_urls(self):
+        forum = MockForum()
+        pages, _ = self.crawl(forum, start_paths=('/forum/list?page=1', '/forum/list?page=1', '/thread/1/t'))
+        fetched = [path for _, path in forum.hits]
+        self.assertEqual(fetched.count('/thread/1/t'), 1)
+        self.assertEqual(len(pages), THREADS_PER_PAGE * PAGES + 1)
+
+    def test_per_host_spacing(self):
+        forum = MockForum()
+        self.crawl(forum, delay=0.05, max_depth=0)
+        times = sorted(at for at, _ in forum.hits)
+        self.assertEqual(len(times), 1 + THREADS_PER_PAGE + 1)
+        gaps = [later - earlier for earlier, later in zip(times, times[1:])]
+        self.assertGreaterEqual(min(gaps), 0.04)  # however many requests are in flight
+
+    def test_retries_throttling_and_failures(self):
+        forum = MockForum(failures={
+            '/thread/1/t': [503, 503],  # recovers on the third attempt
+            '/thread/2/t': [429],  # Retry-After holds back the whole host
+            '/thread/3/t': [503, 503, 503],  # out of retries
+        })
+        started = time.monotonic()
+        pages, errors = self.crawl(forum, max_depth=0)
+        self.assertIn('/thread/1/t', pages)
+        self.assertIn('/thread/2/t', pages)
+        self.assertNotIn('/thread/3/t', pages)
+        self.assertEqual(len(errors), 1)
+        self.assertIn('/thread/3/t', errors[0])
+        self.assertGreaterEqual(time.monotonic() - started, 0.2)
+        throttled, retried = [at for at, path in forum.hits if path == '/thread/2/t']
+        self.assertGreaterEqual(retried - throttled, 0.19)  # Retry-After, not the 0.05s backoff
+
+    def test_client_errors_are_reported_and_skipped(self):
+        forum = MockForum(failures={'/thread/2/t': [404]})
+        pages, errors = self.crawl(forum, max_depth=0)
+        self.assertNotIn('/thread/2/t', pages)
+        self.assertEqual(len(pages), THREADS_PER_PAGE)
+        self.assertEqual(len(errors), 1)
+        self.assertEqual(sum(1 for _, path in forum.hits if path == '/thread/2/t'), 1)
+
+
+class MentionTallyTests(SimpleTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = Path(tmp.name) / 'nested' / 'checkpoint.json'
+        self.matcher = MechanicMatcher({1: 'Dice Rolling', 2: 'Worker Placement', 3: 'Deck Building'})
+
+    def test_save_load_round_trip(self):
+        tally = MentionTally([1, 2, 3])
+        self.assertTrue(tally.add_page('https://f/1', 'Dice rolling and worker placement.', self.matcher))
+        self.assertTrue(tally.add_page('https://f/2', 'More dice rolling!', self.matcher))
+        self.assertEqual(tally.dirty, 2)
+        tally.save(self.path)
+        self.assertEqual(tally.dirty, 0)
+        self.assertEqual([p.name for p in self.path.parent.iterdir()], ['checkpoint.json'])  # no temp files left
+
+        resumed = MentionTally([1, 2, 4])  # mechanic 3 deleted, 4 added since the checkpoint
+        self.assertTrue(resumed.load(self.path))
+        self.assertEqual(resumed.counts, {1: 2, 2: 1, 4: 0})
+        self.assertEqual(resumed.pages, {'https://f/1', 'https://f/2'})
+        self.assertFalse(resumed.add_page('https://f/1', 'Dice rolling.', self.matcher))
+        self.assertEqual(resumed.total, 3)
+
+    def test_missing_checkpoint(self):
+        tally = MentionTally([1])
+        self.assertFalse(tally.load(self.path))
+        self.assertEqual((tally.counts, tally.pages), ({1: 0}, set()))
+
+    def test_corrupt_checkpoint_is_ignored(self):
+        self.path.parent.mkdir(parents=True)
+        good = {'counts': {'1': 5}, 'pages': ['https://f/1']}
+        for content in (
+            json.dumps(good)[:-7],  # truncated
+            '',
+            '[]',
+            json.dumps({'counts': {'1': 5}}),
+            json.dumps({'counts': {'x': 5}, 'pages': []}),
+            json.dumps({'counts': [1, 5], 'pages': []}),
+        ):
+            self.path.write_text(content)
+            tally = MentionTally([1])
+            self.assertFalse(tally.load(self.path), content)
+            self.assertEqual((tally.counts, tally.pages), ({1: 0}, set()), content)
+
+
+class ExtractorTests(SimpleTestCase):
+    PAGE = (
+        b'<html><head><title>Forum</title><style>p {}</style><script>var ad = "Deck Building";</script></head>'
+        b'<body><nav><a href="/list?page=2">Next</a></nav><!-- Area Control -->'
+        b'<p>More <b>Dice</b>   Rolling</p><script>track()</script>tail text'
+        b'<noscript>Enable JS</noscript><template>Worker Placement</template><a href="/thread/1">Thread</a></body></html>'
+    )
+    SAMPLES = {
+        'boilerplate': PAGE,
+        'undeclared utf-8': '<p>Café – Worker Placement</p>'.encode(),
+        'latin-1 meta charset': b'<html><head><meta charset="iso-8859-1"></head><body><p>Caf\xe9 na\xefve</p></body></html>',
+        'xml declaration': b'<?xml version="1.0" encoding="utf-8"?><html><body><p>Declared \xc3\xa9</p></body></html>',
+    }
+
+    def test_text_and_links(self):
+        text, hrefs = LxmlExtractor().extract(self.PAGE)
+        self.assertEqual(text, 'Forum More Dice Rolling tail text Thread')
+        self.assertEqual(hrefs, ['/list?page=2', '/thread/1'])  # links inside <nav> still count
+        self.assertEqual(LxmlExtractor().extract(self.PAGE, links=False), (text, []))
+
+    def test_encoding_fallback(self):
+        extractor = LxmlExtractor()
+        self.assertEqual(extractor.extract(self.SAMPLES['undeclared utf-8'])[0], 'Café – Worker Placement')
+        self.assertEqual(extractor.extract(self.SAMPLES['latin-1 meta charset'])[0], 'Café naïve')
+        self.assertEqual(extractor.extract(self.SAMPLES['xml declaration'])[0], 'Declared é')
+
+    def test_lxml_matches_soup(self):
+        lxml_extractor, soup = LxmlExtractor(), SoupExtractor()
+        for label, content in self.SAMPLES.items():
+            self.assertEqual(lxml_extractor.extract(content), soup.extract(content), label)
+
+    def test_empty_pages(self):
+        for content in (b'', b'  \n '):
+            self.assertEqual(LxmlExtractor().extract(content), ('', []))
+
+    def test_registry(self):
+        self.assertIsInstance(get_extractor(), LxmlExtractor)
+        self.assertIsInstance(get_extractor('soup'), SoupExtractor)
+        with self.assertRaises(ValueError):
+            get_extractor('regex')
@@ -0,0 +1,81 @@
+from io import StringIO
+import json
+from pathlib import Path
+import tempfile
+
+from django.core.management import call_command
+from django.test import SimpleTestCase
+
+from search.bgg.client import BGGClient, FetchError
+from search.bgg.httpcache import ResponseCache
+
+from .utils import StubServer
+
+
+class ResponseCacheTests(SimpleTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.directory = Path(tmp.name)
+
+    def bgg_client(self, server_url, **cache_options):
+        cache = ResponseCache(self.directory, **cache_options)
+        return BGGClient(base_url=server_url, rate=200, retries=2, backoff=0.01, cache=cache)
+
+    def test_records_revalidates_and_replays_offline(self):
+        def respond(path, query, headers):
+            if headers.get('If-None-Match') == '"v1"':
+                return 304, {'ETag': '"v1"'}, ''
+            return 200, {'Content-Type': 'text/xml', 'ETag': '"v1"'}, '<items total="1"/>'
+
+        with StubServer(respond) as server:
+            first = self.bgg_client(server.url).get('/xmlapi2/thing', params={'id': 1})
+            again = self.bgg_client(server.url).get('/xmlapi2/thing', params={'id': 1})
+            fresh = self.bgg_client(server.url, ttl=60).get('/xmlapi2/thing', params={'id': 1})
+            url = server.url
+        self.assertEqual(first.content, b'<items total="1"/>')
+        self.assertEqual(again.content, first.content)
+        self.assertTrue(again.from_cache)  # rebuilt from the cache after a 304
+        self.assertTrue(fresh.from_cache)
+        self.assertEqual(len(server.requests), 2)  # the TTL hit never reached the server
+        self.assertEqual(server.requests[1][2].get('If-None-Match'), '"v1"')
+
+        # Server is gone: offline mode replays the recording, and a URL never seen fails
+        offline = self.bgg_client(url, offline=True)
+        self.assertEqual(offline.get('/xmlapi2/thing', params={'id': 1}).content, first.content)
+        with self.assertRaisesMessage(FetchError, 'offline mode'):
+            offline.get('/xmlapi2/thing', params={'id': 2})
+
+    def test_prune_drops_old_records_and_unused_bodies(self):
+        def respond(path, query, headers):
+            body = 'shared' if path in ('/a', '/b') else f'only {path}'
+            return 200, {}, body
+
+        with StubServer(respond) as server:
+            client = self.bgg_client(server.url)
+            for path in ('/a', '/b', '/c'):
+                client.get(path)
+        cache = client.cache
+        for path in ('/a', '/c'):  # last fetched ten days ago
+            meta_path = cache._meta_path(client.url(path))
+            meta = json.loads(meta_path.read_text())
+            meta['fetched_at'] -= 10 * 86400
+            meta_path.write_text(json.dumps(meta))
+
+        self.assertEqual(cache.prune(5 * 86400, dry_run=True)[:2], (2, 1))
+        self.assertIsNotNone(cache.lookup(client.url('/a')))
+        records, bodies, freed = cache.prune(5 * 86400)
+        self.assertEqual((records, bodies), (2, 1))  # /a's body is still used by /b
+        self.assertGreater(freed, 0)
+        self.assertIsNone(cache.lookup(client.url('/a')))
+        self.assertIsNotNone(cache.lookup(client.url('/b')))
+        self.assertIsNone(cache.lookup(client.url('/c')))
+        self.assertEqual(sum(1 for _ in self.directory.glob('objects/*/*.gz')), 1)
+
+    def test_prune_command(self):
+        with StubServer(lambda path, query, headers: (200, {}, path)) as server:
+            self.bgg_client(server.url).get('/a')
+        out = StringIO()
+        call_command('prune_bgg_cache', '--older-than', '0', '--cache-dir', str(self.directory), stdout=out)
+        self.assertIn('Removed 1 records and 1 bodies', out.getvalue())
+        self.assertEqual(list(self.directory.glob('*/*/*')), [])
@@ -0,0 +1,135 @@
+from django.test import TestCase
+
+from search.ingest import (
+    content_hash, refresh_common_mechanics, store_mechanic_counts, upsert_games, verify_usage_counts,
+)
+from search.models import Game, Mechanic
+
+from .utils import game_record
+
+DICE = (10, 'Dice Rolling')
+DRAFT = (11, 'Card Drafting')
+WORKERS = (12, 'Worker Placement')
+
+
+def _links():
+    return {
+        (bgg_id, mechanic)
+        for bgg_id, mechanic in Game.mechanics.through.objects.values_list('game__bgg_id', 'mechanic__bgg_id')
+    }
+
+
+def _usage():
+    return dict(Mechanic.objects.values_list('bgg_id', 'usage_count'))
+
+
+class UpsertGamesTests(TestCase):
+    def test_creates_games_mechanics_and_links(self):
+        result = upsert_games([
+            game_record(1, 'Alpha', [DICE, DRAFT], rating=7.5, description='x' * 250, rank=1),
+            game_record(2, 'Beta', [DICE], rank=2),
+        ])
+        self.assertEqual((result.created, result.updated, result.unchanged), (2, 0, 0))
+        self.assertEqual((result.links_added, result.links_removed), (3, 0))
+        self.assertEqual(_links(), {(1, 10), (1, 11), (2, 10)})
+        self.assertEqual(_usage(), {10: 2, 11: 1})
+
+        alpha = Game.objects.get(bgg_id=1)
+        self.assertEqual(alpha.content_hash, content_hash(game_record(1, 'Alpha', [DICE, DRAFT], rating=7.5, description='x' * 250)))
+        self.assertEqual(alpha.description_snippet, 'x' * 200 + '...')
+        self.assertEqual(alpha.rank, 1)
+        self.assertIsNotNone(alpha.fetched_at)
+
+    def test_unchanged_content_is_not_rewritten(self):
+        records = [game_record(1, 'Alpha', [DICE], rank=1), game_record(2, 'Beta', [DRAFT], rank=2)]
+        upsert_games(records)
+        Game.objects.filter(bgg_id=1).update(name='Edited locally')  # would be overwritten by a rewrite
+        before = dict(Game.objects.values_list('bgg_id', 'fetched_at'))
+
+        result = upsert_games([dict(records[0]), dict(records[1], rank=5)])
+        self.assertEqual((result.created, result.updated, result.unchanged), (0, 0, 2))
+        self.assertEqual((result.links_added, result.links_removed), (0, 0))
+        games = {game.bgg_id: game for game in Game.objects.all()}
+        self.assertEqual(games[1].name, 'Edited locally')
+        self.assertEqual(games[2].rank, 5)
+        self.assertGreater(games[1].fetched_at, before[1])
+        self.assertGreater(games[2].fetched_at, before[2])
+
+    def test_hash_ignores_mechanic_order_but_not_content(self):
+        base = game_record(1, 'Alpha', [DICE, DRAFT], rating=7.0)
+        self.assertEqual(content_hash(base), content_hash(dict(base, mechanics=[DRAFT, DICE])))
+        self.assertEqual(content_hash(base), content_hash(dict(base, rank=3)))
+        self.assertNotEqual(content_hash(base), content_hash(dict(base, rating=7.1)))
+        self.assertNotEqual(content_hash(base), content_hash(dict(base, mechanics=[DICE])))
+
+    def test_link_diff_and_usage_deltas(self):
+        upsert_games([
+            game_record(1, 'Alpha', [DICE, DRAFT]),
+            game_record(2, 'Beta', [DICE, DRAFT]),
+            game_record(3, 'Gamma', [DRAFT]),
+        ])
+        self.assertEqual(_usage(), {10: 2, 11: 3})
+
+        result = upsert_games([
+            game_record(1, 'Alpha', [DICE, WORKERS]),  # -DRAFT +WORKERS
+            game_record(2, 'Beta', []),  # -DICE -DRAFT
+            game_record(3, 'Gamma', [DRAFT]),  # unchanged
+            game_record(4, 'Delta', [WORKERS, DICE]),  # new
+        ])
+        self.assertEqual((result.created, result.updated, result.unchanged), (1, 2, 1))
+        self.assertEqual((result.links_added, result.links_removed), (3, 3))
+        self.assertEqual(_links(), {(1, 10), (1, 12), (3, 11), (4, 10), (4, 12)})
+        self.assertEqual(_usage(), {10: 2, 11: 1, 12: 2})
+        self.assertEqual(verify_usage_counts(repair=False), [])
+
+    def test_duplicate_records_last_one_wins(self):
+        upsert_games([game_record(1, 'First', [DICE]), game_record(1, 'Second', [DRAFT])])
+        self.assertEqual(Game.objects.get().name, 'Second')
+        self.assertEqual(_links(), {(1, 11)})
+        self.assertEqual(_usage(), {11: 1})  # the overridden record's mechanics are never written
+
+    def test_mechanic_names_are_refreshed(self):
+        upsert_games([game_record(1, 'Alpha', [DICE])])
+        upsert_games([game_record(2, 'Beta', [(10, 'Dice Rolling (renamed)')])])
+        self.assertEqual(Mechanic.objects.get(bgg_id=10).name, 'Dice Rolling (renamed)')
+
+    def test_verify_usage_counts_repairs_drift(self):
+        upsert_games([game_record(1, 'Alpha', [DICE]), game_record(2, 'Beta', [DICE])])
+        Mechanic.objects.filter(bgg_id=10).update(usage_count=7)
+        drift = verify_usage_counts(repair=True)
+        self.assertEqual([(m.bgg_id, stored, actual) for m, stored, actual in drift], [(10, 7, 2)])
+        self.assertEqual(_usage(), {10: 2})
+
+
+class CommonMechanicsTests(TestCase):
+    def setUp(self):
+        upsert_games([
+            game_record(1, 'Alpha', [DICE, DRAFT]),
+            game_record(2, 'Beta', [DICE, DRAFT]),
+            game_record(3, 'Gamma', [DICE, WORKERS]),
+        ])
+        self.ids = dict(Mechanic.objects.values_list('bgg_id', 'id'))
+
+    def flags(self):
+        return dict(Mechanic.objects.values_list('bgg_id', 'is_common'))
+
+    def test_refresh_flags_by_usage_and_keeps_mentions(self):
+        store_mechanic_counts({self.ids[12]: 40, self.ids[11]: 5}, top_k=1)
+        self.assertEqual(self.flags(), {10: False, 11: False, 12: True})
+
+        updated, top = refresh_common_mechanics(top_k=2)
+        self.assertEqual(top, [('Dice Rolling', 3), ('Card Drafting', 2)])
+        self.assertEqual(updated, 3)
+        self.assertEqual(self.flags(), {10: True, 11: True, 12: False})
+        self.assertEqual(
+            dict(Mechanic.objects.values_list('bgg_id', 'mentions_count')),
+            {10: 0, 11: 5, 12: 40},  # forum mention counts survive
+        )
+        self.assertEqual(refresh_common_mechanics(top_k=2)[0], 0)  # nothing left to change
+
+    def test_store_counts_with_min_count(self):
+        updated, top = store_mechanic_counts({self.ids[10]: 3, self.ids[11]: 1}, top_k=5, min_count=2)
+        self.assertEqual(top, [('Dice Rolling', 3)])
+        self.assertEqual(self.flags(), {10: True, 11: False, 12: False})
+        self.assertEqual(updated, 2)  # Dice flagged + counted, Drafting counted
+
@@ -0,0 +1,129 @@
+from io import StringIO
+from pathlib import Path
+import tempfile
+import xml.etree.ElementTree as ET
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+
+from search.bgg.parsing import iter_things, parse_things
+from search.bgg.ranking import parse_ranking_page
+from search.ingest import store_mechanic_counts
+from search.models import Game, Mechanic
+
+from .utils import SearchStateMixin, StubServer
+
+FIXTURES = Path(__file__).parent / 'fixtures' / 'bgg'
+
+
+def fixture(name) -> bytes:
+    return (FIXTURES / name).read_bytes()
+
+
+class ThingParsingTests(SimpleTestCase):
+    def test_recorded_thing_response(self):
+        brass, pandemic, ark_nova = parse_things(fixture('thing.xml'))  # the item without an id is skipped
+        self.assertEqual(brass, {
+            'bgg_id': 224517,
+            'name': 'Brass: Birmingham',  # primary name, not the alternate
+            'year': 2018,
+            'min_players': 2,
+            'max_players': 4,
+            'playing_time': 120,
+            'weight': 3.8734,
+            'rating': 8.56929,  # <average>, not <bayesaverage> or the rank's attribute
+            'thumbnail': 'https://cf.geekdo-images.com/x__thumb/img/brass.jpg',
+            'description': (
+                "Brass: Birmingham is an economic strategy game sequel to Martin Wallace' 2007 "
+                'masterpiece, Brass.\n\nBuild networks & grow industries.'
+            ),
+            'mechanics': [(2041, 'Open Drafting'), (2081, 'Network and Route Building'), (2040, 'Hand Management')],
+        })
+        self.assertEqual(pandemic['mechanics'][-1], (2824, 'Mechanic 2824'))  # unnamed link
+        self.assertEqual(ark_nova['description'], None)
+        self.assertEqual(ark_nova['thumbnail'], None)
+        self.assertEqual(ark_nova['playing_time'], None)  # empty value
+        self.assertEqual(ark_nova['weight'], None)  # unparseable value
+        self.assertEqual(ark_nova['mechanics'], [])
+
+    def test_streams_from_a_file(self):
+        with open(FIXTURES / 'thing.xml', 'rb') as source:
+            names = [record['name'] for record in iter_things(source)]
+        self.assertEqual(names, ['Brass: Birmingham', 'Pandemic Legacy: Season 1', 'Ark Nova'])
+
+    def test_malformed_xml_raises(self):
+        with self.assertRaises(ET.ParseError):
+            parse_things(fixture('thing.xml')[:500])
+
+
+class RankingParsingTests(SimpleTestCase):
+    def test_recorded_ranking_page(self):
+        rows, skipped = parse_ranking_page(fixture('browse_boardgame.html'))
+        self.assertEqual(rows, [(1, 224517), (2, 161936), (3, 342942)])
+        self.assertEqual(skipped, 2)  # promo row and the unranked advert
+
+    def test_page_without_table(self):
+        self.assertEqual(parse_ranking_page(b'<html><body>Rate limited</body></html>'), (None, 0))
+
+
+class RecordedIngestTests(SearchStateMixin, TestCase):
+    """fetch_top_games end to end on the fixtures: recorded from a stub server, then replayed offline."""
+
+    def respond(self, path, query, headers):
+        if path == '/browse/boardgame':
+            return 200, {'Content-Type': 'text/html; charset=utf-8'}, fixture('browse_boardgame.html')
+        if path == '/xmlapi2/thing':
+            return 200, {'Content-Type': 'text/xml; charset=utf-8'}, fixture('thing.xml')
+        return 404, {}, ''
+
+    def fetch(self, base_url, cache_dir, *extra):
+        out = StringIO()
+        call_command(
+            'fetch_top_games', '--top-n', '3', '--base-url', base_url, '--cache-dir', cache_dir,
+            '--rate', '100', '--retries', '1', *extra, stdout=out, stderr=out,
+        )
+        return out.getvalue()
+
+    def test_record_then_replay_offline(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            with StubServer(self.respond) as server:
+                output = self.fetch(server.url, cache_dir)
+            self.assertIn('Created 3, updated 0, unchanged 0', output)
+            self.assertEqual(
+                list(Game.objects.order_by('rank').values_list('bgg_id', 'rank', 'name')),
+                [(224517, 1, 'Brass: Birmingham'), (161936, 2, 'Pandemic Legacy: Season 1'), (342942, 3, 'Ark Nova')],
+            )
+            self.assertEqual(
+                dict(Mechanic.objects.values_list('bgg_id', 'usage_count')),
+                {2023: 1, 2040: 2, 2041: 1, 2081: 1, 2824: 1},
+            )
+            self.assertEqual(Game.objects.get(bgg_id=224517).mechanics.count(), 3)
+            requests = len(server.requests)
+
+            # The server is gone; everything comes from the recorded responses
+            Game.objects.filter(bgg_id=342942).delete()
+            output = self.fetch(server.url, cache_dir, '--offline')
+            self.assertIn('Created 1, updated 0, unchanged 2', output)
+            self.assertEqual(len(server.requests), requests)
+            self.assertEqual(Game.objects.count(), 3)
+
+    def test_unrequested_ids_keep_their_stored_rank(self):
+        Game.objects.create(bgg_id=342942, name='Ark Nova (old)', rank=3)
+        with tempfile.TemporaryDirectory() as cache_dir, StubServer(self.respond) as server:
+            self.fetch(server.url, cache_dir, '--top-n', '2')  # the recorded response still has all three games
+        self.assertEqual(
+            list(Game.objects.order_by('bgg_id').values_list('bgg_id', 'rank', 'name')),
+            [(161936, 2, 'Pandemic Legacy: Season 1'), (224517, 1, 'Brass: Birmingham'), (342942, 3, 'Ark Nova')],
+        )
+
+    def test_common_flags_are_only_refreshed_on_request(self):
+        drafting = Mechanic.objects.create(bgg_id=2041, name='Open Drafting')
+        store_mechanic_counts({drafting.pk: 12}, top_k=1)  # as scrape_forum_mechanics would
+        with tempfile.TemporaryDirectory() as cache_dir, StubServer(self.respond) as server:
+            self.fetch(server.url, cache_dir)
+            self.assertEqual(list(Mechanic.objects.filter(is_common=True).values_list('bgg_id', flat=True)), [2041])
+
+            Game.objects.all().delete()  # so the next run writes again
+            self.fetch(server.url, cache_dir, '--common-top-k', '1')
+        self.assertEqual(list(Mechanic.objects.filter(is_common=True).values_list('bgg_id', flat=True)), [2040])
+        self.assertEqual(Mechanic.objects.get(bgg_id=2041).mentions_count, 12)
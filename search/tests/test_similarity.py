@@ -0,0 +1,103 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from django.urls import reverse
+
+from search.models import Game, Mechanic, SimilarGame
+from search.similarity import GameVectors, exact_neighbors, lsh_neighbors, store_neighbors
+
+from .utils import SearchStateMixin
+
+CLUSTERS = 4
+CLUSTER_SIZE = 6
+
+
+class SimilarityTestCase(SearchStateMixin, TestCase):
+    """Four clusters of six games; each game has five of its cluster's six mechanics.
+
+    Games in a cluster are alike (Jaccard 2/3, close stats); games in
+    different clusters share no mechanics, so every top-3 stays in the cluster.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        mechanics = [Mechanic.objects.create(bgg_id=100 + i, name=f'Mechanic {i}') for i in range(CLUSTERS * CLUSTER_SIZE)]
+        through = Game.mechanics.through
+        links = []
+        for c in range(CLUSTERS):
+            for g in range(CLUSTER_SIZE):
+                game = Game.objects.create(
+                    bgg_id=1 + c * CLUSTER_SIZE + g,
+                    name=f'Cluster {c} game {g}',
+                    weight=1.5 + c + 0.05 * g,
+                    playing_time=30 * (c + 1),
+                    min_players=2,
+                    max_players=4,
+                    rating=8 - 0.1 * (c * CLUSTER_SIZE + g),
+                )
+                cluster = mechanics[c * CLUSTER_SIZE:(c + 1) * CLUSTER_SIZE]
+                links += [through(game=game, mechanic=m) for k, m in enumerate(cluster) if k != g]
+        through.objects.bulk_create(links)
+
+
+class NeighborTests(SimilarityTestCase):
+    def test_lsh_matches_exact(self):
+        vectors = GameVectors.load()
+        exact = exact_neighbors(vectors, 3)
+        self.assertEqual(lsh_neighbors(vectors, 3), exact)
+        for i, ranked in exact.items():
+            self.assertEqual(len(ranked), 3)
+            self.assertTrue(all(j // CLUSTER_SIZE == i // CLUSTER_SIZE for _, j in ranked))
+
+    def test_store_replaces_the_table(self):
+        vectors = GameVectors.load()
+        neighbors = exact_neighbors(vectors, 3)
+        self.assertEqual(store_neighbors(vectors, neighbors), CLUSTERS * CLUSTER_SIZE * 3)
+        first = list(
+            SimilarGame.objects.filter(game_id=vectors.pks[0]).order_by('rank').values_list('similar_id', 'score')
+        )
+        self.assertEqual(first, [(vectors.pks[j], round(score, 6)) for score, j in neighbors[0]])
+
+        self.assertEqual(store_neighbors(vectors, {1: neighbors[1][:2]}), 2)
+        self.assertEqual(
+            list(SimilarGame.objects.values_list('game_id', 'rank')),
+            [(vectors.pks[1], 1), (vectors.pks[1], 2)],
+        )
+
+    def test_command_rejects_non_positive_lsh_parameters(self):
+        for option in ('--bands', '--rows', '--max-candidates'):
+            with self.subTest(option=option), self.assertRaisesMessage(CommandError, f'{option} must be at least 1'):
+                call_command('build_similar_games', '--mode', 'lsh', option, '0', stdout=StringIO())
+        self.assertFalse(SimilarGame.objects.exists())
+
+
+class SimilarGamesViewTests(SimilarityTestCase):
+    def setUp(self):
+        super().setUp()
+        call_command('build_similar_games', '--top-k', '3', stdout=StringIO())
+
+    def expected(self):
+        return list(
+            SimilarGame.objects.filter(game__bgg_id=1).order_by('rank').values_list('similar__bgg_id', 'score')
+        )
+
+    def test_json(self):
+        response = self.client.get(reverse('similar_games', args=[1]))
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual((data['id'], data['name']), (1, 'Cluster 0 game 0'))
+        self.assertEqual([(row['id'], row['score']) for row in data['results']], self.expected())
+        self.assertEqual(len(data['results']), 3)
+
+    def test_htmx(self):
+        response = self.client.get(reverse('similar_games', args=[1]), headers={'HX-Request': 'true'})
+        self.assertContains(response, 'Games like Cluster 0 game 0')
+        content = response.content.decode()
+        positions = [content.index(f'Cluster 0 game {bgg_id - 1}<') for bgg_id, _ in self.expected()]
+        self.assertEqual(positions, sorted(positions))
+        self.assertNotContains(response, 'Cluster 1 game')
+
+    def test_unknown_game(self):
+        self.assertEqual(self.client.get(reverse('similar_games', args=[999])).status_code, 404)
@@ -0,0 +1,117 @@
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase
+
+from search.checks import check_fulltext_triggers
+from search.ingest import upsert_games
+from search.models import Game
+from search.textsearch import FtsText, InvertedText, fts_available, restore_fts_triggers, tokenize
+
+from .utils import game_record
+
+FTS_TRIGGERS = {'search_game_fts_insert', 'search_game_fts_delete', 'search_game_fts_update'}
+
+
+def _skip_without_fts(test):
+    if connection.vendor != 'sqlite' or 'search_game_fts' not in connection.introspection.table_names():
+        test.skipTest('SQLite FTS5 index not available')
+
+
+def _triggers():
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")
+        return {name for name, in cursor.fetchall()}
+
+
+class FulltextMigrationTests(TransactionTestCase):
+    """Later migrations that rebuild search_game must not lose 0007's FTS triggers."""
+
+    def setUp(self):
+        _skip_without_fts(self)
+        self.latest = MigrationExecutor(connection).loader.graph.leaf_nodes('search')[0][1]
+        self.addCleanup(self._migrate, self.latest)  # leave the schema as the next test expects
+
+    def _migrate(self, target):
+        executor = MigrationExecutor(connection)
+        executor.migrate([('search', target)])
+
+    def test_ingested_games_are_found_after_migrating(self):
+        self._migrate('0007_game_fulltext')
+        self._migrate(self.latest)
+        self.assertEqual(_triggers() & FTS_TRIGGERS, FTS_TRIGGERS)
+
+        upsert_games([game_record(1, 'Alpha Centauri', description='Space colonies')])
+        pk = Game.objects.get(bgg_id=1).pk
+        self.assertIn(pk, FtsText().scores('alpha'))
+        self.assertIn(pk, FtsText().scores('colonies'))
+
+        with connection.cursor() as cursor:
+            # Raises "database disk image is malformed" if the index drifted from search_game
+            cursor.execute("INSERT INTO search_game_fts(search_game_fts, rank) VALUES ('integrity-check', 1)")
+
+    def test_unapplying_keeps_triggers(self):
+        self._migrate('0007_game_fulltext')
+        self.assertEqual(_triggers() & FTS_TRIGGERS, FTS_TRIGGERS)
+
+
+class TokenizeTests(TestCase):
+    def test_folds_case_and_accents(self):
+        self.assertEqual(tokenize('Café-Intrigue: ÉDITION_2'), ['cafe', 'intrigue', 'edition', '2'])
+        self.assertEqual(tokenize(None), [])
+
+
+class FulltextSyncTests(TestCase):
+    """Every write path reaches search_game_fts through 0007's triggers."""
+
+    def setUp(self):
+        _skip_without_fts(self)
+
+    def test_save_update_and_delete(self):
+        game = Game.objects.create(bgg_id=1, name='Alpha Centauri', description='Space colonies')
+        self.assertIn(game.pk, FtsText().scores('alpha'))
+
+        game.name = 'Beta Station'
+        game.save()
+        self.assertNotIn(game.pk, FtsText().scores('alpha'))
+        self.assertIn(game.pk, FtsText().scores('beta station'))
+
+        game.delete()
+        self.assertEqual(FtsText().scores('beta'), {})
+
+    def test_ingest_inserts_and_updates(self):
+        upsert_games([game_record(1, 'Alpha Centauri'), game_record(2, 'Gamma Rays')])
+        pks = dict(Game.objects.values_list('bgg_id', 'id'))
+        self.assertEqual(set(FtsText().scores('alpha')), {pks[1]})
+
+        upsert_games([game_record(1, 'Alpha Centauri', description='Gamma radiation')])
+        self.assertEqual(set(FtsText().scores('gamma')), {pks[1], pks[2]})
+
+        Game.objects.filter(bgg_id=2).delete()
+        self.assertEqual(set(FtsText().scores('gamma')), {pks[1]})
+
+    def test_matches_in_process_backend(self):
+        upsert_games([
+            game_record(1, 'Alpha Centauri', description='Colonise a new world'),
+            game_record(2, 'New World', description='Alpha and omega'),
+            game_record(3, 'Omega Race', description='Race around the world'),
+        ])
+        inverted = InvertedText.build()
+        for query in ('alpha', 'world', 'new world', 'race omega', 'missing'):
+            fts, fallback = FtsText().scores(query), inverted.scores(query)
+            self.assertEqual(set(fts), set(fallback), query)
+            self.assertEqual(sorted(fts, key=fts.get), sorted(fallback, key=fallback.get), query)
+
+    def test_missing_triggers_are_detected_and_restored(self):
+        self.assertTrue(fts_available())
+        self.assertEqual(check_fulltext_triggers(None, databases=['default']), [])
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TRIGGER search_game_fts_insert')
+        Game.objects.create(bgg_id=1, name='Alpha Centauri')  # missed by the index
+
+        self.assertFalse(fts_available())
+        self.assertEqual([e.id for e in check_fulltext_triggers(None, databases=['default'])], ['search.W001'])
+
+        self.assertTrue(restore_fts_triggers())
+        self.assertTrue(fts_available())
+        self.assertEqual(len(FtsText().scores('alpha')), 1)
+        self.assertFalse(restore_fts_triggers())
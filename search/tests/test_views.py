@@ -0,0 +1,99 @@
+from unittest import mock
+from urllib.parse import parse_qs, urlsplit
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from search.dataversion import bump_data_version
+from search.engine import GameRecord
+from search.models import Game
+
+from .utils import SearchStateMixin
+
+
+@override_settings(SEARCH_PAGE_SIZE=2)
+class SearchPartialTests(SearchStateMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Game.objects.bulk_create([Game(bgg_id=i, name=f'Game {i}', rating=9 - i * 0.5) for i in range(1, 6)])
+
+    def test_load_more_follows_the_cursor(self):
+        first = self.client.get(reverse('search_partial'), {'min_rating': 1})
+        self.assertEqual(first.status_code, 200)
+        self.assertContains(first, 'Game 1')
+        self.assertNotContains(first, 'Game 3')
+        cursor = parse_qs(urlsplit(first.context['load_more_url']).query)['cursor'][0]
+
+        more = self.client.get(reverse('search_partial'), {'min_rating': 1, 'cursor': cursor})
+        self.assertEqual(more.status_code, 200)
+        self.assertContains(more, 'Game 3')
+        self.assertNotContains(more, 'Game 1')
+
+    def test_invalid_cursor_is_a_bad_request(self):
+        for params in ({'cursor': 'not-a-cursor'}, {'cursor': 'nan:1'}, {'q': 'game', 'cursor': '8.5:1'}):
+            response = self.client.get(reverse('search_partial'), {'min_rating': 1, **params})
+            self.assertEqual(response.status_code, 400, params)
+
+
+class ApiSearchTests(SearchStateMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Game.objects.bulk_create([Game(bgg_id=i, name=f'Game {i}', rating=9 - i * 0.5) for i in range(1, 6)])
+
+    def test_ndjson_builds_rows_as_the_stream_is_read(self):
+        with mock.patch('search.views.NDJSON_CHUNK', 2), \
+                mock.patch.object(GameRecord, 'values', autospec=True, side_effect=GameRecord.values) as values:
+            response = self.client.get(reverse('api_search'), {'format': 'ndjson', 'fields': 'name'})
+            self.assertEqual(values.call_count, 0)
+            chunks = iter(response.streaming_content)
+            next(chunks)
+            self.assertEqual(values.call_count, 2)
+            body = b''.join(chunks)
+        self.assertEqual(response['X-Total-Count'], '5')
+        self.assertEqual(len(body.splitlines()), 3)
+
+    def test_json_lists_the_requested_fields(self):
+        response = self.client.get(reverse('api_search'), {'fields': 'name,rating', 'limit': 2})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['total'], 5)
+        self.assertEqual(data['results'], [{'name': 'Game 1', 'rating': 8.5}, {'name': 'Game 2', 'rating': 8.0}])
+        self.assertIsNotNone(data['next'])
+
+    def test_non_finite_cursor_is_a_bad_request(self):
+        for params in ({'cursor': 'nan:1'}, {'cursor': 'inf:1'}, {'q': 'game', 'cursor': 's-inf:1'}):
+            response = self.client.get(reverse('api_search'), params)
+            self.assertEqual(response.status_code, 400, params)
+            self.assertIn('cursor', response.json()['errors'])
+
+    def test_matching_etag_is_not_modified(self):
+        url = reverse('api_search')
+        etag = self.client.get(url, {'min_rating': 1})['ETag']
+        with mock.patch('search.views.search_games') as search:
+            response = self.client.get(url, {'min_rating': 1}, headers={'If-None-Match': etag})
+            weak = self.client.get(url, {'min_rating': 1}, headers={'If-None-Match': f'W/{etag}'})
+        self.assertEqual((response.status_code, weak.status_code), (304, 304))
+        self.assertEqual(response['ETag'], etag)
+        search.assert_not_called()
+
+    def test_data_version_bump_changes_the_etag(self):
+        url = reverse('api_search')
+        etag = self.client.get(url, {'min_rating': 1})['ETag']
+        bump_data_version()
+        response = self.client.get(url, {'min_rating': 1}, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_etag_depends_on_the_query(self):
+        url = reverse('api_search')
+        etags = {
+            self.client.get(url, params)['ETag']
+            for params in ({'min_rating': 1}, {'min_rating': 8}, {'min_rating': 1, 'fields': 'name'},
+                           {'min_rating': 1, 'format': 'ndjson'}, {'min_rating': 1, 'limit': 2})
+        }
+        self.assertEqual(len(etags), 5)
+        # Equivalent spellings of one query share a tag
+        self.assertEqual(
+            self.client.get(url, {'min_rating': 1})['ETag'],
+            self.client.get(url, {'min_rating': '1.0'})['ETag'],
+        )
@@ -0,0 +1,120 @@
+"""Shared helpers for the search app tests."""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+import tempfile
+import threading
+from urllib.parse import parse_qs, urlsplit
+
+from django.conf import settings
+from django.core.cache import caches
+from django.test import override_settings
+
+from search import autocomplete, catalog, dataversion, engine
+
+
+def game_record(bgg_id, name, mechanics=(), **fields):
+    """An ingest record as search.bgg.parsing.iter_things yields it.
+
+    `mechanics` is a list of (mechanic bgg_id, name); unspecified Game fields are None.
+    """
+    record = {
+        'bgg_id': bgg_id,
+        'name': name,
+        'year': None,
+        'min_players': None,
+        'max_players': None,
+        'playing_time': None,
+        'weight': None,
+        'rating': None,
+        'thumbnail': None,
+        'description': None,
+        'mechanics': list(mechanics),
+    }
+    record.update(fields)
+    return record
+
+
+class SearchStateMixin:
+    """Gives each test its own data version file and empty process-local search state.
+
+    The index, mechanic catalog and caches are keyed by data version, which
+    would otherwise carry over between tests; call bump_data_version() after
+    changing rows mid-test, as ingest does.
+    """
+
+    def setUp(self):
+        super().setUp()
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        overridden = override_settings(SEARCH_DATA_VERSION_FILE=Path(tmp.name) / 'data_version')
+        overridden.enable()
+        self.addCleanup(overridden.disable)
+        dataversion._last_signature = None
+        engine._index = None
+        catalog._catalog = None
+        autocomplete._indexes_version = None
+        caches[settings.SEARCH_CACHE_ALIAS].clear()
+
+
+class StubServer:
+    """Local HTTP server for exercising the BGG client and forum crawler without the network.
+
+    `respond(path, query, headers)` returns (status, headers, body) for each
+    GET; `path` excludes the query string, which is parsed into a dict of
+    lists. Every request is logged in `requests` as (path, query, headers).
+    Use as a context manager, or call start()/stop().
+    """
+
+    def __init__(self, respond):
+        self.respond = respond
+        self.requests = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                parts = urlsplit(self.path)
+                query = parse_qs(parts.query)
+                with stub._lock:
+                    stub.requests.append((parts.path, query, dict(self.headers)))
+                    stub.in_flight += 1
+                    stub.max_in_flight = max(stub.max_in_flight, stub.in_flight)
+                try:
+                    status, headers, body = stub.respond(parts.path, query, self.headers)
+                finally:
+                    with stub._lock:
+                        stub.in_flight -= 1
+                if isinstance(body, str):
+                    body = body.encode()
+                self.send_response(status)
+                for name, value in dict(headers).items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._server.daemon_threads = True
+        self.url = f'http://127.0.0.1:{self._server.server_address[1]}'
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, args=(0.05,), daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def paths(self):
+        return [path for path, _, _ in self.requests]
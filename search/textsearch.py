@@ -0,0 +1,161 @@
+"""
+Keyword search over game names and descriptions, ranked with BM25.
+
+On SQLite with FTS5 (the default setup) an external-content FTS5 table,
+search_game_fts, mirrors search_game.name/description. Triggers created by
+migration 0007 keep it in step with every insert, delete and update of those
+columns, including ingest's bulk upserts, so there is no separate sync step.
+SQLite drops those triggers whenever a migration rebuilds search_game (adding
+or removing a column does), so a post_migrate handler puts back any that are
+missing, and the index is only used while all three exist. Where FTS5 isn't available (another database backend, or an SQLite build
+without it) an in-process inverted index with the same tokenization and the
+same BM25 formula is built from the catalog instead.
+
+Both backends return {Game pk: score}, higher is better, and require every
+query word to match (in either column). A name match weighs NAME_WEIGHT times
+a description match.
+"""
+from importlib import import_module
+import math
+import re
+import unicodedata
+
+from django.db import connection, connections
+
+from .models import Game
+
+FTS_TABLE = 'search_game_fts'
+FTS_TRIGGERS = ('search_game_fts_insert', 'search_game_fts_delete', 'search_game_fts_update')
+NAME_WEIGHT = 10.0
+
+# BM25 parameters; FTS5's bm25() hard-codes the same values
+_K1 = 1.2
+_B = 0.75
+
+# Like FTS5's unicode61 tokenizer: letters and digits, everything else separates
+_WORD = re.compile(r'[^\W_]+')
+
+
+def tokenize(text):
+    """Case- and accent-folded words of `text`, as the FTS index sees them."""
+    if not text:
+        return []
+    folded = unicodedata.normalize('NFKD', text.lower())
+    folded = ''.join(ch for ch in folded if not unicodedata.combining(ch))
+    return _WORD.findall(folded)
+
+
+def normalize_query(text) -> str:
+    """Canonical form of a keyword query ('' if it has no searchable words)."""
+    return ' '.join(tokenize(text))
+
+
+def fts_state(using='default'):
+    """(FTS table exists, names of missing sync triggers) for a database."""
+    conn = connections[using]
+    if conn.vendor != 'sqlite':
+        return False, []
+    with conn.cursor() as cursor:
+        cursor.execute(
+            "SELECT type, name FROM sqlite_master WHERE (type = 'table' AND name = %s)"
+            " OR (type = 'trigger' AND tbl_name = 'search_game')",
+            [FTS_TABLE],
+        )
+        found = cursor.fetchall()
+    has_table = ('table', FTS_TABLE) in found
+    triggers = {name for kind, name in found if kind == 'trigger'}
+    return has_table, [name for name in FTS_TRIGGERS if name not in triggers]
+
+
+def fts_available() -> bool:
+    """True if the FTS table exists and its triggers keep it in sync with search_game."""
+    has_table, missing = fts_state()
+    return has_table and not missing
+
+
+def restore_fts_triggers(using='default') -> bool:
+    """Recreate the sync triggers if any are missing, then rebuild the index from search_game.
+
+    Returns True if anything was repaired.
+    """
+    has_table, missing = fts_state(using)
+    if not has_table or not missing:
+        return False
+    fulltext = import_module('search.migrations.0007_game_fulltext')  # the triggers' one definition
+    with connections[using].cursor() as cursor:
+        for name in FTS_TRIGGERS:
+            cursor.execute(f'DROP TRIGGER IF EXISTS {name}')
+        for sql in fulltext.CREATE_TRIGGERS:
+            cursor.execute(sql)
+        cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+    return True
+
+
+class FtsText:
+    """Queries the search_game_fts table."""
+
+    def scores(self, query):
+        words = tokenize(query)
+        if not words:
+            return {}
+        # Quoted words are plain terms to FTS5 (no operators); juxtaposed terms are ANDed
+        expression = ' '.join(f'"{word}"' for word in words)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid, -bm25({FTS_TABLE}, %s, 1.0) FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+                [NAME_WEIGHT, expression],
+            )
+            return dict(cursor.fetchall())
+
+
+class InvertedText:
+    """In-process fallback: word -> {Game pk: name-weighted term frequency}."""
+
+    __slots__ = ('postings', 'lengths', 'avg_length')
+
+    def __init__(self, docs):
+        """`docs` yields (pk, name, description)."""
+        postings = {}
+        lengths = {}
+        for pk, name, description in docs:
+            name_words = tokenize(name)
+            description_words = tokenize(description)
+            lengths[pk] = len(name_words) + len(description_words)
+            for words, weight in ((name_words, NAME_WEIGHT), (description_words, 1.0)):
+                for word in words:
+                    frequencies = postings.setdefault(word, {})
+                    frequencies[pk] = frequencies.get(pk, 0.0) + weight
+        self.postings = postings
+        self.lengths = lengths
+        self.avg_length = (sum(lengths.values()) / len(lengths)) if lengths else 0.0
+
+    @classmethod
+    def build(cls):
+        return cls(Game.objects.order_by().values_list('id', 'name', 'description').iterator())
+
+    def scores(self, query):
+        words = tokenize(query)
+        if not words:
+            return {}
+        lists = [self.postings.get(word) for word in words]
+        if not all(lists):
+            return {}
+        matches = set(min(lists, key=len))
+        for frequencies in lists:
+            matches.intersection_update(frequencies)
+        total = len(self.lengths)
+        avg_length = self.avg_length or 1.0
+        scores = dict.fromkeys(matches, 0.0)
+        for frequencies in lists:
+            # Same IDF as FTS5, including its floor for very common words
+            idf = max(math.log((total - len(frequencies) + 0.5) / (len(frequencies) + 0.5)), 1e-6)
+            for pk in matches:
+                tf = frequencies[pk]
+                norm = _K1 * (1 - _B + _B * self.lengths[pk] / avg_length)
+                scores[pk] += idf * tf * (_K1 + 1) / (tf + norm)
+        return scores
+
+
+def text_backend():
+    """The keyword backend for the current database (FTS5, else in-process)."""
+    return FtsText() if fts_available() else InvertedText.build()
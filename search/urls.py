@@ -4,4 +4,7 @@ from . import views
 urlpatterns = [
     path('', views.index, name='index'),
     path('search/', views.search_partial, name='search_partial'),
+    path('autocomplete/', views.autocomplete, name='autocomplete'),
+    path('api/search', views.api_search, name='api_search'),
+    path('game/<int:bgg_id>/similar', views.similar_games, name='similar_games'),
 ]
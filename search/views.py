@@ -1,114 +1,190 @@
+import json
+
+from django.conf import settings
+from django.http import Http404, HttpResponse, HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render
-from django.db.models import Q
-from django.http import HttpResponse
+from django.template.loader import get_template
+from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.safestring import mark_safe
+from .autocomplete import DEFAULT_LIMIT, KINDS, MAX_LIMIT, complete
+from .cache import cached_cards, get_cached, results_cache_key, search_etag, set_cached
+from .dataversion import get_data_version
+from .engine import GameRecord, get_index, search_games
 from .forms import SearchForm
-from .models import Game
+from .models import Game, SimilarGame
+
+# Fields of a result record the JSON API can return (?fields=name,rating)
+API_FIELDS = GameRecord.__slots__
+API_MAX_LIMIT = 1000  # per JSON response; NDJSON streams everything unless limited
+NDJSON_CHUNK = 500  # lines per streamed chunk
+
+
+def _page_size():
+    # Hard cap per response; later pages are fetched with a keyset cursor
+    return getattr(settings, 'SEARCH_PAGE_SIZE', 24)
+
+
+def _render_card(game):
+    return get_template('search/partials/card.html').render({'game': game})
+
+
+def _run_search(request, form, facets=False):
+    """Results context shared by the full page and the htmx partials."""
+    context = {'games': [], 'cards': '', 'total': 0, 'load_more_url': None, 'facets': None}
+    # Filtering runs against the in-memory index (see engine.py), not the ORM
+    if form.is_valid():
+        page = search_games(form.cleaned_data, limit=_page_size(), facets=facets)
+        cards = mark_safe(cached_cards(page.games, _render_card))  # card.html autoescapes its fields
+        context.update(games=page.games, cards=cards, total=page.total, facets=page.facets)
+        if page.next_cursor:
+            params = request.GET.copy()
+            params['cursor'] = page.next_cursor
+            context['load_more_url'] = f"{reverse('search_partial')}?{params.urlencode()}"
+    return context
+
 
 def index(request):
     form = SearchForm(request.GET if request.method == 'GET' else {})  # Use GET for consistency
-    games = []
+    context = {'form': form, 'games': [], 'total': 0, 'load_more_url': None, 'selected_mechanics': []}
     if request.GET:  # Trigger search on any GET params
+        context.update(_run_search(request, form, facets=True))
         if form.is_valid():
-            cleaned = form.cleaned_data
-            games = Game.objects.all()
-
-            # Player count
-            if cleaned['min_players']:
-                games = games.filter(min_players__gte=cleaned['min_players'])
-            if cleaned['max_players']:
-                games = games.filter(max_players__lte=cleaned['max_players'])
-
-            # Playing time
-            if cleaned['min_playing_time']:
-                games = games.filter(playing_time__gte=cleaned['min_playing_time'])
-            if cleaned['max_playing_time']:
-                games = games.filter(playing_time__lte=cleaned['max_playing_time'])
-
-            # Weight
-            if cleaned['min_weight']:
-                games = games.filter(weight__gte=cleaned['min_weight'])
-            if cleaned['max_weight']:
-                games = games.filter(weight__lte=cleaned['max_weight'])
-
-            # Rating
-            if cleaned['min_rating']:
-                games = games.filter(rating__gte=cleaned['min_rating'])
-            if cleaned['max_rating']:
-                games = games.filter(rating__lte=cleaned['max_rating'])
-
-            # Mechanics
-            if cleaned['mechanics']:
-                games = games.filter(mechanics__in=cleaned['mechanics']).distinct()
-
-            # Serialize
-            games_list = []
-            for game in games:
-                games_list.append({
-                    'id': game.bgg_id,
-                    'name': game.name,
-                    'year': game.year,
-                    'min_players': game.min_players,
-                    'max_players': game.max_players,
-                    'playing_time': game.playing_time,
-                    'weight': game.weight,
-                    'rating': game.rating,
-                    'thumbnail': game.thumbnail,
-                    'description': game.description[:200] + '...' if game.description and len(game.description) > 200 else game.description,
-                })
-            games = games_list
-
-    return render(request, 'search/index.html', {'form': form, 'games': games})
+            # Only the selection is rendered; the dropdown fetches suggestions from /autocomplete/
+            context['selected_mechanics'] = form.cleaned_data['mechanics']
+
+    return render(request, 'search/index.html', context)
 
 def search_partial(request):
     # Same logic, but return only partial HTML (no full page)
     form = SearchForm(request.GET)
-    games = []
-    if form.is_valid():
-        cleaned = form.cleaned_data
-        games = Game.objects.all()
-
-        # Player count
-        if cleaned['min_players']:
-            games = games.filter(min_players__gte=cleaned['min_players'])
-        if cleaned['max_players']:
-            games = games.filter(max_players__lte=cleaned['max_players'])
-
-        # Playing time
-        if cleaned['min_playing_time']:
-            games = games.filter(playing_time__gte=cleaned['min_playing_time'])
-        if cleaned['max_playing_time']:
-            games = games.filter(playing_time__lte=cleaned['max_playing_time'])
-
-        # Weight
-        if cleaned['min_weight']:
-            games = games.filter(weight__gte=cleaned['min_weight'])
-        if cleaned['max_weight']:
-            games = games.filter(weight__lte=cleaned['max_weight'])
-
-        # Rating
-        if cleaned['min_rating']:
-            games = games.filter(rating__gte=cleaned['min_rating'])
-        if cleaned['max_rating']:
-            games = games.filter(rating__lte=cleaned['max_rating'])
-
-        # Mechanics
-        if cleaned['mechanics']:
-            games = games.filter(mechanics__in=cleaned['mechanics']).distinct()
-
-        # Serialize
-        games_list = []
-        for game in games:
-            games_list.append({
-                'id': game.bgg_id,
-                'name': game.name,
-                'year': game.year,
-                'min_players': game.min_players,
-                'max_players': game.max_players,
-                'playing_time': game.playing_time,
-                'weight': game.weight,
-                'rating': game.rating,
-                'thumbnail': game.thumbnail,
-                'description': game.description[:200] + '...' if game.description and len(game.description) > 200 else game.description,
-            })
-        games = games_list
-    return render(request, 'search/partials/results.html', {'games': games})
\ No newline at end of file
+    if request.GET.get('cursor'):
+        # "Load more": append the next page of cards to the existing grid
+        template = 'search/partials/result_page.html'
+        if not form.is_valid():
+            # An empty 200 would silently end the list; fail the request instead
+            return HttpResponseBadRequest(form.errors.as_text())
+    else:
+        template = 'search/partials/results.html'
+    facets = template == 'search/partials/results.html'  # only the first page shows them
+
+    # Equivalent queries share one rendered fragment until the data version moves
+    cache_key = results_cache_key(form.cleaned_data, template) if form.is_valid() else None
+    if cache_key:
+        content = get_cached(cache_key)
+        if content is not None:
+            return HttpResponse(content)
+
+    response = render(request, template, _run_search(request, form, facets=facets))
+    if cache_key:
+        set_cached(cache_key, response.content)
+    return response
+
+
+def autocomplete(request):
+    """Top name suggestions for a prefix: ?kind=mechanics|games&q=...&limit=N.
+
+    JSON by default; htmx requests get the dropdown (mechanics) or <datalist>
+    options (games) fragment instead.
+    """
+    kind = request.GET.get('kind', 'mechanics')
+    if kind not in KINDS:
+        return HttpResponseBadRequest(f'kind must be one of: {", ".join(KINDS)}')
+    try:
+        limit = int(request.GET.get('limit', DEFAULT_LIMIT))
+    except ValueError:
+        return HttpResponseBadRequest('limit must be an integer')
+    limit = max(1, min(limit, MAX_LIMIT))
+    results = complete(kind, request.GET.get('q', '')[:200], limit)
+
+    if request.headers.get('HX-Request'):
+        return render(request, f'search/partials/autocomplete_{kind}.html', {'results': results})
+    return JsonResponse({'results': results})
+
+
+def _dumps(value):
+    return json.dumps(value, separators=(',', ':'), ensure_ascii=False)
+
+
+def api_search(request):
+    """Search results as JSON for other services, with the SearchForm parameters.
+
+    ?fields=name,rating picks the record fields (default: all of API_FIELDS);
+    ?format=ndjson streams one record per line; ?limit=N caps the results,
+    with the next page linked by cursor. Responses carry a strong ETag made
+    from the data version and the normalized query, so an If-None-Match
+    revalidation is answered with 304 before anything is searched.
+    """
+    form = SearchForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({'errors': form.errors.get_json_data()}, status=400)
+
+    fields = [f for f in request.GET.get('fields', '').split(',') if f] or list(API_FIELDS)
+    unknown = [f for f in fields if f not in API_FIELDS]
+    if unknown:
+        return JsonResponse({'errors': {'fields': f'unknown: {", ".join(unknown)}'}}, status=400)
+    fmt = request.GET.get('format', 'json')
+    if fmt not in ('json', 'ndjson'):
+        return JsonResponse({'errors': {'format': 'must be json or ndjson'}}, status=400)
+    try:
+        limit = int(request.GET['limit']) if request.GET.get('limit') else None
+    except ValueError:
+        return JsonResponse({'errors': {'limit': 'must be an integer'}}, status=400)
+    if fmt == 'json':
+        limit = min(limit or _page_size(), API_MAX_LIMIT)
+    if limit is not None:
+        limit = max(1, limit)
+
+    etag = search_etag(get_data_version(), form.cleaned_data, f'api|{fmt}|{limit}|{",".join(fields)}')
+    not_modified = get_conditional_response(request, etag=etag)
+    if not_modified is not None:
+        not_modified['ETag'] = etag
+        return not_modified
+
+    page = search_games(form.cleaned_data, limit=limit)
+    next_url = None
+    if page.next_cursor:
+        params = request.GET.copy()
+        params['cursor'] = page.next_cursor
+        next_url = f"{request.path}?{params.urlencode()}"
+
+    if fmt == 'ndjson':
+        def lines():
+            # Rows are built chunk by chunk as the client reads, never all at once
+            for start in range(0, len(page.games), NDJSON_CHUNK):
+                yield ''.join(_dumps(game.values(fields)) + '\n' for game in page.games[start:start + NDJSON_CHUNK])
+        response = StreamingHttpResponse(lines(), content_type='application/x-ndjson')
+        response['X-Total-Count'] = page.total
+    else:
+        payload = {'total': page.total, 'next': next_url, 'results': [game.values(fields) for game in page.games]}
+        response = HttpResponse(_dumps(payload), content_type='application/json')
+    if next_url:
+        response['Link'] = f'<{next_url}>; rel="next"'
+    response['ETag'] = etag
+    patch_cache_control(response, no_cache=True)  # reusable, but revalidated every time
+    return response
+
+
+def similar_games(request, bgg_id):
+    """The games most like `bgg_id`, as precomputed by build_similar_games.
+
+    JSON ({id, name, results: [record fields + score]}) by default; htmx
+    requests get a heading plus the usual result cards.
+    """
+    name = Game.objects.filter(bgg_id=bgg_id).values_list('name', flat=True).first()
+    if name is None:
+        raise Http404('No such game')
+    links = SimilarGame.objects.filter(game__bgg_id=bgg_id).order_by('rank').values_list('similar_id', 'score')
+    index = get_index()
+    similar = [
+        (index.records[index.position[pk]], score)
+        for pk, score in links
+        if pk in index.position
+    ]
+
+    if request.headers.get('HX-Request'):
+        games = [game for game, _ in similar]
+        cards = mark_safe(cached_cards(games, _render_card))
+        return render(request, 'search/partials/similar.html', {'name': name, 'games': games, 'cards': cards})
+    results = [dict(game.values(API_FIELDS), score=score) for game, score in similar]
+    return JsonResponse({'id': bgg_id, 'name': name, 'results': results})
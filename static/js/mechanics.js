@@ -1,4 +1,4 @@
-let selectedMechanics = new Set();  // Will be initialized from template data
+let selectedMechanics = new Map();  // id -> name; initialized from the hidden select
 
 function updateSelectedBadges() {
     const badgesContainer = document.getElementById('selectedBadges');
@@ -7,13 +7,17 @@ function updateSelectedBadges() {
     const hiddenSelect = document.querySelector('select[name="mechanics"]');  // Hardcoded name for static JS
 
     badgesContainer.innerHTML = '';
-    selectedMechanics.forEach(id => {
-        const optionItem = Array.from(document.querySelectorAll('.option-item')).find(item => item.dataset.id === id.toString());
-        const name = optionItem ? optionItem.dataset.name : id;  // Fallback to ID if name not found
+    selectedMechanics.forEach((name, id) => {
         const badge = document.createElement('span');
         badge.className = 'badge bg-primary text-wrap';
         badge.style.cursor = 'pointer';
-        badge.innerHTML = `${name} <span class="ms-1" onclick="removeMechanic('${id}')" style="cursor: pointer; font-weight: bold;">&times;</span>`;
+        badge.textContent = `${name} `;
+        const remove = document.createElement('span');
+        remove.className = 'ms-1';
+        remove.style.fontWeight = 'bold';
+        remove.innerHTML = '&times;';
+        remove.addEventListener('click', () => removeMechanic(id));
+        badge.appendChild(remove);
         badgesContainer.appendChild(badge);
     });
 
@@ -21,21 +25,16 @@ function updateSelectedBadges() {
     countSpan.textContent = `Select mechanisms (${count} selected)`;
     clearBtn.style.display = count > 0 ? 'inline-block' : 'none';
 
-    // Update hidden select
-    if (hiddenSelect) {
-        Array.from(hiddenSelect.options).forEach(option => {
-            option.selected = selectedMechanics.has(option.value);
-        });
-    }
-
-    // Trigger HTMX change
+    // The hidden select holds exactly the selection (the page no longer ships every mechanic)
     if (hiddenSelect) {
+        hiddenSelect.replaceChildren(...Array.from(selectedMechanics, ([id, name]) => new Option(name, id, true, true)));
+        // Trigger HTMX change
         hiddenSelect.dispatchEvent(new Event('change', { bubbles: true }));
     }
 }
 
 function addMechanic(id, name) {
-    selectedMechanics.add(id);
+    selectedMechanics.set(id, name || id);
     updateSelectedBadges();
 }
 
@@ -56,25 +55,32 @@ document.addEventListener('DOMContentLoaded', function() {
     if (hiddenSelect) {
         Array.from(hiddenSelect.options).forEach(option => {
             if (option.selected) {
-                selectedMechanics.add(option.value);
+                selectedMechanics.set(option.value, option.text);
             }
         });
     }
     updateSelectedBadges();  // Initial render
 
-    document.querySelectorAll('.option-item').forEach(item => {
-        item.addEventListener('click', function(e) {
-            e.preventDefault();
-            const id = this.dataset.id;
-            if (selectedMechanics.has(id)) {
-                removeMechanic(id);
-            } else {
-                addMechanic(id, this.dataset.name);
-            }
-            // Close dropdown after selection
-            const dropdownElement = document.getElementById('mechanicsDropdown');
-            const dropdown = bootstrap.Dropdown.getInstance(dropdownElement);
-            if (dropdown) dropdown.hide();
-        });
+    // Typing in the lookup box fetches suggestions; it shouldn't also re-run the search
+    const lookup = document.getElementById('mechanicLookup');
+    if (lookup) {
+        ['keyup', 'change'].forEach(type => lookup.addEventListener(type, e => e.stopPropagation()));
+    }
+
+    // Suggestions are swapped in by htmx, so listen on their container
+    document.getElementById('mechanicOptions').addEventListener('click', function(e) {
+        const item = e.target.closest('.option-item');
+        if (!item) return;
+        e.preventDefault();
+        const id = item.dataset.id;
+        if (selectedMechanics.has(id)) {
+            removeMechanic(id);
+        } else {
+            addMechanic(id, item.dataset.name);
+        }
+        // Close dropdown after selection
+        const dropdownElement = document.getElementById('mechanicsDropdown');
+        const dropdown = bootstrap.Dropdown.getInstance(dropdownElement);
+        if (dropdown) dropdown.hide();
     });
-});
\ No newline at end of file
+});